@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import sys
 import threading
 import queue
 import time
@@ -9,7 +10,10 @@ from typing import List, Optional
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
-from yt_dlp import YoutubeDL
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # dùng chung lõi điều phối ở thư mục gốc
+from orchestrator import Orchestrator, run_sync
+from media_cache import attach_cache, open_cache
+from wav_shards import attach_flac
 
 APP_TITLE = "YouTube Downloader — GUI"
 DEFAULT_DOWNLOAD_DIR = Path("downloads")
@@ -17,9 +21,9 @@ DEFAULT_LINK_FILE = Path("link.txt")
 
 # ---------------------- Logic yt-dlp ----------------------
 
-def make_opts_for_mode(mode: str, outdir: Path, progress_hook):
+def make_opts_for_mode(mode: str, outdir: Path, progress_hook=None):
     """
-    mode: 'MP4' | 'MP3' | 'WAV'
+    mode: 'MP4' | 'MP3' | 'WAV' | 'FLAC'
     """
     common = {
         "outtmpl": str(outdir / "%(title)s [%(id)s].%(ext)s"),
@@ -29,7 +33,7 @@ def make_opts_for_mode(mode: str, outdir: Path, progress_hook):
         "retries": 10,
         "fragment_retries": 10,
         "http_chunk_size": 10 * 1024 * 1024,
-        "progress_hooks": [progress_hook],
+        "progress_hooks": [progress_hook] if progress_hook else [],
         "trim_file_name": 240,
         "quiet": True,         # im lặng, chỉ dùng hook để log
         "no_warnings": True,
@@ -49,8 +53,8 @@ def make_opts_for_mode(mode: str, outdir: Path, progress_hook):
             ],
         }
 
-    target = "mp3" if mode == "MP3" else "wav"
-    return {
+    target = mode.lower()
+    opts = {
         **common,
         "format": "bestaudio/best",
         "postprocessors": [
@@ -59,6 +63,9 @@ def make_opts_for_mode(mode: str, outdir: Path, progress_hook):
         ],
         "prefer_ffmpeg": True,
     }
+    if mode == "FLAC":
+        attach_flac(opts)   # encode trong pool transcode chung, mức nén mặc định
+    return opts
 
 
 # ---------------------- GUI App ----------------------
@@ -78,6 +85,7 @@ class App(tk.Tk):
         self.status_var = tk.StringVar(value="Sẵn sàng.")
         self.queue = queue.Queue()
         self.worker: Optional[threading.Thread] = None
+        self.orch: Optional[Orchestrator] = None
         self.stop_flag = threading.Event()
 
         self._build_ui()
@@ -90,7 +98,7 @@ class App(tk.Tk):
         frm_top.pack(fill="x", **pad)
 
         ttk.Label(frm_top, text="Đầu ra:").grid(row=0, column=0, sticky="w")
-        fmt = ttk.Combobox(frm_top, textvariable=self.mode_var, values=["MP4", "MP3", "WAV"], state="readonly", width=8)
+        fmt = ttk.Combobox(frm_top, textvariable=self.mode_var, values=["MP4", "MP3", "WAV", "FLAC"], state="readonly", width=8)
         fmt.grid(row=0, column=1, sticky="w", padx=(6, 18))
 
         ttk.Label(frm_top, text="Thư mục lưu:").grid(row=0, column=2, sticky="w")
@@ -136,6 +144,8 @@ class App(tk.Tk):
         self.btn_start.pack(side="left")
         self.btn_stop = ttk.Button(frm_actions, text="Dừng", command=self.stop_downloads, state="disabled")
         self.btn_stop.pack(side="left", padx=(8, 0))
+        self.btn_drain = ttk.Button(frm_actions, text="Dừng sau mục hiện tại", command=self.drain_downloads, state="disabled")
+        self.btn_drain.pack(side="left", padx=(8, 0))
 
         self.status_lbl = ttk.Label(self, textvariable=self.status_var, anchor="w")
         self.status_lbl.pack(fill="x", padx=12, pady=(0, 10))
@@ -197,6 +207,7 @@ class App(tk.Tk):
         self.stop_flag.clear()
         self.btn_start.config(state="disabled")
         self.btn_stop.config(state="normal")
+        self.btn_drain.config(state="normal")
 
         self.worker = threading.Thread(
             target=self._worker_download, args=(urls, mode, outdir), daemon=True
@@ -204,46 +215,63 @@ class App(tk.Tk):
         self.worker.start()
 
     def stop_downloads(self):
+        # Dừng ngay cả mục đang tải (file .part được giữ để lần sau tải tiếp)
         self.stop_flag.set()
+        if self.orch:
+            self.orch.cancel_threadsafe()
         self._log("⏹ Yêu cầu dừng tác vụ…")
 
+    def drain_downloads(self):
+        self.stop_flag.set()
+        if self.orch:
+            self.orch.cancel_threadsafe(drain=True)
+        self.btn_drain.config(state="disabled")
+        self._log("⏹ Sẽ dừng sau khi xong mục hiện tại…")
+
     def _worker_download(self, urls: List[str], mode: str, outdir: Path):
         total = len(urls)
         done = 0
 
-        def hook(d):
-            if d["status"] == "downloading":
-                pstr = d.get("_percent_str", "").strip().replace("%", "")
-                try:
-                    pct = float(pstr)
-                except Exception:
-                    pct = 0.0
-                self.queue.put(("progress_current", pct))
-            elif d["status"] == "finished":
-                self.queue.put(("log", "✓ Tải xong, đang xử lý (ffmpeg)…"))
-
-        ydl_opts = make_opts_for_mode(mode, outdir, hook)
-
-        for url in urls:
-            if self.stop_flag.is_set():
+        # Chuyển sự kiện của lõi điều phối thành message cho hàng đợi Tk
+        def on_event(ev):
+            nonlocal done
+            if ev.kind == "progress":
+                d = ev.data
+                if d["status"] == "downloading":
+                    pstr = d.get("_percent_str", "").strip().replace("%", "")
+                    try:
+                        pct = float(pstr)
+                    except Exception:
+                        pct = 0.0
+                    self.queue.put(("progress_current", pct))
+                elif d["status"] == "finished":
+                    self.queue.put(("log", "✓ Tải xong, đang xử lý (ffmpeg)…"))
+            elif ev.kind == "start":
+                self.queue.put(("log", f"— Bắt đầu: {ev.job.url}"))
+                self.queue.put(("progress_current", 0.0))
+            elif ev.kind in ("finished", "error", "cancelled"):
+                if ev.kind == "finished":
+                    self.queue.put(("log", "✔ Hoàn tất video/playlist này."))
+                elif ev.kind == "error":
+                    self.queue.put(("log", f"❌ Lỗi: {ev.data}"))
+                done += 1
+                self.queue.put(("progress_overall", round(done * 100.0 / total, 2)))
+            elif ev.kind == "done" and self.stop_flag.is_set():
+                for j in ev.data or []:
+                    for p in sorted(j.partials):
+                        self.queue.put(("log", f"… File dở (tải tiếp lần sau): {Path(p).name}"))
                 self.queue.put(("log", "⏹ Đã dừng theo yêu cầu."))
-                break
-
-            self.queue.put(("log", f"— Bắt đầu: {url}"))
-            self.queue.put(("progress_current", 0.0))
 
-            try:
-                with YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([url])
-                self.queue.put(("log", "✔ Hoàn tất video/playlist này."))
-            except Exception as e:
-                self.queue.put(("log", f"❌ Lỗi: {e}"))
-
-            done += 1
-            overall = round(done * 100.0 / total, 2)
-            self.queue.put(("progress_overall", overall))
-
-        self.queue.put(("done", None))
+        opts = make_opts_for_mode(mode, outdir)
+        cache = attach_cache(opts, open_cache(None))   # bật bằng ENV YT_CACHE_DIR (chung với run.py / run_hf)
+        if cache:
+            self.queue.put(("log", f"Cache: {cache.root}"))
+        self.orch = Orchestrator(opts)
+        try:
+            run_sync(self.orch, urls, on_event)
+        finally:
+            self.orch = None
+            self.queue.put(("done", None))
 
     def _collect_urls(self) -> List[str]:
         text = self.urls_text.get("1.0", "end").strip()
@@ -264,6 +292,7 @@ class App(tk.Tk):
                 elif msg == "done":
                     self.btn_start.config(state="normal")
                     self.btn_stop.config(state="disabled")
+                    self.btn_drain.config(state="disabled")
                     self.status_var.set("Hoàn tất." if not self.stop_flag.is_set() else "Đã dừng.")
         except queue.Empty:
             pass
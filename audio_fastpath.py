@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Đường tắt cho âm thanh: chọn nguồn cùng codec để stream-copy, chỉ transcode khi bắt buộc
+
+import os
+import threading
+from typing import Optional
+
+from yt_dlp.postprocessor import FFmpegExtractAudioPP, get_postprocessor
+
+# Bộ chọn định dạng: ưu tiên nguồn đã đúng codec đích (copy), không có thì lấy bestaudio
+FORMAT_FOR_TARGET = {
+    "mp3":  "bestaudio[acodec=mp3]/bestaudio/best",
+    "opus": "bestaudio[acodec=opus]/bestaudio/best",
+    "aac":  "bestaudio[acodec^=mp4a]/bestaudio[ext=m4a]/bestaudio/best",
+    "m4a":  "bestaudio[acodec^=mp4a]/bestaudio[ext=m4a]/bestaudio/best",
+}
+# codec do ffprobe trả về -> codec đích copy được
+COPYABLE = {"mp3": {"mp3"}, "opus": {"opus"}, "aac": {"aac"}, "m4a": {"aac"}}
+
+# Pool transcode dùng chung cả tiến trình: số ffmpeg encode đồng thời <= số nhân CPU
+TRANSCODE_SLOTS = threading.BoundedSemaphore(os.cpu_count() or 2)
+
+
+class AudioStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.copied = 0
+        self.transcoded = 0
+
+    def add(self, copied: bool):
+        with self.lock:
+            if copied:
+                self.copied += 1
+            else:
+                self.transcoded += 1
+
+    def summary(self) -> str:
+        total = self.copied + self.transcoded
+        if not total:
+            return "Âm thanh: chưa xử lý mục nào."
+        return (f"Âm thanh: {self.copied} copy / {self.transcoded} transcode "
+                f"({self.copied * 100.0 / total:.0f}% không phải encode lại)")
+
+
+class SmartExtractAudioPP(FFmpegExtractAudioPP):
+    """
+    FFmpegExtractAudio của yt-dlp vốn đã -acodec copy khi codec nguồn == đích.
+    Lớp này chỉ thêm: đếm copy/transcode và giới hạn số lượt transcode chạy song song.
+    """
+
+    def __init__(self, downloader=None, stats: Optional[AudioStats] = None, **kwargs):
+        super().__init__(downloader, **kwargs)
+        self.stats = stats
+        self.target = (kwargs.get("preferredcodec") or "best").lower()
+        self._probed = None     # (path, codec) của file đang xử lý
+
+    def get_audio_codec(self, path):
+        # super().run() hỏi lại codec của đúng file vừa probe -> trả kết quả cũ, không chạy ffprobe lần 2
+        if self._probed and self._probed[0] == path:
+            return self._probed[1]
+        return super().get_audio_codec(path)
+
+    def run(self, information):
+        path = information.get("filepath")
+        if path and self.target != "best":
+            self._probed = (path, super().get_audio_codec(path))
+        filecodec = self._probed[1] if self._probed else None
+        copied = self.target == "best" or filecodec in COPYABLE.get(self.target, {self.target})
+        if self.stats:
+            self.stats.add(copied)
+        try:
+            if copied:
+                return super().run(information)
+            with TRANSCODE_SLOTS:
+                return super().run(information)
+        finally:
+            self._probed = None
+
+
+def move_postprocessors(opts: dict, replace: dict):
+    """
+    Chuyển opts["postprocessors"] sang opts["custom_postprocessors"] (giữ nguyên thứ tự),
+    thay các key trong replace bằng factory riêng: replace[key](ydl, **args) -> PostProcessor.
+    replace[key] = None -> bỏ hẳn postprocessor đó.
+    """
+    moved = []
+    for pp in opts.pop("postprocessors", []):
+        args = dict(pp)
+        key = args.pop("key")
+        when = args.pop("when", "post_process")
+        if key in replace:
+            if replace[key] is not None:
+                moved.append((lambda ydl, f=replace[key], a=args: f(ydl, **a), when))
+        else:
+            moved.append((lambda ydl, k=key, a=args: get_postprocessor(k)(ydl, **a), when))
+    opts["custom_postprocessors"] = list(opts.get("custom_postprocessors") or []) + moved
+
+
+def attach_smart_audio(opts: dict, target: str, stats: Optional[AudioStats] = None) -> AudioStats:
+    """
+    Đổi opts âm thanh sang đường tắt: format ưu tiên cùng codec, FFmpegExtractAudio -> SmartExtractAudioPP.
+    Giữ nguyên thứ tự các postprocessor còn lại (vd: FFmpegMetadata chạy sau extract).
+    """
+    stats = stats or AudioStats()
+    target = target.lower()
+    if target in FORMAT_FOR_TARGET:
+        opts["format"] = FORMAT_FOR_TARGET[target]
+    move_postprocessors(opts, {
+        "FFmpegExtractAudio": lambda ydl, **a: SmartExtractAudioPP(ydl, stats=stats, **a),
+    })
+    return stats
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Vân tay âm thanh (NumPy) + chỉ mục SQLite: phát hiện bản re-upload / lyric video của cùng 1 bài trước khi upload
+
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SAMPLE_RATE = 11025
+FRAME = 2048               # ~186 ms
+HOP = 128                  # ~11.6 ms (chồng 15/16 như Haitsma-Kalker): hop 512 thì 2 bản lệch nửa khung đã có BER ~0.3
+BANDS = 33                 # 33 dải log 300..2000 Hz -> 32 bit / khung (Haitsma-Kalker)
+FMIN, FMAX = 300, 2000
+MAX_SECONDS = 600          # chỉ lấy 10 phút đầu
+MIN_FRAMES = 800           # quá ngắn (< ~10 s) thì không so
+INDEX_EVERY = 16           # chỉ mục ngược lưu 1/16 số khung (~186 ms 1 mục); truy vấn dùng mọi khung
+BER_THRESHOLD = 0.32       # tỉ lệ bit khác nhau trên đoạn chồng nhau, dưới ngưỡng = cùng bản ghi âm
+                           # (test_audio_fingerprint: cùng bản lệch/đổi âm lượng/nhiễu 20 dB <= ~0.25, khác bài ~0.5)
+FP_VERSION = 2             # đổi HOP/FRAME/BANDS thì tăng -> chỉ mục cũ không so được, dựng lại
+MIN_OVERLAP = 0.5          # đoạn chồng nhau phải phủ >= 50% bản ngắn hơn
+PENDING_POLL = 2.0         # bản gốc đang upload: kiểm tra lại mỗi N giây (tiến trình khác dùng chung chỉ mục)
+PENDING_STALE = 1800       # bản gốc chưa có repo_path sau N giây (tiến trình chết giữa chừng) -> không chờ nữa
+_SILENT = (0, 0xFFFFFFFF)  # khung im lặng / bão hoà khớp với mọi thứ -> bỏ
+
+
+def decode(path, ffmpeg: Optional[str] = None):
+    """ffmpeg -> PCM mono 11025 Hz (float32, NumPy)."""
+    import numpy as np
+
+    exe = ffmpeg or shutil.which("ffmpeg") or "ffmpeg"
+    cmd = [exe, "-v", "error", "-nostdin", "-i", str(path), "-t", str(MAX_SECONDS),
+           "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"]
+    out = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True).stdout
+    return np.frombuffer(out, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def fingerprint(samples) -> "np.ndarray":
+    """
+    Mỗi khung 1 số uint32: bit m = dấu của (E[n,m]-E[n,m+1]) - (E[n-1,m]-E[n-1,m+1]),
+    E = năng lượng dải tần. Bền với đổi codec/bitrate, âm lượng, cắt đầu/cuối.
+    """
+    import numpy as np
+
+    n = (len(samples) - FRAME) // HOP + 1
+    if n < 2:
+        return np.zeros(0, dtype=np.uint32)
+    edges = (np.geomspace(FMIN, FMAX, BANDS + 1) * FRAME / SAMPLE_RATE).astype(int)
+    edges = np.maximum(edges, edges[0] + np.arange(BANDS + 1))     # mỗi dải ít nhất 1 bin
+    window = np.hanning(FRAME).astype(np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME)[::HOP][:n]
+    energy = np.empty((n, BANDS), dtype=np.float64)
+    for i in range(0, n, 1024):   # theo khối để không dựng cả ma trận FFT 10 phút trong RAM
+        spec = np.abs(np.fft.rfft(frames[i:i + 1024] * window, axis=1)) ** 2
+        c = np.concatenate([np.zeros((len(spec), 1)), np.cumsum(spec, axis=1)], axis=1)
+        energy[i:i + 1024] = c[:, edges[1:]] - c[:, edges[:-1]]
+    d = energy[:, :-1] - energy[:, 1:]
+    bits = (d[1:] - d[:-1]) > 0
+    return np.packbits(bits, axis=1, bitorder="little").view("<u4").ravel()
+
+
+def bit_error_rate(a, b) -> float:
+    import numpy as np
+
+    x = np.bitwise_xor(a, b).view(np.uint8)
+    return float(np.unpackbits(x).sum()) / (32 * len(a)) if len(a) else 1.0
+
+
+class FingerprintIndex:
+    """
+    <file>.sqlite: tracks (video_id, repo_path, fp) + hashes (giá trị khung -> video, vị trí).
+    Tra cứu: khung trùng giá trị bỏ phiếu cho (video, độ lệch), ứng viên nhiều phiếu nhất được kiểm tra
+    lại bằng tỉ lệ bit khác nhau trên toàn đoạn chồng nhau.
+    """
+
+    def __init__(self, path: Path, threshold: float = BER_THRESHOLD):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)   # set_path / forget -> đánh thức bản trùng đang chờ
+        self.db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version != FP_VERSION:
+            if self.db.execute("SELECT 1 FROM sqlite_master WHERE name = 'tracks'").fetchone():
+                print(f"⚠️  Chỉ mục vân tay {self.path.name} dựng với tham số cũ (v{version}) -> dựng lại từ đầu")
+            self.db.execute("DROP TABLE IF EXISTS hashes")
+            self.db.execute("DROP TABLE IF EXISTS tracks")
+            self.db.execute(f"PRAGMA user_version = {FP_VERSION}")
+        self.db.execute("CREATE TABLE IF NOT EXISTS tracks (video_id TEXT PRIMARY KEY, repo_path TEXT, "
+                        "frames INTEGER, fp BLOB, added_at REAL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS hashes (h INTEGER, video_id TEXT, pos INTEGER)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS hashes_h ON hashes (h)")
+
+    def _candidates(self, fp, exclude: str) -> List[tuple]:
+        where: Dict[int, List[int]] = {}
+        for i, h in enumerate(fp.tolist()):
+            if h not in _SILENT:
+                where.setdefault(h, []).append(i)
+        votes: Dict[tuple, int] = {}
+        keys = list(where)
+        for k in range(0, len(keys), 500):
+            chunk = keys[k:k + 500]
+            rows = self.db.execute(f"SELECT h, video_id, pos FROM hashes WHERE h IN ({','.join('?' * len(chunk))})",
+                                   chunk).fetchall()
+            for h, vid, pos in rows:
+                if vid == exclude:
+                    continue
+                for i in where[h]:
+                    votes[(vid, pos - i)] = votes.get((vid, pos - i), 0) + 1
+        best = sorted(votes.items(), key=lambda kv: -kv[1])[:5]
+        return [key for key, v in best if v >= 2]
+
+    def match(self, fp, exclude: str = "") -> Optional[dict]:
+        """
+        Bản gần trùng tốt nhất: {"id", "repo_path", "ber"} hoặc None.
+        repo_path None = bản gốc đang upload; bản gốc treo quá PENDING_STALE giây thì bỏ qua.
+        """
+        import numpy as np
+
+        found = None
+        stale = time.time() - PENDING_STALE
+        for vid, delta in self._candidates(fp, exclude):
+            row = self.db.execute("SELECT repo_path, fp, added_at FROM tracks WHERE video_id = ?", (vid,)).fetchone()
+            if not row or (row[0] is None and row[2] < stale):
+                continue
+            other = np.frombuffer(row[1], dtype="<u4")
+            lo, hi = max(0, -delta), min(len(fp), len(other) - delta)   # fp[i] <-> other[i + delta]
+            if hi - lo < MIN_OVERLAP * min(len(fp), len(other)):
+                continue
+            ber = bit_error_rate(fp[lo:hi], other[lo + delta:hi + delta])
+            if ber < self.threshold and (found is None or ber < found["ber"]):
+                found = {"id": vid, "repo_path": row[0], "ber": round(ber, 3)}
+        return found
+
+    def claim(self, video_id: str, fp) -> Optional[dict]:
+        """
+        Nguyên tử: trùng bản đã có -> trả về bản đó (repo_path None nếu bản đó chưa upload xong);
+        không trùng -> ghi vào chỉ mục (video này là bản gốc, repo_path NULL tới khi set_path).
+        """
+        with self.lock:
+            if self.db.execute("SELECT 1 FROM tracks WHERE video_id = ?", (video_id,)).fetchone():
+                return None
+            dup = self.match(fp, exclude=video_id)
+            if dup:
+                return dup
+            self.db.execute("BEGIN")
+            self.db.execute("INSERT INTO tracks VALUES (?, NULL, ?, ?, ?)",
+                            (video_id, len(fp), fp.astype("<u4").tobytes(), time.time()))
+            self.db.executemany("INSERT INTO hashes VALUES (?, ?, ?)",
+                                [(int(h), video_id, i) for i, h in enumerate(fp.tolist())
+                                 if i % INDEX_EVERY == 0 and h not in _SILENT])
+            self.db.execute("COMMIT")
+            return None
+
+    def set_path(self, video_id: str, repo_path: str):
+        with self.lock:
+            self.db.execute("UPDATE tracks SET repo_path = ? WHERE video_id = ?", (repo_path, video_id))
+            self.changed.notify_all()
+
+    def forget(self, video_id: str):
+        """Bản gốc upload lỗi -> bỏ khỏi chỉ mục để lần sau bản khác (hoặc chính nó) được làm gốc."""
+        with self.lock:
+            self.db.execute("DELETE FROM hashes WHERE video_id = ?", (video_id,))
+            self.db.execute("DELETE FROM tracks WHERE video_id = ?", (video_id,))
+            self.changed.notify_all()
+
+    def wait_change(self, timeout: float = PENDING_POLL):
+        """Chờ set_path / forget trong tiến trình này (tiến trình khác: hết timeout thì hỏi lại chỉ mục)."""
+        with self.changed:
+            self.changed.wait(timeout)
+
+
+class AudioDedup:
+    """Dùng trong bước đẩy file của run_hf-v3: vân tay file đã hậu xử lý rồi hỏi chỉ mục."""
+
+    def __init__(self, index_path: Path, threshold: float = BER_THRESHOLD, ffmpeg: Optional[str] = None):
+        self.index = FingerprintIndex(index_path, threshold)
+        self.ffmpeg = ffmpeg
+        self.lock = threading.Lock()
+        self.checked = 0
+        self.duplicates = 0
+        self.saved_bytes = 0
+
+    def check(self, path: Path, video_id: str) -> Optional[dict]:
+        """None = bản gốc (đã ghi vào chỉ mục), dict = trùng với bản đã upload xong (repo_path luôn có)."""
+        try:
+            fp = fingerprint(decode(path, self.ffmpeg))
+        except Exception as e:
+            print(f"   ⚠️  Không lấy được vân tay {Path(path).name}: {e}")
+            return None
+        if len(fp) < MIN_FRAMES:
+            return None
+        dup = self.index.claim(video_id, fp)
+        while dup and dup["repo_path"] is None:
+            # bản gốc đang upload: chờ kết quả. Xong -> trùng (xoá được bản này); lỗi (forget) -> bản này làm gốc
+            self.index.wait_change()
+            dup = self.index.claim(video_id, fp)
+        with self.lock:
+            self.checked += 1
+            if dup:
+                self.duplicates += 1
+                self.saved_bytes += Path(path).stat().st_size
+        return dup
+
+    def summary(self) -> str:
+        return (f"Chống trùng âm thanh: {self.duplicates}/{self.checked} mục trùng bản đã có, "
+                f"tiết kiệm ~{self.saved_bytes / 1e6:,.1f} MB upload")
+
+
+def open_dedup(cfg: dict, ffmpeg: Optional[str] = None) -> Optional[AudioDedup]:
+    """[dedup] enabled = true -> AudioDedup; thiếu NumPy thì báo và bỏ qua (không chặn cả lô)."""
+    if not cfg.get("enabled"):
+        return None
+    try:
+        import numpy  # noqa: F401  (pip install numpy)
+    except ModuleNotFoundError:
+        print("⚠️  [dedup] cần NumPy (pip install numpy) -> tắt chống trùng âm thanh.")
+        return None
+    return AudioDedup(Path(cfg["index"]), float(cfg.get("threshold", BER_THRESHOLD)), ffmpeg)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Bộ điều tiết băng thông chung cả tiến trình: 1 ngân sách byte/s chia cho mọi luồng tải / upload đang chạy
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+BURST_SECONDS = 0.25     # cho phép dồn tối đa chừng này thời gian byte -> mượt mà trung bình vẫn đúng trần
+REALLOC_SECONDS = 0.5    # chu kỳ đo tốc độ thực và chia lại ngân sách
+MIN_SHARE = 0.01         # mỗi luồng luôn giữ ít nhất 1% ngân sách (tránh chờ rất lâu khi vừa hết nghỉ)
+HUNGRY = 0.9             # dùng >= 90% phần được chia -> coi là còn muốn thêm
+
+
+class Flow:
+    """1 luồng dữ liệu (1 job tải hoặc 1 lượt upload) trong ngân sách chung, trọng số theo làn."""
+
+    def __init__(self, gov: "Governor", weight: float, now: float):
+        self.gov = gov
+        self.weight = max(float(weight), 0.001)
+        self.share = 0.0          # byte/s được chia ở lần chia gần nhất
+        self.rate = 0.0           # byte/s đo được ở chu kỳ trước
+        self.used = 0             # byte trong chu kỳ đang đo
+        self.since = now
+        self.hungry = True
+        self._tat = now           # GCRA: thời điểm "đáng lẽ" đã truyền xong phần đã dùng
+        self._last: Dict[str, int] = {}
+
+    def progress(self, key: str, total: int):
+        """Tiến độ dạng luỹ kế (downloaded_bytes của yt-dlp) -> tiêu thụ phần tăng thêm của file `key`."""
+        with self.gov.lock:
+            last = self._last.get(key)
+            self._last[key] = total
+        # lần đầu thấy file: có thể là phần tải dở từ trước (resume) -> không tính
+        if last is not None and total > last:
+            self.gov.consume(self, total - last)
+
+
+class Governor:
+    """
+    Ngân sách `rate` byte/s cho cả tiến trình. Mỗi lần dữ liệu đi qua, consume() ngủ đủ để:
+      - tổng mọi luồng không vượt `rate` (GCRA chung),
+      - mỗi luồng không vượt phần được chia (GCRA riêng).
+    Phần chia được tính lại mỗi REALLOC_SECONDS theo kiểu water-filling có trọng số: luồng dùng ít hơn
+    phần của mình (bị nguồn/đích giới hạn) chỉ giữ đúng mức đang dùng, phần thừa dồn cho luồng còn
+    muốn thêm -> tổng phần chia luôn bằng `rate`, ngân sách không bị bỏ phí khi có luồng rảnh.
+    """
+
+    def __init__(self, rate: int):
+        self.rate = float(rate)
+        self.lock = threading.Lock()
+        self.flows: List[Flow] = []
+        self.total = 0
+        self._tat = time.monotonic()
+        self._alloc_at = 0.0
+
+    def set_rate(self, rate: int):
+        """Đổi ngân sách khi đang chạy: có hiệu lực ngay với mọi luồng (kể cả đang tải dở)."""
+        with self.lock:
+            now = time.monotonic()
+            self.rate = float(rate)
+            self._tat = min(self._tat, now)
+            for f in self.flows:
+                f._tat = min(f._tat, now)
+            self._allocate(now)
+
+    def open(self, weight: float = 1) -> Flow:
+        with self.lock:
+            now = time.monotonic()
+            flow = Flow(self, weight, now)
+            self.flows.append(flow)
+            self._allocate(now)
+            return flow
+
+    def close(self, flow: Optional[Flow]):
+        if flow is None:
+            return
+        with self.lock:
+            if flow in self.flows:
+                self.flows.remove(flow)
+                self._allocate(time.monotonic())
+
+    def consume(self, flow: Flow, n: int):
+        with self.lock:
+            now = time.monotonic()
+            flow.used += n
+            self.total += n
+            if now - self._alloc_at >= REALLOC_SECONDS or (not flow.hungry and n / flow.share > REALLOC_SECONDS):
+                flow.hungry = True     # luồng vừa nghỉ xong (hậu xử lý, giữa 2 file) lại chạy
+                self._allocate(now)
+            flow._tat = max(flow._tat, now) + n / flow.share
+            self._tat = max(self._tat, now) + n / self.rate
+            wait = max(flow._tat, self._tat) - now - BURST_SECONDS
+        if wait > 0:
+            time.sleep(wait)
+
+    def _allocate(self, now: float):
+        prev, self._alloc_at = self._alloc_at, now
+        if not self.flows:
+            return
+        floor = self.rate * MIN_SHARE
+        demand = {}
+        for f in self.flows:
+            dt = now - max(f.since, prev)
+            if dt > 0.05:
+                f.rate, f.used = f.used / dt, 0
+                f.hungry = not f.share or f.rate >= HUNGRY * f.share
+            demand[f] = float("inf") if f.hungry else max(f.rate * 1.2, floor)
+
+        left, pending = self.rate, list(self.flows)
+        while pending:
+            w = sum(f.weight for f in pending)
+            capped = [f for f in pending if demand[f] < left * f.weight / w]
+            if not capped:
+                for f in pending:
+                    f.share = left * f.weight / w
+                return
+            for f in capped:
+                f.share = demand[f]
+                left -= demand[f]
+                pending.remove(f)
+        # mọi luồng đều dùng ít hơn phần chia: chia nốt phần thừa để luồng nào tăng tốc được ngay
+        w = sum(f.weight for f in self.flows)
+        for f in self.flows:
+            f.share += max(left, 0) * f.weight / w
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {"budget": int(self.rate), "flows": len(self.flows),
+                    "rate": int(sum(f.rate for f in self.flows)), "bytes": self.total}
+
+
+# --------- Luồng hiện tại (cho code upload không biết gì về orchestrator) ----------
+_local = threading.local()
+
+
+def current_flow() -> Optional[Flow]:
+    return getattr(_local, "flow", None)
+
+
+@contextmanager
+def flow_scope(gov: Optional[Governor], weight: float = 1):
+    """Mở 1 luồng trong ngân sách `gov` cho đoạn code đang chạy (gov=None -> không giới hạn)."""
+    if gov is None:
+        yield None
+        return
+    flow = gov.open(weight)
+    _local.flow = flow
+    try:
+        yield flow
+    finally:
+        _local.flow = None
+        gov.close(flow)
+
+
+class ThrottledReader:
+    """Bọc file object: mỗi lần read() tính vào luồng băng thông. Các thuộc tính khác đi thẳng xuống file."""
+
+    def __init__(self, fileobj, flow: Flow):
+        self._f = fileobj
+        self._flow = flow
+
+    def read(self, n: int = -1) -> bytes:
+        data = self._f.read(n)
+        if data:
+            self._flow.gov.consume(self._flow, len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+    def __iter__(self):
+        return iter(lambda: self.read(64 * 1024), b"")
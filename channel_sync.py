@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Đồng bộ kênh/playlist theo mốc: chỉ liệt kê từ mới nhất tới chỗ đã tải, đưa phần mới vào hàng tải
+
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from orchestrator import build_ydl
+
+SYNC_FILE = ".sync.json"
+STOP_AFTER_KNOWN = 5    # gặp N id đã tải liên tiếp -> phần còn lại đã đồng bộ (chịu được vài video bị ẩn/ghim)
+
+# nguồn liệt kê mới nhất trước: tab của kênh, playlist "uploads" (UU...)
+_NEWEST_FIRST = re.compile(r"youtube\.com/(@[^/?#]+|channel/|c/|user/)(?!.*/playlists)|[?&]list=UU", re.I)
+
+
+class SyncItem:
+    def __init__(self, url: str, video_id: str, source: str, date: str = ""):
+        self.url = url
+        self.id = video_id
+        self.source = source
+        self.sources = [source]  # mọi nguồn liệt kê video này (sync_sources gộp id trùng giữa các nguồn)
+        self.date = date        # YYYYMMDD nếu trang liệt kê có, "" nếu không
+
+
+class SyncState:
+    """
+    downloads/.sync.json: {"<nguồn>": {"ids": [...], "latest": "YYYYMMDD", "retry": {id: url}, "at": ts}}.
+    Chỉ ghi id của video đã tải xong; mục lỗi nằm ở "retry" và được đưa lại vào lần đồng bộ sau
+    (kể cả khi đã nằm sau mốc dừng).
+    """
+
+    def __init__(self, download_dir: Path):
+        self.path = Path(download_dir) / SYNC_FILE
+        self.lock = threading.Lock()
+        self.sources: Dict[str, dict] = {}
+        if self.path.exists():
+            try:
+                self.sources = json.loads(self.path.read_text(encoding="utf-8"))
+            except Exception:
+                pass
+        self._known = {src: set(s.get("ids", [])) for src, s in self.sources.items()}
+
+    def known(self, source: str) -> set:
+        with self.lock:
+            return set(self._known.get(source, ()))
+
+    def latest(self, source: str) -> str:
+        with self.lock:
+            return self.sources.get(source, {}).get("latest", "")
+
+    def retry(self, source: str) -> Dict[str, str]:
+        with self.lock:
+            return dict(self.sources.get(source, {}).get("retry", {}))
+
+    def mark(self, source: str, done: List[SyncItem], failed: List[SyncItem] = ()):
+        with self.lock:
+            s = self.sources.setdefault(source, {"ids": [], "latest": ""})
+            known = self._known.setdefault(source, set())
+            new = [it.id for it in done if it.id not in known]
+            s["ids"] = new + s["ids"]      # mới nhất đứng đầu
+            known.update(new)
+            s["latest"] = max([s["latest"]] + [it.date for it in done])
+            retry = s.setdefault("retry", {})
+            for it in done:
+                retry.pop(it.id, None)
+            retry.update({it.id: it.url for it in failed})
+            s["at"] = time.time()
+
+    def save(self):
+        with self.lock:
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.sources, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(self.path)
+
+
+def _date(entry: dict) -> str:
+    if entry.get("upload_date"):
+        return str(entry["upload_date"])
+    ts = entry.get("timestamp") or entry.get("release_timestamp")
+    return datetime.fromtimestamp(ts).strftime("%Y%m%d") if ts else ""
+
+
+def _walk(ydl, url: str) -> Iterator[dict]:
+    """
+    Liệt kê phẳng (process=False): entries là generator của extractor nên mỗi trang chỉ được tải
+    khi lặp tới -> dừng giữa chừng thì không tải các trang cũ hơn.
+    """
+    yield from _flat(ydl, ydl.extract_info(url, download=False, process=False), 0)
+
+
+def _flat(ydl, info: Optional[dict], depth: int) -> Iterator[dict]:
+    while info and info.get("_type") in ("url", "url_transparent") and depth < 3:
+        info = ydl.extract_info(info["url"], download=False, process=False)   # @handle -> kênh
+        depth += 1
+    if not info:
+        return
+    if info.get("_type") not in ("playlist", "multi_video"):
+        yield info
+        return
+    for e in info.get("entries") or []:
+        if not e:
+            continue
+        if e.get("_type") in ("playlist", "multi_video") or e.get("ie_key") == "YoutubeTab":
+            # kênh không chỉ định tab -> các tab Videos / Shorts / Live
+            if depth < 3:
+                yield from _flat(ydl, e, depth + 1)
+            continue
+        yield e
+
+
+def new_items(ydl, source: str, state: SyncState, stop_after: int = STOP_AFTER_KNOWN) -> Tuple[List[SyncItem], int]:
+    """
+    -> (video mới của nguồn, số mục đã quét). Nguồn mới nhất-trước: dừng khi gặp `stop_after` id đã biết
+    liên tiếp hoặc video cũ hơn mốc ngày. Nguồn khác (playlist thường, thứ tự tuỳ người tạo) vẫn phải
+    liệt kê hết nhưng chỉ trả về id chưa tải.
+    """
+    known, latest = state.known(source), state.latest(source)
+    early = bool(known) and bool(_NEWEST_FIRST.search(source))
+    out: List[SyncItem] = []
+    streak = scanned = 0
+    for e in _walk(ydl, source):
+        vid = e.get("id")
+        if not vid:
+            continue
+        scanned += 1
+        date = _date(e)
+        if vid in known:
+            streak += 1
+            if early and streak >= stop_after:
+                break
+            continue
+        if early and latest and date and date < latest:
+            break
+        streak = 0
+        out.append(SyncItem(e.get("url") or e.get("webpage_url") or vid, vid, source, date))
+    found = {it.id for it in out}
+    out += [SyncItem(url, vid, source) for vid, url in state.retry(source).items() if vid not in found]
+    return out, scanned
+
+
+def sync_sources(sources: List[str], opts: dict, state: SyncState, jobs: int = 1,
+                 stop_after: int = STOP_AFTER_KNOWN) -> List[SyncItem]:
+    """
+    Quét song song các nguồn; trả về video mới theo thứ tự nguồn. Id trùng giữa các nguồn chỉ giữ 1 mục
+    (nguồn đầu tiên), các nguồn còn lại ghi vào item.sources để record() đánh dấu đã tải cho cả chúng.
+    """
+    base = {k: v for k, v in opts.items() if k not in ("progress_hooks", "match_filter", "format")}
+    base.update({"quiet": True, "no_warnings": True, "ignoreerrors": True})
+    base.pop("custom_postprocessors", None)
+    local = threading.local()
+
+    def one(src: str) -> List[SyncItem]:
+        if not hasattr(local, "ydl"):
+            local.ydl = build_ydl(base)
+        t0 = time.time()
+        try:
+            items, scanned = new_items(local.ydl, src, state, stop_after)
+        except Exception as e:
+            print(f"⚠️  Không quét được {src}: {e}")
+            return []
+        print(f"🔄 {src}: quét {scanned} mục, {len(items)} mới ({time.time() - t0:.1f}s)")
+        return items
+
+    with ThreadPoolExecutor(max_workers=max(int(jobs), 1), thread_name_prefix="sync") as ex:
+        results = list(ex.map(one, sources))
+    seen: Dict[str, SyncItem] = {}
+    for it in (it for items in results for it in items):
+        first = seen.setdefault(it.id, it)
+        if first is not it and it.source not in first.sources:
+            first.sources.append(it.source)
+    return list(seen.values())
+
+
+def record(state: SyncState, items: List[SyncItem], done_urls) -> int:
+    """
+    Ghi mốc cho các video đã tải xong (mục còn lại vào danh sách thử lại) dưới mọi nguồn đã liệt kê
+    video đó, rồi lưu. Trả về số video xong.
+    """
+    done_urls = set(done_urls)
+    by_src: Dict[str, Tuple[list, list]] = {}
+    for it in items:
+        for src in it.sources:
+            by_src.setdefault(src, ([], []))[it.url not in done_urls].append(it)
+    for src, (done, failed) in by_src.items():
+        state.mark(src, done, failed)
+    state.save()
+    return sum(it.url in done_urls for it in items)
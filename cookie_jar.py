@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Đọc file cookies 1 lần, kiểm tra sớm (định dạng, hạn, domain) và dùng chung jar cho mọi YoutubeDL
+
+import os
+import time
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from yt_dlp.cookies import YoutubeDLCookieJar
+
+REQUIRED_DOMAINS = ("youtube.com",)
+# cookie đăng nhập của Google/YouTube: còn 1 cái chưa hết hạn là đủ
+AUTH_COOKIES = ("SAPISID", "__Secure-1PSID", "__Secure-3PSID", "SID", "LOGIN_INFO")
+EXPIRY_WARN_DAYS = 3
+
+
+class SharedCookieJar(YoutubeDLCookieJar):
+    """Jar dùng chung nhiều YoutubeDL: save() tuần tự và không làm cache coi là file đã đổi."""
+
+    def save(self, *args, **kwargs):
+        with _lock:
+            super().save(*args, **kwargs)
+            key = str(Path(self.filename).resolve())
+            if key in _cache:
+                _cache[key] = (_stat(self.filename), self)
+
+
+_lock = threading.Lock()
+_cache: Dict[str, Tuple[tuple, SharedCookieJar]] = {}   # path -> ((mtime_ns, size), jar)
+
+
+def _stat(path) -> tuple:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def load_jar(path) -> SharedCookieJar:
+    """Parse file cookies Netscape; gọi lại với file chưa đổi (mtime/size) thì trả luôn jar đã parse."""
+    key = str(Path(path).resolve())
+    with _lock:
+        stat = _stat(key)
+        hit = _cache.get(key)
+        if hit and hit[0] == stat:
+            return hit[1]
+        jar = SharedCookieJar(key)
+        jar.load()
+        _cache[key] = (stat, jar)
+        return jar
+
+
+class CookieCheck:
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self.problems: List[str] = []   # lỗi chắc chắn làm hỏng cả lô -> dừng ngay
+        self.warnings: List[str] = []
+        self.expires_at: Optional[float] = None   # hạn sớm nhất của cookie đăng nhập còn hiệu lực
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+    def report(self) -> str:
+        lines = [f"Cookies {self.path}: {self.count} cookie"]
+        lines += [f"  ❌ {p}" for p in self.problems]
+        lines += [f"  ⚠️  {w}" for w in self.warnings]
+        return "\n".join(lines)
+
+
+def check_cookies(path, required_domains=REQUIRED_DOMAINS) -> CookieCheck:
+    """Parse (qua cache) và kiểm tra: đọc được, có cookie cho domain cần, cookie đăng nhập chưa hết hạn."""
+    res = CookieCheck(str(path))
+    try:
+        jar = load_jar(path)
+    except Exception as e:
+        res.problems.append(f"không đọc được (cần định dạng Netscape): {e}")
+        return res
+
+    now = time.time()
+    cookies = list(jar)
+    res.count = len(cookies)
+    for dom in required_domains:
+        mine = [c for c in cookies if c.domain.lstrip(".").endswith(dom)]
+        if not mine:
+            res.problems.append(f"không có cookie nào cho {dom}")
+            continue
+        auth = [c for c in mine if c.name in AUTH_COOKIES]
+        if not auth:
+            res.warnings.append(f"không thấy cookie đăng nhập cho {dom} (chỉ dùng như khách)")
+            continue
+        alive = [c for c in auth if not c.expires or c.expires > now]
+        if not alive:
+            last = max(c.expires for c in auth)
+            res.problems.append(f"cookie đăng nhập {dom} đã hết hạn từ {time.strftime('%Y-%m-%d', time.localtime(last))}")
+            continue
+        dated = [c.expires for c in alive if c.expires]
+        if dated:
+            soon = min(dated)
+            res.expires_at = soon if res.expires_at is None else min(res.expires_at, soon)
+            if soon - now < EXPIRY_WARN_DAYS * 86400:
+                res.warnings.append(f"cookie đăng nhập {dom} sắp hết hạn ({time.strftime('%Y-%m-%d %H:%M', time.localtime(soon))})")
+    return res
+
+
+def share_jar(ydl):
+    """Gắn jar đã parse vào YoutubeDL (thay cho việc mỗi instance tự đọc lại file cookies)."""
+    path = ydl.params.get("cookiefile")
+    if not path or ydl.params.get("cookiesfrombrowser") or not isinstance(path, (str, os.PathLike)):
+        return
+    try:
+        jar = load_jar(path)
+    except Exception:
+        return   # để yt-dlp tự báo lỗi như cũ
+    ydl.__dict__["cookiejar"] = jar   # YoutubeDL.cookiejar là cached_property
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Pool nhiều file cookies (mỗi file = 1 tài khoản) để chia tải, tránh bị giới hạn theo tài khoản
+
+import json
+import time
+import threading
+from pathlib import Path
+from typing import List, Optional, Set
+
+from orchestrator import build_ydl
+from cookie_jar import check_cookies
+
+
+STATE_FILE = ".pool_state.json"   # lưu trạng thái cách ly, nằm trong thư mục cookies
+QUARANTINE_BASE = 15 * 60          # lần bị chặn đầu: nghỉ 15 phút, sau đó tăng gấp đôi
+QUARANTINE_MAX = 6 * 3600
+THROTTLE_MARKERS = ("http error 429", "too many requests", "http error 403", "sign in to confirm")
+
+
+def is_throttle_error(err) -> bool:
+    msg = str(err).lower()
+    return any(m in msg for m in THROTTLE_MARKERS)
+
+
+class CookieProfile:
+    def __init__(self, path: Path):
+        self.path = path
+        self.name = path.name
+        self.health = 1.0            # 0..1, giảm khi lỗi, hồi dần khi thành công
+        self.strikes = 0             # số lần bị chặn liên tiếp
+        self.quarantined_until = 0.0
+        self.next_allowed = 0.0      # giới hạn nhịp riêng cho từng tài khoản
+        self.in_use = 0
+        self.ok = 0
+        self.errors = 0
+
+    def available(self, now: float) -> bool:
+        return now >= self.quarantined_until
+
+
+class CookiePool:
+    """
+    Thư mục chứa nhiều file cookies Netscape (*.txt). Mỗi profile có nhịp riêng (min_interval)
+    và điểm sức khoẻ; profile dính 403/429 bị cách ly với thời gian tăng dần.
+    """
+
+    def __init__(self, directory: Path, min_interval: float = 0.0):
+        self.dir = Path(directory)
+        self.min_interval = float(min_interval)
+        self.lock = threading.Lock()
+        self.profiles: List[CookieProfile] = []
+        for p in sorted(self.dir.glob("*.txt")):
+            if not p.is_file():
+                continue
+            chk = check_cookies(p)   # loại sớm tài khoản hỏng/hết hạn thay vì ăn 403 giữa lô
+            if chk.ok:
+                self.profiles.append(CookieProfile(p))
+            else:
+                print(f"⚠️  Bỏ qua {chk.report()}")
+        self._load_state()
+
+    def __len__(self):
+        return len(self.profiles)
+
+    # --------- Trạng thái bền ----------
+    def _load_state(self):
+        f = self.dir / STATE_FILE
+        if not f.exists():
+            return
+        try:
+            data = json.loads(f.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        for p in self.profiles:
+            st = data.get(p.name) or {}
+            p.health = float(st.get("health", p.health))
+            p.strikes = int(st.get("strikes", 0))
+            p.quarantined_until = float(st.get("quarantined_until", 0.0))
+
+    def _save_state(self):
+        data = {
+            p.name: {"health": round(p.health, 3), "strikes": p.strikes,
+                     "quarantined_until": p.quarantined_until}
+            for p in self.profiles
+        }
+        try:
+            (self.dir / STATE_FILE).write_text(json.dumps(data, indent=2), encoding="utf-8")
+        except Exception as e:
+            print(f"⚠️  Không lưu được trạng thái cookie pool: {e}")
+
+    # --------- Phân phối ----------
+    def acquire(self, exclude: Optional[Set[str]] = None) -> Optional[CookieProfile]:
+        """
+        Chọn profile khoẻ nhất, ít việc nhất. Chờ nếu profile đó chưa tới nhịp.
+        Trả về None nếu mọi profile đều đang bị cách ly (hoặc bị loại trừ).
+        """
+        exclude = exclude or set()
+        with self.lock:
+            now = time.time()
+            cands = [p for p in self.profiles if p.name not in exclude and p.available(now)]
+            if not cands:
+                return None
+            best = min(cands, key=lambda p: (p.in_use, max(p.next_allowed - now, 0), -p.health))
+            wait = best.next_allowed - now
+            best.next_allowed = max(now, best.next_allowed) + self.min_interval
+            best.in_use += 1
+        if wait > 0:
+            time.sleep(wait)
+        return best
+
+    def release(self, prof: CookieProfile):
+        with self.lock:
+            prof.in_use = max(prof.in_use - 1, 0)
+
+    def report_ok(self, prof: CookieProfile):
+        with self.lock:
+            prof.ok += 1
+            prof.strikes = 0
+            prof.health = min(1.0, prof.health + 0.05)
+        self.release(prof)
+
+    def report_error(self, prof: CookieProfile, err) -> bool:
+        """Ghi nhận lỗi. Trả về True nếu là lỗi bị chặn (403/429) -> nên thử profile khác."""
+        throttled = is_throttle_error(err)
+        with self.lock:
+            prof.errors += 1
+            if throttled:
+                prof.strikes += 1
+                prof.health = max(0.0, prof.health * 0.5)
+                backoff = min(QUARANTINE_BASE * (2 ** (prof.strikes - 1)), QUARANTINE_MAX)
+                prof.quarantined_until = time.time() + backoff
+                print(f"⚠️  Cookies {prof.name} bị chặn -> cách ly {int(backoff // 60)} phút.")
+                self._save_state()
+            else:
+                prof.health = max(0.0, prof.health - 0.02)
+        self.release(prof)
+        return throttled
+
+    def summary(self) -> str:
+        now = time.time()
+        parts = []
+        for p in self.profiles:
+            flag = "cách ly" if not p.available(now) else f"{p.health:.2f}"
+            parts.append(f"{p.name}[{flag}]")
+        return ", ".join(parts)
+
+
+# =============== Tải qua pool ===============
+def download_with_pool(pool: CookiePool, urls: List[str], opts: dict, per_item_opts=None) -> int:
+    """
+    Tải từng URL với 1 profile từ pool; bị chặn thì cách ly profile và thử profile khác.
+    per_item_opts(idx) -> dict: tuỳ chọn riêng cho mục thứ idx (vd: autonumber_start).
+    Trả về số mục thất bại.
+    """
+    failures = 0
+    for idx, url in enumerate(urls, 1):
+        tried: Set[str] = set()
+        while True:
+            prof = pool.acquire(exclude=tried)
+            if prof is None:
+                print(f"❌ Không còn cookies khả dụng cho: {url}")
+                failures += 1
+                break
+            item_opts = {**opts, "cookiefile": str(prof.path), "ignoreerrors": False}
+            if per_item_opts:
+                item_opts.update(per_item_opts(idx))
+            try:
+                with build_ydl(item_opts) as ydl:
+                    ydl.download([url])
+                pool.report_ok(prof)
+                break
+            except Exception as e:
+                if pool.report_error(prof, e):
+                    tried.add(prof.name)
+                    continue
+                print(f"\n❌ Lỗi ({prof.name}): {e}")
+                failures += 1
+                break
+    return failures
+
+
+def expand_for_pool(urls: List[str], pool: CookiePool) -> List[str]:
+    """Trải playlist thành từng video để các profile chia nhau từng mục."""
+    from work_queue import expand_urls
+
+    prof = pool.acquire()
+    try:
+        items = expand_urls(urls, str(prof.path) if prof else None)
+    finally:
+        if prof:
+            pool.release(prof)
+    return [u for u, _ in items]
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Chế độ chỉ lấy metadata: extract_info(download=False) song song cao, ghi dần ra JSONL/Parquet, không tải media
+
+import glob
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from bandwidth import Governor
+from orchestrator import build_ydl
+
+CRAWL_JOBS = 16
+PARQUET_BATCH = 2000
+DEFAULT_FIELDS = ("id", "title", "duration", "view_count", "like_count", "comment_count", "channel",
+                  "channel_id", "uploader", "upload_date", "timestamp", "webpage_url", "categories", "tags",
+                  "age_limit", "live_status", "availability", "description", "formats")
+FORMAT_FIELDS = ("format_id", "ext", "protocol", "acodec", "vcodec", "width", "height", "fps",
+                 "tbr", "abr", "vbr", "asr", "audio_channels", "filesize", "filesize_approx")
+_INT = {"view_count", "like_count", "comment_count", "timestamp", "age_limit"}
+_FLOAT = {"duration"}
+
+
+def slim(info: dict, fields: Sequence[str] = DEFAULT_FIELDS) -> dict:
+    """Giữ các trường cần cho catalog; formats chỉ còn thông số (bỏ url, fragments, headers...)."""
+    rec = {k: info.get(k) for k in fields if info.get(k) is not None}
+    if "formats" in rec:
+        rec["formats"] = [{k: f[k] for k in FORMAT_FIELDS if f.get(k) is not None} for f in rec["formats"]]
+    return rec
+
+
+class _JsonlSink:
+    def __init__(self, path: Path):
+        self.f = open(path, "a", encoding="utf-8")
+
+    def write(self, rec: dict):
+        self.f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self.f.close()
+
+
+def parquet_parts(path: Path) -> List[Path]:
+    """
+    Catalog parquet gồm OUT.parquet + OUT.1.parquet, OUT.2.parquet... (mỗi lần chạy lại thêm 1 part,
+    không ghi đè part cũ); đọc chung: pyarrow.dataset.dataset(parquet_parts(OUT)).
+    """
+    return ([path] if path.exists() else []) + [p for _, p in _numbered_parts(path)]
+
+
+def _numbered_parts(path: Path) -> List[tuple]:
+    pat = re.compile(rf"{re.escape(path.stem)}\.(\d+)\.parquet")
+    return sorted((int(m.group(1)), p) for p in path.parent.glob(f"{glob.escape(path.stem)}.*.parquet")
+                  if (m := pat.fullmatch(p.name)))
+
+
+class _ParquetSink:
+    """
+    Ghi theo lô qua ParquetWriter; trường lồng nhau (formats, tags...) lưu dạng chuỗi JSON.
+    OUT đã có -> ghi sang part kế tiếp (OUT.N.parquet); file chỉ được tạo khi có dòng đầu tiên.
+    """
+
+    def __init__(self, path: Path, fields: Sequence[str]):
+        import pyarrow as pa   # pip install pyarrow
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.pq = pq
+        self.fields = list(fields)
+        self.schema = pa.schema([(k, pa.int64() if k in _INT else pa.float64() if k in _FLOAT else pa.string())
+                                 for k in self.fields])
+        numbered = _numbered_parts(path)
+        if numbered or path.exists():
+            self.path = path.with_name(f"{path.stem}.{numbered[-1][0] + 1 if numbered else 1}.parquet")
+        else:
+            self.path = path
+        self.writer = None
+        self.rows: List[dict] = []
+
+    def _cell(self, k, v):
+        if v is None or k in _INT or k in _FLOAT:
+            return v
+        return v if isinstance(v, str) else json.dumps(v, ensure_ascii=False)
+
+    def write(self, rec: dict):
+        self.rows.append({k: self._cell(k, rec.get(k)) for k in self.fields})
+        if len(self.rows) >= PARQUET_BATCH:
+            self._flush()
+
+    def _flush(self):
+        if self.rows:
+            if self.writer is None:
+                self.writer = self.pq.ParquetWriter(str(self.path), self.schema)
+            self.writer.write_table(self.pa.Table.from_pylist(self.rows, schema=self.schema))
+            self.rows = []
+
+    def close(self):
+        self._flush()
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _done_ids(path: Path) -> set:
+    """File kết quả đã có (chạy lại sau khi dừng giữa chừng) -> id + webpage_url của các video đã lấy."""
+    ids = set()
+    if path.suffix == ".parquet":
+        parts = parquet_parts(path)
+        if parts:
+            import pyarrow.parquet as pq   # pip install pyarrow
+        for part in parts:
+            try:
+                cols = [c for c in ("id", "webpage_url") if c in pq.read_schema(str(part)).names]
+                table = pq.read_table(str(part), columns=cols)
+            except Exception as e:
+                # part đang ghi dở lúc dừng (thiếu footer): video trong đó sẽ được lấy lại vào part mới
+                print(f"⚠️  Bỏ qua {part.name} (không đọc được: {e})")
+                continue
+            for c in cols:
+                ids.update(v for v in table.column(c).to_pylist() if v)
+    elif path.exists():
+        with open(path, encoding="utf-8") as f:
+            for ln in f:
+                try:
+                    rec = json.loads(ln)
+                except ValueError:
+                    continue      # dòng cuối bị cắt khi dừng giữa chừng
+                ids.update(v for v in (rec.get("id"), rec.get("webpage_url")) if v)
+    return ids
+
+
+class Crawler:
+    """
+    Mỗi luồng 1 YoutubeDL ấm; playlist/kênh được liệt kê phẳng (process=False) rồi từng video được
+    đẩy lại vào pool -> 1 playlist lớn cũng chạy song song `jobs` luồng.
+    rps: trần số video/giây cho cả tiến trình (0 = không giới hạn), dùng chung bộ điều tiết của bandwidth.py.
+    """
+
+    def __init__(self, opts: dict, out: Path, jobs: int = CRAWL_JOBS, rps: float = 0,
+                 fields: Sequence[str] = DEFAULT_FIELDS):
+        self.out = Path(out)
+        self.fields = tuple(fields)
+        self.jobs = max(int(jobs), 1)
+        base = {k: v for k, v in opts.items()
+                if k not in ("progress_hooks", "postprocessor_hooks", "match_filter", "postprocessors",
+                             "custom_postprocessors", "format", "outtmpl")}
+        base.update({"quiet": True, "no_warnings": True, "skip_download": True, "ignoreerrors": False})
+        self.base = base
+        self.gov = Governor(rps) if rps else None
+        self._flow = self.gov.open() if self.gov else None
+        self._local = threading.local()
+        self.lock = threading.Lock()
+        self._idle = threading.Condition(self.lock)
+        self._pending = 0
+        self.seen = _done_ids(self.out)
+        self.skipped = sum(1 for v in self.seen if "://" not in v)
+        self.written = 0
+        self.failed: List[str] = []
+        self.started = time.time()
+
+    def _ydl(self):
+        if not hasattr(self._local, "ydl"):
+            self._local.ydl = build_ydl(self.base)
+        return self._local.ydl
+
+    def _submit(self, url: str):
+        with self.lock:
+            self._pending += 1
+        self.pool.submit(self._one, url)
+
+    def _one(self, url: str):
+        try:
+            if self.gov:
+                self.gov.consume(self._flow, 1)
+            info = self._ydl().extract_info(url, download=False, process=False)
+            depth = 0
+            while info and info.get("_type") in ("url", "url_transparent") and depth < 3:
+                info = self._ydl().extract_info(info["url"], download=False, process=False)
+                depth += 1
+            if not info:
+                raise RuntimeError("không có dữ liệu")
+            if info.get("_type") in ("playlist", "multi_video"):
+                for e in info.get("entries") or []:
+                    if e:
+                        self._entry(e)
+            else:
+                self._emit(info)
+        except Exception as e:
+            with self.lock:
+                self.failed.append(url)
+            print(f"⚠️  {url}: {str(e).splitlines()[0][:200]}")
+        finally:
+            with self.lock:
+                self._pending -= 1
+                self._idle.notify_all()
+
+    def _entry(self, e: dict):
+        if e.get("_type") in ("playlist", "multi_video"):
+            for x in e.get("entries") or []:
+                if x:
+                    self._entry(x)
+            return
+        if e.get("_type") in ("url", "url_transparent"):
+            with self.lock:
+                if e.get("id") in self.seen:
+                    return
+            self._submit(e.get("url") or e.get("webpage_url"))
+            return
+        self._emit(e)
+
+    def _emit(self, info: dict):
+        rec = slim(info, self.fields)
+        with self.lock:
+            if rec.get("id") in self.seen:
+                return
+            self.seen.update(v for v in (rec.get("id"), rec.get("webpage_url")) if v)
+            self.sink.write(rec)
+            self.written += 1
+            if self.written % 500 == 0:
+                rate = self.written / max(time.time() - self.started, 1e-6)
+                print(f"   … {self.written} video ({rate:.1f}/s), còn {self._pending} mục trong hàng")
+
+    def run(self, urls: List[str]) -> dict:
+        self.out.parent.mkdir(parents=True, exist_ok=True)
+        self.sink = _ParquetSink(self.out, self.fields) if self.out.suffix == ".parquet" else _JsonlSink(self.out)
+        try:
+            with ThreadPoolExecutor(self.jobs, thread_name_prefix="crawl") as self.pool:
+                for u in dict.fromkeys(urls):
+                    if u not in self.seen:     # link video đơn đã có trong file -> khỏi extract lại
+                        self._submit(u)
+                with self._idle:
+                    self._idle.wait_for(lambda: self._pending == 0)
+        finally:
+            self.sink.close()
+        if self.failed:
+            Path(f"{self.out}.failed.txt").write_text("\n".join(self.failed) + "\n", encoding="utf-8")
+        return {"written": self.written, "skipped": self.skipped, "failed": len(self.failed),
+                "seconds": round(time.time() - self.started, 1)}
+
+
+def crawl(urls: List[str], opts: dict, out, jobs: int = CRAWL_JOBS, rps: float = 0,
+          fields: Optional[Sequence[str]] = None) -> dict:
+    """Chạy 1 lượt crawl và in tổng kết. URL lỗi được ghi ra <out>.failed.txt để chạy lại."""
+    c = Crawler(opts, Path(out), jobs, rps, fields or DEFAULT_FIELDS)
+    print(f"🔎 Crawl metadata: {len(urls)} URL, {c.jobs} luồng"
+          + (f", tối đa {rps:g} video/s" if rps else "") + f" -> {c.out}"
+          + (f" (bỏ qua {c.skipped} video đã có)" if c.skipped else ""))
+    stats = c.run(urls)
+    part = getattr(c.sink, "path", c.out)
+    print(f"✅ Crawl xong: {stats['written']} video trong {stats['seconds']}s"
+          + (f" -> {part.name}" if part != c.out and stats["written"] else "")
+          + (f", {stats['failed']} URL lỗi ({c.out}.failed.txt)" if stats["failed"] else ""))
+    return stats
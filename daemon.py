@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Chế độ thường trú: giữ pipeline ấm (YoutubeDL, cookies, repo HF) và nhận job qua HTTP/JSON cục bộ
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+from lanes import parse_lines
+from link_watch import watch_into
+from orchestrator import Event, Orchestrator, install_stop_signals
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8787
+
+USAGE = f"""\
+API (JSON, mặc định http://{DEFAULT_HOST}:{DEFAULT_PORT}; đặt YT_DAEMON_TOKEN để bắt buộc 'Authorization: Bearer <token>'):
+  POST /jobs              {{"urls": ["URL #urgent @30m", ...]}}  hoặc  {{"urls": [...], "lane": "bulk", "deadline": "2h"}}
+  GET  /jobs              danh sách job          GET /jobs/<id>   trạng thái 1 job
+  POST /jobs/<id>/cancel  huỷ 1 job              GET /metrics     số liệu theo trạng thái / làn
+  POST /shutdown          {{"drain": true}}: xong mục đang tải rồi thoát
+  GET  /config            tham số đang chạy      POST /config     {{"jobs": 4, "bandwidth": 5000000, ...}} đổi nóng
+                          (jobs, upload_workers, bandwidth, upload_bandwidth, ratelimit, sleep_interval,
+                           max_sleep_interval, sleep_requests; áp từ request / lượt kế tiếp, không cần khởi động lại)
+
+Client:
+  python daemon.py submit URL [#urgent] [@30m] ...   python daemon.py status [ID]
+  python daemon.py cancel ID    python daemon.py metrics    python daemon.py shutdown [--now]
+  python daemon.py config       python daemon.py tune jobs=4 bandwidth=5000000 sleep_interval=1
+  (--port N, --host H; ENV YT_DAEMON_URL=http://host:port)
+"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    orch: Orchestrator = None
+    token: str = ""
+
+    def log_message(self, fmt, *args):   # im lặng, sự kiện đã in qua on_event
+        pass
+
+    def _reply(self, code: int, obj):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self) -> bool:
+        if not self.token:
+            return True
+        if self.headers.get("Authorization", "") == f"Bearer {self.token}":
+            return True
+        self._reply(401, {"error": "unauthorized"})
+        return False
+
+    def _body(self) -> dict:
+        n = int(self.headers.get("Content-Length") or 0)
+        if not n:
+            return {}
+        return json.loads(self.rfile.read(n).decode("utf-8"))
+
+    def _parts(self):
+        return [p for p in self.path.split("?")[0].split("/") if p]
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        parts = self._parts()
+        if parts == ["metrics"]:
+            return self._reply(200, self.orch.metrics())
+        if parts == ["config"]:
+            return self._reply(200, self.orch.knobs())
+        if parts == ["jobs"]:
+            return self._reply(200, [j.to_dict() for j in self.orch.list_jobs()])
+        if len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+            job = self.orch.get_job(int(parts[1]))
+            return self._reply(200, job.to_dict()) if job else self._reply(404, {"error": "not found"})
+        self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        parts = self._parts()
+        try:
+            body = self._body()
+        except ValueError:
+            return self._reply(400, {"error": "JSON không hợp lệ"})
+        if parts == ["jobs"]:
+            lines = body.get("urls") or []
+            if isinstance(lines, str):
+                lines = [lines]
+            suffix = " ".join(t for t in (f"#{body['lane']}" if body.get("lane") else "",
+                                          f"@{body['deadline']}" if body.get("deadline") else "") if t)
+            urls, tags = parse_lines([f"{ln} {suffix}" for ln in lines])
+            if not urls:
+                return self._reply(400, {"error": "thiếu urls"})
+            try:
+                jobs = self.orch.submit_threadsafe(urls, tags)
+            except RuntimeError as e:
+                return self._reply(503, {"error": str(e)})
+            return self._reply(201, [j.to_dict() for j in jobs])
+        if len(parts) == 3 and parts[0] == "jobs" and parts[1].isdigit() and parts[2] == "cancel":
+            job = self.orch.cancel_job(int(parts[1]))
+            return self._reply(200, job.to_dict()) if job else self._reply(404, {"error": "not found"})
+        if parts == ["config"]:
+            try:
+                knobs = {k: (float(v) if "sleep" in k else int(v)) for k, v in body.items() if v is not None}
+                return self._reply(200, self.orch.tune(**knobs))
+            except (TypeError, ValueError) as e:
+                return self._reply(400, {"error": str(e)})
+        if parts == ["shutdown"]:
+            self._reply(202, {"stopping": True})
+            self.orch.cancel_threadsafe(drain=bool(body.get("drain", True)))
+            return
+        self._reply(404, {"error": "not found"})
+
+
+def serve(orch: Orchestrator, on_event: Callable[[Event], None], host: str = DEFAULT_HOST,
+          port: Optional[int] = DEFAULT_PORT, token: Optional[str] = None, watch=None):
+    """
+    Chạy orchestrator thường trú tới khi /shutdown hoặc Ctrl+C. Trả về toàn bộ job.
+    port=None: không mở HTTP API. watch=đường dẫn link.txt: đọc hết file rồi theo dõi các dòng ghi thêm.
+    """
+    httpd = None
+    if port is not None:
+        token = token if token is not None else os.getenv("YT_DAEMON_TOKEN", "")
+        handler = type("Handler", (_Handler,), {"orch": orch, "token": token})
+        httpd = ThreadingHTTPServer((host, port), handler)
+        httpd.daemon_threads = True
+    stop_watch = threading.Event()
+
+    async def main():
+        q = orch.subscribe()
+
+        async def pump():
+            while True:
+                ev = await q.get()
+                on_event(ev)
+                if ev.kind == "done":
+                    return
+
+        pump_task = asyncio.create_task(pump())
+        serve_task = asyncio.create_task(orch.serve())
+        # API chỉ mở sau khi event loop đã gắn vào orchestrator
+        await asyncio.sleep(0)
+        if httpd is not None:
+            threading.Thread(target=httpd.serve_forever, name="api", daemon=True).start()
+            print(f"🟢 Daemon sẵn sàng: http://{host}:{port}  (Ctrl+C để dừng)")
+        if watch is not None:
+            watch_into(orch, watch, stop_watch)
+            print(f"👀 Đang theo dõi {watch}: thêm dòng vào file để tải tiếp  (Ctrl+C để dừng)")
+        jobs = await serve_task
+        await pump_task
+        return jobs
+
+    install_stop_signals(orch)
+    try:
+        return asyncio.run(main())
+    finally:
+        stop_watch.set()
+        if httpd is not None:
+            httpd.shutdown()
+            httpd.server_close()
+        orch.close()
+
+
+# =============== Client ===============
+def _base_url(argv) -> str:
+    host, port = DEFAULT_HOST, DEFAULT_PORT
+    if "--host" in argv:
+        host = argv[argv.index("--host") + 1]
+    if "--port" in argv:
+        port = int(argv[argv.index("--port") + 1])
+    return os.getenv("YT_DAEMON_URL", f"http://{host}:{port}").rstrip("/")
+
+
+def call(base: str, method: str, path: str, body: Optional[dict] = None):
+    req = urllib.request.Request(base + path, method=method,
+                                 data=json.dumps(body).encode("utf-8") if body is not None else None,
+                                 headers={"Content-Type": "application/json"})
+    token = os.getenv("YT_DAEMON_TOKEN")
+    if token:
+        req.add_header("Authorization", f"Bearer {token}")
+    with urllib.request.urlopen(req, timeout=30) as r:
+        return json.loads(r.read().decode("utf-8"))
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] in ("-h", "--help"):
+        print(USAGE)
+        return
+    cmd, rest = argv[1], list(argv[2:])
+    base = _base_url(rest)
+    for flag in ("--host", "--port"):
+        if flag in rest:
+            i = rest.index(flag)
+            del rest[i:i + 2]
+    if cmd == "submit":
+        res = call(base, "POST", "/jobs", {"urls": [" ".join(rest)]})
+    elif cmd == "status":
+        res = call(base, "GET", f"/jobs/{rest[0]}" if rest else "/jobs")
+    elif cmd == "cancel":
+        res = call(base, "POST", f"/jobs/{rest[0]}/cancel", {})
+    elif cmd == "metrics":
+        res = call(base, "GET", "/metrics")
+    elif cmd == "config":
+        res = call(base, "GET", "/config")
+    elif cmd == "tune":
+        res = call(base, "POST", "/config", dict(a.split("=", 1) for a in rest if "=" in a))
+    elif cmd == "shutdown":
+        res = call(base, "POST", "/shutdown", {"drain": "--now" not in rest})
+    else:
+        print(USAGE)
+        sys.exit(1)
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
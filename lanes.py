@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Làn ưu tiên cho bộ điều phối: urgent / normal / bulk, chia luồng theo trọng số, hạn chót từng job
+
+import re
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# trọng số chia luồng tải (và băng thông nếu có giới hạn tổng)
+LANES: Dict[str, int] = {"urgent": 8, "normal": 3, "bulk": 1}
+DEFAULT_LANE = "normal"
+PREEMPT_LANE = "urgent"       # job làn này được phép đẩy job làn thấp hơn ra khỏi luồng tải
+ESCALATE_SECONDS = 10 * 60    # còn <= 10 phút tới hạn -> phục vụ trước mọi làn
+
+_REL = re.compile(r"^(\d+(?:\.\d+)?)([smhd])$")
+_UNIT = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_deadline(text: str, now: Optional[float] = None) -> Optional[float]:
+    """'30m' / '2h' / '1d' (tính từ bây giờ) hoặc '2026-10-20T18:00' -> timestamp."""
+    now = time.time() if now is None else now
+    m = _REL.match(text.strip().lower())
+    if m:
+        return now + float(m.group(1)) * _UNIT[m.group(2)]
+    try:
+        return datetime.fromisoformat(text.strip()).timestamp()
+    except ValueError:
+        return None
+
+
+def parse_line(line: str) -> Tuple[str, str, Optional[float]]:
+    """
+    1 dòng link.txt: 'URL [#urgent|#normal|#bulk] [@30m|@2026-10-20T18:00]'.
+    Trả về (url, lane, deadline). Dòng chỉ có URL -> làn normal, không hạn chót.
+    """
+    parts = line.split()
+    url, lane, deadline = (parts[0] if parts else ""), DEFAULT_LANE, None
+    for tok in parts[1:]:
+        if tok.startswith("#") and tok[1:].lower() in LANES:
+            lane = tok[1:].lower()
+        elif tok.startswith("@"):
+            deadline = parse_deadline(tok[1:])
+    return url, lane, deadline
+
+
+def parse_lines(lines: List[str]):
+    """
+    -> (urls, tags) với tags[url] = (lane, deadline) cho Orchestrator.run.
+    Nhận cả dòng link.txt lẫn danh sách token rời (argv, nhập tay): #lane/@hạn gắn vào URL đứng trước.
+    '#' không phải tên làn = chú thích tới hết dòng.
+    """
+    urls: List[str] = []
+    tags: Dict[str, Tuple[str, Optional[float]]] = {}
+    for ln in lines:
+        for tok in ln.split():
+            if tok.startswith("#") and tok[1:].lower() not in LANES:
+                break
+            if tok.startswith(("#", "@")):
+                if urls:
+                    lane, deadline = tags[urls[-1]]
+                    _, lane2, deadline2 = parse_line(f"{urls[-1]} {tok}")
+                    tags[urls[-1]] = (lane2, deadline) if tok.startswith("#") else (lane, deadline2)
+                continue
+            urls.append(tok)
+            tags[tok] = (DEFAULT_LANE, None)
+    return urls, tags
+
+
+class LaneQueue:
+    """
+    Hàng đợi nhiều làn. pop(): job sắp trễ hạn trước, sau đó chọn làn theo stride scheduling
+    (làn trọng số w được phục vụ w lần trong mỗi vòng), trong làn: hạn chót sớm nhất rồi tới thứ tự vào.
+    Chỉ dùng từ 1 luồng (event loop của Orchestrator).
+    """
+
+    def __init__(self, weights: Optional[Dict[str, int]] = None):
+        self.weights = dict(weights or LANES)
+        self.q: Dict[str, list] = {lane: [] for lane in self.weights}
+        self._pass: Dict[str, float] = {lane: 0.0 for lane in self.weights}
+
+    def __len__(self):
+        return sum(len(v) for v in self.q.values())
+
+    def push(self, job, front: bool = False):
+        lane = job.lane if job.lane in self.q else DEFAULT_LANE
+        if not self.q[lane]:
+            # làn vừa có việc lại không được "dồn lượt" đã bỏ lỡ lúc trống
+            busy = [self._pass[l] for l in self.q if self.q[l]]
+            self._pass[lane] = max(self._pass[lane], min(busy)) if busy else self._pass[lane]
+        if front:
+            self.q[lane].insert(0, job)
+        else:
+            self.q[lane].append(job)
+
+    @staticmethod
+    def _edf(job):
+        return (job.deadline if job.deadline is not None else float("inf"), job.seq)
+
+    def peek_lane(self) -> Optional[str]:
+        """Làn có trọng số cao nhất đang có job chờ."""
+        waiting = [l for l in self.q if self.q[l]]
+        return max(waiting, key=lambda l: self.weights[l]) if waiting else None
+
+    def pop(self):
+        now = time.time()
+        urgent = [j for jobs in self.q.values() for j in jobs
+                  if j.deadline is not None and j.deadline - now <= ESCALATE_SECONDS]
+        if urgent:
+            job = min(urgent, key=self._edf)
+        else:
+            waiting = [l for l in self.q if self.q[l]]
+            if not waiting:
+                return None
+            lane = min(waiting, key=lambda l: (self._pass[l], -self.weights[l]))
+            job = min(self.q[lane], key=self._edf)
+        lane = job.lane if job.lane in self.q else DEFAULT_LANE
+        self.q[lane].remove(job)
+        self._pass[lane] += 1.0 / self.weights[lane]
+        return job
+
+    def remove(self, job) -> bool:
+        for jobs in self.q.values():
+            if job in jobs:
+                jobs.remove(job)
+                return True
+        return False
+
+    def drain(self) -> list:
+        out = [j for jobs in self.q.values() for j in jobs]
+        for jobs in self.q.values():
+            jobs.clear()
+        return out
+
+
+def lane_summary(jobs) -> str:
+    """Thống kê theo làn: xong/tổng, thời gian chờ trung bình & lớn nhất, số job trễ hạn."""
+    lines = []
+    for lane in LANES:
+        mine = [j for j in jobs if j.lane == lane]
+        if not mine:
+            continue
+        done = [j for j in mine if j.status == "done"]
+        waits = [j.started_at - j.queued_at for j in mine if j.started_at]
+        missed = [j for j in mine if j.missed_deadline]
+        wait_txt = (f"chờ TB {sum(waits) / len(waits):.0f}s, tối đa {max(waits):.0f}s" if waits else "chưa chạy")
+        with_deadline = sum(1 for j in mine if j.deadline is not None)
+        dl_txt = f", trễ hạn {len(missed)}/{with_deadline}" if with_deadline else ""
+        lines.append(f"  {lane:<7}: {len(done)}/{len(mine)} xong, {wait_txt}{dl_txt}")
+    return "\n".join(lines)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Upload file lớn qua giao thức LFS multipart của Hub: các phần được PUT song song, mỗi phần tự thử lại
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from urllib.parse import quote
+
+from huggingface_hub import constants
+from huggingface_hub.lfs import LFS_HEADERS, fix_hf_endpoint_in_url, post_lfs_batch_info
+from huggingface_hub.utils import build_hf_headers, hf_raise_for_status, http_backoff
+
+from bandwidth import ThrottledReader
+
+PART_WORKERS = 8
+MIN_BYTES = 256 * 1024 * 1024   # file nhỏ hơn: 1 luồng PUT là đủ, đi đường thường của huggingface_hub
+PART_RETRIES = 5                # mỗi phần; lần thử lại mở lại đúng đoạn file đó (không gửi lại cả file)
+
+
+class _Part:
+    """Đoạn [start, start+size) của file, đọc bằng file handle riêng -> các phần chạy song song được."""
+
+    def __init__(self, path: str, start: int, size: int):
+        self.f = open(path, "rb")
+        self.start = start
+        self.size = size
+        self.pos = 0
+        self.f.seek(start)
+
+    def read(self, n: int = -1) -> bytes:
+        left = self.size - self.pos
+        n = left if n is None or n < 0 else min(n, left)
+        data = self.f.read(n) if n > 0 else b""
+        self.pos += len(data)
+        return data
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self.pos, os.SEEK_END: self.size}[whence]
+        self.pos = max(0, min(base + offset, self.size))
+        self.f.seek(self.start + self.pos)
+        return self.pos
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter(lambda: self.read(1024 * 1024), b"")
+
+    def close(self):
+        self.f.close()
+
+
+def _put_part(path: str, url: str, start: int, size: int, flow, number: int, need_etag: bool = True) -> str:
+    """PUT 1 phần, trả về etag. Lỗi mạng / 5xx / 4xx tạm thời -> mở lại phần đó và thử lại (backoff luỹ thừa)."""
+    for attempt in range(PART_RETRIES + 1):
+        part = _Part(path, start, size)
+        try:
+            body = ThrottledReader(part, flow) if flow is not None else part
+            # max_retries=0: http_backoff không tua lại được body đã bọc -> vòng thử lại nằm ở đây
+            resp = http_backoff("PUT", url, content=body, headers={"Content-Length": str(size)}, max_retries=0)
+            hf_raise_for_status(resp)
+            etag = resp.headers.get("etag", "")
+            if need_etag and not etag:
+                raise ValueError(f"phần {number} không có etag")
+            return etag
+        except Exception as e:
+            if attempt == PART_RETRIES:
+                raise
+            wait = min(2 ** attempt, 30)
+            print(f"   ↻ phần {number}: {str(e).splitlines()[0]} -> thử lại sau {wait}s ({attempt + 1}/{PART_RETRIES})")
+            time.sleep(wait)
+        finally:
+            part.close()
+
+
+def upload_large(op, repo_id: str, repo_type: str, branch: str, token: Optional[str],
+                 workers: int = PART_WORKERS, min_bytes: int = MIN_BYTES, endpoint: Optional[str] = None) -> bool:
+    """
+    Đưa nội dung của `op` (CommitOperationAdd từ đường dẫn file) lên kho LFS trước khi commit:
+    hỏi batch endpoint, PUT các phần song song, gửi completion (+ verify nếu có).
+    Xong thì đánh dấu op đã upload (như preupload_lfs_files) -> create_commit chỉ gửi con trỏ LFS.
+    Trả về False nếu không áp dụng (file nhỏ / không phải file trên đĩa) để gọi đường thường.
+    """
+    path = op.path_or_fileobj
+    if not isinstance(path, str) or op.upload_info.size < min_bytes:
+        return False
+    endpoint = endpoint or constants.ENDPOINT
+    headers = build_hf_headers(token=token)
+    actions, errors, _ = post_lfs_batch_info(
+        upload_infos=[op.upload_info], token=None, repo_type=repo_type, repo_id=repo_id,
+        revision=quote(branch, safe=""), endpoint=endpoint, headers=headers, transfers=["basic", "multipart"])
+    if errors:
+        raise ValueError(f"LFS batch lỗi: {errors[0].get('error', {}).get('message')}")
+
+    action = actions[0] if actions else {}
+    upload = (action.get("actions") or {}).get("upload")
+    if upload is not None:   # không có "upload" = nội dung đã có trên Hub
+        href = fix_hf_endpoint_in_url(upload["href"], endpoint=endpoint)
+        header = upload.get("header") or {}
+        flow = getattr(op, "flow", None)
+        size = op.upload_info.size
+        if header.get("chunk_size") is None:
+            # server chọn "basic" -> 1 lần PUT cả file
+            _put_part(path, href, 0, size, flow, 1, need_etag=False)
+        else:
+            chunk = int(header["chunk_size"])
+            urls: List[str] = [u for _, u in sorted((int(k), v) for k, v in header.items() if k.isdigit())]
+            if len(urls) != -(-size // chunk):
+                raise ValueError("LFS batch trả về số phần không khớp kích thước file")
+            with ThreadPoolExecutor(max(min(int(workers), len(urls)), 1), thread_name_prefix="lfs-part") as ex:
+                futs = [ex.submit(_put_part, path, u, i * chunk, min(chunk, size - i * chunk), flow, i + 1)
+                        for i, u in enumerate(urls)]
+                etags = [f.result() for f in futs]
+            resp = http_backoff("POST", href, headers=LFS_HEADERS, json={
+                "oid": op.upload_info.sha256.hex(),
+                "parts": [{"partNumber": i + 1, "etag": e} for i, e in enumerate(etags)]})
+            hf_raise_for_status(resp)
+        verify = (action.get("actions") or {}).get("verify")
+        if verify is not None:
+            resp = http_backoff("POST", fix_hf_endpoint_in_url(verify["href"], endpoint),
+                                headers=build_hf_headers(token=token, headers=verify.get("header")),
+                                json={"oid": op.upload_info.sha256.hex(), "size": size})
+            hf_raise_for_status(resp)
+    op._upload_mode = "lfs"
+    op._is_uploaded = True
+    return True
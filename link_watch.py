@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Theo dõi link.txt: chỉ đọc phần mới ghi thêm (theo byte offset) và đẩy vào bộ điều phối đang chạy
+
+import ctypes
+import ctypes.util
+import os
+import select
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional, Set
+
+from lanes import parse_lines
+
+POLL_SECONDS = 1.0
+
+# inotify (Linux), theo dõi thư mục chứa file để bắt cả kiểu lưu "ghi file mới rồi đổi tên" của editor
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+
+
+class LinkTail:
+    """Đọc dần 1 file text: mỗi lần read_new() trả về các dòng hoàn chỉnh mới xuất hiện từ lần trước."""
+
+    def __init__(self, path, offset: int = 0):
+        self.path = Path(path)
+        self.offset = offset
+
+    def read_new(self) -> List[str]:
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return []
+        if size < self.offset:
+            self.offset = 0          # file bị cắt ngắn / viết lại từ đầu
+        if size == self.offset:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        end = data.rfind(b"\n")
+        if end < 0:
+            return []                # dòng cuối chưa ghi xong -> đợi lần sau
+        self.offset += end + 1
+        return data[:end + 1].decode("utf-8", errors="replace").splitlines()
+
+
+def _inotify(directory: Path) -> Optional[int]:
+    """fd inotify theo dõi thư mục, None nếu không có (không phải Linux, hết watch...) -> quay về polling."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(fd, str(directory).encode(), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+def follow(path, on_lines: Callable[[List[str]], None], stop: threading.Event,
+           offset: int = 0, interval: float = POLL_SECONDS):
+    """Gọi on_lines(dòng mới) mỗi khi file có thêm dòng, tới khi stop được đặt."""
+    tail = LinkTail(path, offset)
+    fd = _inotify(tail.path.resolve().parent)
+    try:
+        while not stop.is_set():
+            lines = tail.read_new()
+            if lines:
+                on_lines(lines)
+            if fd is None:
+                stop.wait(interval)
+                continue
+            # vẫn có timeout: kiểm tra cờ dừng và đọc lại phòng khi inotify không báo (ổ mạng)
+            if select.select([fd], [], [], interval)[0]:
+                try:
+                    while os.read(fd, 4096):
+                        pass
+                except BlockingIOError:
+                    pass
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+
+def watch_into(orch, path, stop: threading.Event, offset: int = 0) -> threading.Thread:
+    """
+    Luồng nền: dòng mới của link.txt -> orch.submit_threadsafe (giữ #lane/@hạn như lúc đọc file).
+    URL đã đưa vào trong phiên này không bị thêm lại (vd. file bị viết lại toàn bộ).
+    """
+    seen: Set[str] = set()
+
+    def on_lines(lines: List[str]):
+        urls, tags = parse_lines(lines)
+        fresh = [u for u in dict.fromkeys(urls) if u not in seen]
+        if not fresh:
+            return
+        seen.update(fresh)
+        print(f"➕ {Path(path).name}: thêm {len(fresh)} link")
+        try:
+            orch.submit_threadsafe(fresh, tags)
+        except RuntimeError:
+            stop.set()               # bộ điều phối đang dừng
+
+    th = threading.Thread(target=follow, args=(path, on_lines, stop, offset), name="watch", daemon=True)
+    th.start()
+    return th
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Manifest metadata: JSONL append-only ở local, nén thành Parquet theo lô và đẩy kèm dữ liệu
+
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional
+
+RECORD_KEYS = ("id", "title", "duration", "uploader", "channel_id", "upload_date", "webpage_url",
+               "format_id", "format", "ext", "acodec", "vcodec", "abr", "vbr", "tbr", "asr",
+               "audio_channels", "width", "height", "fps", "samples")
+# cột ngoài RECORD_KEYS (do add() / run_hf ghi); khoá lạ khác gom vào cột "extra" (chuỗi JSON)
+EXTRA_KEYS = ("repo_path", "sha256", "size", "added_at", "shard_key", "repo_id", "revision",
+              "duplicate_of", "duplicate_ber")
+_INT = {"asr", "audio_channels", "width", "height", "samples", "size"}
+_FLOAT = {"duration", "abr", "vbr", "tbr", "fps", "added_at", "duplicate_ber"}
+
+
+def part_schema():
+    """Schema cố định cho mọi part parquet -> các part đọc chung được như 1 dataset."""
+    import pyarrow as pa
+
+    return pa.schema([(k, pa.int64() if k in _INT else pa.float64() if k in _FLOAT else pa.string())
+                      for k in RECORD_KEYS + EXTRA_KEYS + ("extra",)])
+
+
+def _cell(k: str, v):
+    if v is None:
+        return None
+    try:
+        if k in _INT:
+            return int(v)
+        if k in _FLOAT:
+            return float(v)
+    except (TypeError, ValueError):
+        return None
+    return v if isinstance(v, str) else json.dumps(v, ensure_ascii=False)
+
+
+def file_sha256(path: Path, chunk: int = 4 * 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(chunk)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+
+class ManifestWriter:
+    """
+    add(info, ...) ghi 1 dòng vào manifest.jsonl (không bao giờ sửa dòng cũ).
+    Đủ batch_size dòng mới -> ghi part-XXXXXX.parquet (hoặc .jsonl nếu thiếu pyarrow)
+    rồi gọi on_batch(part_path) để đẩy lên repo cùng đợt dữ liệu.
+    """
+
+    def __init__(self, path: Path, batch_size: int = 100,
+                 on_batch: Optional[Callable[[Path], None]] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = max(int(batch_size), 1)
+        self.on_batch = on_batch
+        self.lock = threading.Lock()
+        self._pending: List[dict] = []
+        self._parts_dir = self.path.parent / "manifest_parts"
+        self._seq = self._next_seq()
+
+    def _next_seq(self) -> int:
+        if not self._parts_dir.exists():
+            return 0
+        seqs = [int(p.stem.split("-")[-1]) for p in self._parts_dir.glob("part-*") if p.stem.split("-")[-1].isdigit()]
+        return max(seqs) + 1 if seqs else 0
+
+    def add(self, info: dict, local_path: Optional[Path] = None, repo_path: Optional[str] = None,
+            sha256: Optional[str] = None, size: Optional[int] = None, **extra):
+        rec = {k: info.get(k) for k in RECORD_KEYS if info.get(k) is not None}
+        rec.update({
+            "repo_path": repo_path,
+            "sha256": sha256 or (file_sha256(local_path) if local_path else None),
+            "size": size if size is not None else (Path(local_path).stat().st_size if local_path else None),
+            "added_at": time.time(),
+        })
+        rec.update({k: v for k, v in extra.items() if v is not None})
+        batch = None
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self._pending.append(rec)
+            if len(self._pending) >= self.batch_size:
+                batch = self._cut()
+        if batch and self.on_batch:
+            self.on_batch(batch)
+        return rec
+
+    def _cut(self) -> Path:
+        """Ghi các dòng đang chờ thành 1 part (đang giữ lock)."""
+        rows, self._pending = self._pending, []
+        self._parts_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            part = self._parts_dir / f"part-{self._seq:06d}.parquet"
+            schema = part_schema()
+            known = set(schema.names)
+            table = []
+            for r in rows:
+                row = {k: _cell(k, r.get(k)) for k in schema.names if k != "extra"}
+                other = {k: v for k, v in r.items() if k not in known}
+                row["extra"] = json.dumps(other, ensure_ascii=False) if other else None
+                table.append(row)
+            pq.write_table(pa.Table.from_pylist(table, schema=schema), str(part))
+        except ModuleNotFoundError:
+            part = self._parts_dir / f"part-{self._seq:06d}.jsonl"
+            part.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows), encoding="utf-8")
+        self._seq += 1
+        return part
+
+    def flush(self):
+        batch = None
+        with self.lock:
+            if self._pending:
+                batch = self._cut()
+        if batch and self.on_batch:
+            self.on_batch(batch)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Cache media dùng chung (run.py, run_hf-v3.py, GUI): khoá (video id, format id), LRU theo dung lượng
+
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from yt_dlp.postprocessor.common import PostProcessor
+
+DEFAULT_BUDGET_GB = 20
+FICLONE = 0x40049409   # ioctl reflink (btrfs/xfs) trên Linux
+
+
+def _reflink(src: Path, dst: Path):
+    import fcntl
+
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+def link_or_copy(src: Path, dst: Path):
+    """Hard link -> reflink -> copy (theo thứ tự rẻ nhất)."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+        return
+    except OSError:
+        pass
+    try:
+        _reflink(src, dst)
+        return
+    except (OSError, ImportError):
+        dst.unlink(missing_ok=True)
+    shutil.copy2(src, dst)
+
+
+class MediaCache:
+    """
+    <root>/objects/<id>/<format_id>.<ext> + <root>/index.db (SQLite, dùng được từ nhiều tiến trình).
+    File gốc vừa tải xong được hard link vào cache (không tốn thêm dung lượng khi còn bản ở downloads/),
+    lần sau cần cùng (id, format) thì link ngược ra đúng tên file yt-dlp chờ -> không tải lại.
+    """
+
+    def __init__(self, root: Path, budget_bytes: int = DEFAULT_BUDGET_GB * 1024 ** 3):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.budget = int(budget_bytes)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.root / "index.db"), timeout=30,
+                                  isolation_level=None, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS objects (video_id TEXT, format_id TEXT, path TEXT, size INTEGER, "
+            "last_used REAL, PRIMARY KEY (video_id, format_id))"
+        )
+        self.hits = 0
+        self.stored = 0
+
+    def get(self, video_id: str, format_id: str) -> Optional[Path]:
+        with self.lock:
+            row = self.db.execute("SELECT path FROM objects WHERE video_id = ? AND format_id = ?",
+                                  (video_id, format_id)).fetchone()
+            if not row:
+                return None
+            p = Path(row[0])
+            if not p.exists():
+                self.db.execute("DELETE FROM objects WHERE video_id = ? AND format_id = ?", (video_id, format_id))
+                return None
+            self.db.execute("UPDATE objects SET last_used = ? WHERE video_id = ? AND format_id = ?",
+                            (time.time(), video_id, format_id))
+            return p
+
+    def put(self, video_id: str, format_id: str, src: Path):
+        src = Path(src)
+        if not src.exists() or self.get(video_id, format_id):
+            return
+        dst = self.objects / video_id / f"{format_id}{src.suffix}"
+        if dst.exists():
+            dst.unlink()
+        link_or_copy(src, dst)
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?)",
+                            (video_id, format_id, str(dst), dst.stat().st_size, time.time()))
+            self.stored += 1
+            self._evict()
+
+    def _evict(self):
+        """Xoá mục dùng lâu nhất tới khi tổng dung lượng <= ngân sách (đang giữ lock)."""
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+        if total <= self.budget:
+            return
+        for vid, fid, path, size in self.db.execute(
+                "SELECT video_id, format_id, path, size FROM objects ORDER BY last_used").fetchall():
+            if total <= self.budget:
+                break
+            Path(path).unlink(missing_ok=True)
+            self.db.execute("DELETE FROM objects WHERE video_id = ? AND format_id = ?", (vid, fid))
+            total -= size
+
+    def materialize(self, video_id: str, format_id: str, dest: Path) -> bool:
+        src = self.get(video_id, format_id)
+        if not src:
+            return False
+        dest = Path(dest)
+        if not dest.exists():
+            link_or_copy(src, dest)
+        return True
+
+    # --------- progress hook ----------
+    def on_progress(self, d: dict):
+        """Tải xong 1 format (trước hậu xử lý) -> link file gốc vào cache."""
+        if d.get("status") != "finished":
+            return
+        info = d.get("info_dict") or {}
+        vid, fid, fn = info.get("id"), info.get("format_id"), d.get("filename")
+        if vid and fid and fn and "+" not in fid:
+            try:
+                self.put(vid, fid, Path(fn))
+            except Exception as e:
+                print(f"⚠️  Không lưu được vào cache: {e}")
+
+
+def _expected_files(info: dict):
+    """[(format_id, đường dẫn yt-dlp sẽ ghi)] cho mục sắp tải (cùng quy tắc đặt tên của yt-dlp)."""
+    fname = info.get("_filename")
+    if not fname:
+        return []
+    fmts = info.get("requested_formats")
+    if not fmts:
+        return [(info.get("format_id"), Path(fname))]
+    base = os.path.splitext(fname)[0]
+    return [(f.get("format_id"), Path(f"{base}.f{f.get('format_id')}.{f.get('ext')}")) for f in fmts]
+
+
+class CacheLookupPP(PostProcessor):
+    """before_dl: đủ mọi format trong cache -> link ra đúng tên, yt-dlp thấy file có sẵn nên bỏ qua bước tải."""
+
+    def __init__(self, cache: MediaCache, downloader=None):
+        super().__init__(downloader)
+        self.cache = cache
+
+    def run(self, info):
+        vid = info.get("id")
+        files = _expected_files(info)
+        if not vid or not files or any(not fid or "+" in fid for fid, _ in files):
+            return [], info
+        if all(self.cache.get(vid, fid) for fid, _ in files):
+            for fid, dest in files:
+                self.cache.materialize(vid, fid, dest)
+            self.cache.hits += 1
+            self.to_screen(f"⚡ Dùng cache cho {vid} ({', '.join(fid for fid, _ in files)})")
+        return [], info
+
+
+def open_cache(root: Optional[str], max_gb: Optional[float] = None) -> Optional[MediaCache]:
+    """root rỗng -> tắt cache. Mặc định lấy từ ENV YT_CACHE_DIR / YT_CACHE_GB."""
+    root = root or os.getenv("YT_CACHE_DIR", "")
+    if not root:
+        return None
+    gb = float(max_gb or os.getenv("YT_CACHE_GB") or DEFAULT_BUDGET_GB)
+    return MediaCache(Path(root), int(gb * 1024 ** 3))
+
+
+def attach_cache(opts: dict, cache: Optional[MediaCache]) -> Optional[MediaCache]:
+    if cache is None:
+        return None
+    opts["progress_hooks"] = list(opts.get("progress_hooks") or []) + [cache.on_progress]
+    opts["custom_postprocessors"] = list(opts.get("custom_postprocessors") or []) + [
+        (lambda ydl: CacheLookupPP(cache, ydl), "before_dl"),
+    ]
+    return cache
@@ -0,0 +1,698 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Lõi điều phối asyncio dùng chung cho run.py, run_hf-v3.py và GUI
+
+import asyncio
+import functools
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from yt_dlp import YoutubeDL
+from yt_dlp.utils import DownloadCancelled
+
+from bandwidth import Governor, flow_scope
+from cookie_jar import share_jar
+from lanes import DEFAULT_LANE, LANES, PREEMPT_LANE, LaneQueue, lane_summary
+
+
+def build_ydl(opts: dict) -> YoutubeDL:
+    """
+    Tạo YoutubeDL và gắn thêm các PostProcessor tuỳ biến của repo.
+    opts["custom_postprocessors"] = [(factory(ydl) -> PostProcessor, when)]; yt-dlp bỏ qua khoá này.
+    File cookies được parse 1 lần và dùng chung giữa các instance (cookie_jar).
+    """
+    ydl = YoutubeDL(dict(opts))   # YoutubeDL giữ nguyên dict params -> mỗi instance 1 bản để chỉnh riêng từng job
+    share_jar(ydl)
+    for factory, when in opts.get("custom_postprocessors") or []:
+        ydl.add_post_processor(factory(ydl), when=when)
+    return ydl
+
+
+class Event:
+    """kind: start | progress | finished | error | cancelled | preempted | deadline_missed
+          | upload_start | uploaded | upload_error | done"""
+    __slots__ = ("kind", "job", "data")
+
+    def __init__(self, kind: str, job=None, data=None):
+        self.kind = kind
+        self.job = job
+        self.data = data
+
+    def __repr__(self):
+        return f"Event({self.kind}, job={getattr(self.job, 'id', None)})"
+
+
+class Job:
+    def __init__(self, job_id: int, url: str, number: Optional[int] = None,
+                 lane: str = DEFAULT_LANE, deadline: Optional[float] = None):
+        self.id = job_id
+        self.url = url
+        self.number = number      # số thứ tự trong danh sách gốc (autonumber) khi thứ tự tải bị sắp lại
+        self.lane = lane if lane in LANES else DEFAULT_LANE
+        self.deadline = deadline  # timestamp hạn chót (None = không có)
+        self.seq = job_id
+        self.status = "queued"    # queued | running | done | error | cancelled
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self.turn: Optional[asyncio.Future] = None   # dispatcher set_result khi tới lượt chạy
+        self.params: Optional[dict] = None           # params của YoutubeDL đang tải job này
+        self.preempted = False
+        self.aborted = False      # huỷ riêng job này (API daemon)
+        self.has_slot = False     # đang giữ 1 luồng tải do dispatcher cấp
+        self.bytes = 0
+        self.queued_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.flow = None          # luồng trong ngân sách băng thông chung khi đang tải (bandwidth.Flow)
+        self.partials: set = set()     # file .part đang ghi -> còn lại khi bị huỷ (để resume/dọn)
+        self.leftovers: List[tuple] = []   # upload chưa kịp chạy khi dừng nhanh (file vẫn ở local)
+        self.done_ids: set = set()     # mục (playlist) đã xử lý xong -> bỏ qua khi chạy lại sau lúc nhường luồng
+
+    @property
+    def missed_deadline(self) -> bool:
+        if self.deadline is None:
+            return False
+        end = self.finished_at if self.finished_at else time.time()
+        return end > self.deadline or self.status in ("error", "cancelled")
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "url": self.url, "lane": self.lane, "deadline": self.deadline,
+                "status": self.status, "error": self.error, "bytes": self.bytes,
+                "queued_at": self.queued_at, "started_at": self.started_at, "finished_at": self.finished_at,
+                "missed_deadline": self.missed_deadline, "partials": sorted(self.partials)}
+
+
+class _JobHook:
+    """
+    Progress hook riêng của 1 YoutubeDL ấm: biết job đang chạy trên instance đó kể cả khi yt-dlp gọi hook
+    từ luồng tải fragment (không có thread-local của luồng tải).
+    """
+
+    def __init__(self, orch: "Orchestrator"):
+        self.orch = orch
+        self.job: Optional[Job] = None
+
+    def __call__(self, d):
+        self.orch._hook(d, self.job)
+
+
+class _Gate:
+    """Giới hạn số tác vụ chạy cùng lúc; đổi được giới hạn khi đang chạy (tác vụ đang chạy không bị ngắt)."""
+
+    def __init__(self, limit: int):
+        self.limit = max(int(limit), 1)
+        self.active = 0
+        self.cond = threading.Condition()
+
+    def resize(self, limit: int):
+        with self.cond:
+            self.limit = max(int(limit), 1)
+            self.cond.notify_all()
+
+    def __enter__(self):
+        with self.cond:
+            self.cond.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    def __exit__(self, *exc):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+
+class Orchestrator:
+    """
+    Chạy yt-dlp (blocking) trong pool luồng tải, upload trong pool luồng riêng để tải và đẩy
+    chồng lên nhau. Mọi tiến độ/kết quả phát ra qua luồng sự kiện async (subscribe()).
+    Mỗi luồng tải giữ 1 YoutubeDL "ấm" (session, cookies, số thứ tự) dùng lại giữa các job.
+
+    runner(job, opts): tuỳ chọn thay cách tải 1 job (vd: cookies pool). Mặc định YoutubeDL(opts).
+
+    Dừng:
+      cancel()           -> dừng nhanh: progress hook ném DownloadCancelled ngay trong lúc tải,
+                            upload chưa bắt đầu bị bỏ qua (file giữ lại ở local).
+      cancel(drain=True) -> không bắt đầu job/mục playlist mới, chờ mục đang tải và mọi upload xong.
+    keep_partial=False: xoá file .part của job bị huỷ thay vì giữ lại để lần sau tải tiếp.
+
+    Cuối lô (số job còn lại < số luồng tải), luồng rảnh được "cho mượn": concurrent_fragment_downloads
+    nhân lên theo số luồng thừa, tính khi job bắt đầu và tính lại cho mọi job đang chạy mỗi khi 1 luồng
+    rảnh ra. yt-dlp chỉ đọc giá trị này lúc bắt đầu tải 1 format, nên job đang chạy được hưởng từ format
+    kế tiếp (vd phần audio sau phần video, mục playlist sau) - format đang tải dở giữ số fragment cũ.
+    Chỉ có tác dụng với định dạng chia fragment (DASH/HLS) và YoutubeDL ấm (không qua runner).
+    MAX_FRAGMENTS giới hạn trên.
+
+    Làn ưu tiên (lanes.py): luồng tải chia theo trọng số urgent/normal/bulk, trong làn theo hạn chót.
+    Job urgent chờ mà mọi luồng đều bận -> job làn thấp nhất đang tải bị tạm dừng (file .part giữ lại)
+    và xếp lại đầu làn của nó. Job playlist chạy lại bỏ qua các mục đã xong (job.done_ids).
+
+    bandwidth (byte/s): ngân sách chung cho mọi job đang tải, kể cả các luồng fragment của từng job
+    (bandwidth.Governor, điều tiết ngay trong progress hook). Chia theo trọng số làn, phần job không
+    dùng hết dồn cho job khác. Thay cho ratelimit riêng từng YoutubeDL (N luồng = N lần ngân sách).
+    upload_bandwidth: tương tự cho các tác vụ upload (đọc file qua bandwidth.ThrottledReader).
+
+    tune(...) đổi nóng số luồng tải / upload, ngân sách băng thông và nhịp nghỉ (sleep_*, ratelimit)
+    mà không khởi động lại: băng thông có hiệu lực ngay, nhịp nghỉ từ request kế tiếp (kể cả của job
+    đang chạy), số luồng từ lượt phân job kế tiếp (giảm thì job đang chạy vẫn chạy nốt).
+    """
+
+    MAX_FRAGMENTS = 16
+    LIVE_PARAMS = ("ratelimit", "sleep_interval", "max_sleep_interval", "sleep_requests")
+    BUFFER_PARAMS = ("buffersize", "noresizebuffer")
+
+    def __init__(self, opts: dict, jobs: int = 1, upload_workers: int = 2,
+                 runner: Optional[Callable] = None, keep_partial: bool = True,
+                 bandwidth: Optional[int] = None, upload_bandwidth: Optional[int] = None):
+        self._user_filter = opts.get("match_filter")
+        self._user_hooks = list(opts.get("progress_hooks") or [])
+        self.opts = {
+            **opts,
+            "progress_hooks": self._user_hooks + [self._hook],
+            "match_filter": self._match_filter,
+            "postprocessor_hooks": list(opts.get("postprocessor_hooks") or []) + [self._pp_hook],
+        }
+        self.keep_partial = keep_partial
+        self._base_frags = max(int(opts.get("concurrent_fragment_downloads") or 1), 1)
+        self.governor = None
+        self._user_buffer = {k: self.opts[k] for k in self.BUFFER_PARAMS if k in self.opts}
+        self.upload_governor = Governor(upload_bandwidth) if upload_bandwidth else None
+        self.jobs = max(int(jobs), 1)
+        self.runner = runner
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subs: List[asyncio.Queue] = []
+        self._dl_pool = ThreadPoolExecutor(self.jobs, thread_name_prefix="dl")
+        self._up_pool = ThreadPoolExecutor(max(int(upload_workers), 1), thread_name_prefix="up")
+        self._up_gate = _Gate(upload_workers)
+        self._old_pools: List[ThreadPoolExecutor] = []
+        self._local = threading.local()
+        self._ydls: List[YoutubeDL] = []
+        self._set_bandwidth(bandwidth or 0)
+        self._uploads: set = set()
+        self._jobs: List[Job] = []
+        self._lanes = LaneQueue()
+        self._active = 0                                   # số job đang giữ luồng tải
+        self._abort = threading.Event()                    # dừng nhanh (đọc từ luồng tải)
+        self.cancelled = False                             # không bắt đầu job mới (cả 2 kiểu dừng)
+        self._stopped: Optional[asyncio.Event] = None      # chế độ thường trú (serve)
+        self.started_at = time.time()
+
+    # --------- Sự kiện ----------
+    def subscribe(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue()
+        self._subs.append(q)
+        return q
+
+    def emit(self, kind: str, job=None, data=None):
+        """An toàn khi gọi từ luồng tải/upload."""
+        ev = Event(kind, job, data)
+        if self.loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self._fanout(ev)
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._fanout, ev)
+
+    def _fanout(self, ev: Event):
+        for q in self._subs:
+            q.put_nowait(ev)
+
+    def _hook(self, d, job=None):
+        job = job or getattr(self._local, "job", None)
+        if job is not None and d.get("status") == "downloading" and d.get("tmpfilename"):
+            job.partials.add(d["tmpfilename"])
+        if job is not None and d.get("status") == "finished":
+            job.bytes += int(d.get("total_bytes") or d.get("downloaded_bytes") or 0)
+        if self._abort.is_set() or (job is not None and job.aborted):
+            raise DownloadCancelled("Đã huỷ theo yêu cầu")
+        if job is not None and job.preempted:
+            raise DownloadCancelled("Nhường luồng cho mục ưu tiên")
+        if job is not None and job.flow is not None and job.flow.gov is self.governor \
+                and d.get("status") == "downloading":
+            # ngủ ngay tại đây (luồng tải / luồng fragment) tới khi ngân sách cho phép
+            job.flow.progress(d.get("tmpfilename") or d.get("filename") or "", int(d.get("downloaded_bytes") or 0))
+        self.emit("progress", job, d)
+
+    def _pp_hook(self, d):
+        # MoveFiles là bước cuối của 1 mục (sau mọi hậu xử lý / upload trong hook) -> mục đã xong hẳn
+        if d.get("status") == "finished" and d.get("postprocessor") == "MoveFiles":
+            job = getattr(self._local, "job", None)
+            vid = (d.get("info_dict") or {}).get("id")
+            if job is not None and vid:
+                job.done_ids.add(vid)
+
+    def _match_filter(self, info, *, incomplete=False):
+        # Được gọi trước mỗi mục (kể cả từng video trong playlist) -> chặn mục mới khi đang dừng
+        if self.cancelled:
+            raise DownloadCancelled("Đã dừng: bỏ qua các mục còn lại")
+        job = getattr(self._local, "job", None)
+        if job is not None and info.get("id") in job.done_ids:
+            # playlist bị tạm dừng rồi chạy lại từ đầu: mục đã tải + upload (và xoá local) không làm lại
+            return f"{info.get('id')}: đã xong trước khi nhường luồng"
+        if self._user_filter:
+            return self._user_filter(info, incomplete=incomplete)
+        return None
+
+    # --------- Tải ----------
+    def _ydl(self) -> YoutubeDL:
+        ydl = getattr(self._local, "ydl", None)
+        if ydl is None:
+            hook = _JobHook(self)
+            ydl = build_ydl({**self.opts, "progress_hooks": self._user_hooks + [hook]})
+            self._local.ydl, self._local.hook = ydl, hook
+            self._ydls.append(ydl)
+        return ydl
+
+    def _tune(self, params: dict, job: Job, done_before: int = 0):
+        """Tham số riêng từng job trên YoutubeDL ấm: số thứ tự gốc và số fragment song song."""
+        if job.number is not None:
+            # autonumber = autonumber_start - 1 + số mục đã tải (tính cả mục này) của instance
+            params["autonumber_start"] = job.number - done_before
+        params["concurrent_fragment_downloads"] = self._fragments()
+        # giá trị đổi nóng (tune) cho YoutubeDL ấm tạo từ opts cũ
+        for k in self.LIVE_PARAMS + self.BUFFER_PARAMS:
+            if k in self.opts:
+                params[k] = self.opts[k]
+            else:
+                params.pop(k, None)
+        job.params = params
+
+    def _fragments(self) -> int:
+        pending = sum(1 for j in self._jobs if j.status in ("queued", "running"))
+        share = max(self.jobs // max(pending, 1), 1)
+        return min(self._base_frags * share, self.MAX_FRAGMENTS)
+
+    def _lend_idle(self):
+        """Có luồng rảnh (hết job chờ): chia lại fragment cho các job đang chạy (áp từ format kế tiếp)."""
+        if self._active >= self.jobs:
+            return
+        frags = self._fragments()
+        for j in self._jobs:
+            if j.status == "running" and j.params is not None and not self.runner:
+                j.params["concurrent_fragment_downloads"] = max(
+                    j.params.get("concurrent_fragment_downloads") or 1, frags)
+
+    def _run_blocking(self, job: Job):
+        self._local.job = job
+        job.flow = self.governor.open(LANES[job.lane]) if self.governor else None
+        try:
+            if self.runner:
+                opts = dict(self.opts)
+                opts["progress_hooks"] = self._user_hooks + [functools.partial(self._hook, job=job)]
+                self._tune(opts, job)
+                self.runner(job, opts)
+                return
+            ydl = self._ydl()
+            self._local.hook.job = job
+            self._tune(ydl.params, job, getattr(ydl, "_num_downloads", 0))
+            ret = ydl.download([job.url])
+            if ret:
+                raise RuntimeError(f"yt-dlp trả về mã lỗi {ret}")
+        finally:
+            if job.flow is not None:
+                job.flow.gov.close(job.flow)   # governor có thể đã bị thay (tune) trong lúc tải
+            job.flow = None
+            if getattr(self._local, "hook", None) is not None:
+                self._local.hook.job = None
+            self._local.job = None
+
+    async def _run_job(self, job: Job):
+        while True:
+            await job.turn
+            if self.cancelled or job.aborted:
+                job.status = "cancelled"
+                job.finished_at = time.time()
+                self.emit("cancelled", job)
+                if job.has_slot:
+                    self._release(job)
+                return
+            job.status = "running"
+            job.started_at = job.started_at or time.time()
+            self.emit("start", job)
+            err: Optional[Exception] = None
+            try:
+                await self.loop.run_in_executor(self._dl_pool, self._run_blocking, job)
+                job.status = "done"
+            except Exception as e:
+                if job.preempted and not self.cancelled:
+                    # nhường luồng: xếp lại đầu làn, lần sau tải tiếp từ file .part
+                    job.preempted = False
+                    job.status = "queued"
+                    job.params = None
+                    job.turn = self.loop.create_future()
+                    self._lanes.push(job, front=True)
+                    self.emit("preempted", job)
+                    self._release(job)
+                    continue
+                if isinstance(e, DownloadCancelled) or self._abort.is_set() or job.aborted:
+                    job.status = "cancelled"
+                    self._settle_partials(job)
+                else:
+                    job.status = "error"
+                    job.error = str(e)
+                    err = e
+            job.finished_at = time.time()
+            job.params = None
+            if job.status == "done":
+                self.emit("finished", job)
+                if job.missed_deadline:
+                    self.emit("deadline_missed", job)
+            elif job.status == "cancelled":
+                self.emit("cancelled", job)
+            else:
+                self.emit("error", job, err)
+            job.partials = {p for p in job.partials if Path(p).exists()}
+            self._release(job)
+            return
+
+    # --------- Phân luồng theo làn ----------
+    def _release(self, job: Job):
+        job.has_slot = False
+        self._active -= 1
+        self._dispatch()
+        self._lend_idle()
+
+    def _dispatch(self):
+        """Chạy trong event loop: giao luồng trống cho job kế tiếp theo làn; job urgent có thể chen ngang."""
+        if self.cancelled:
+            for j in self._lanes.drain():
+                if not j.turn.done():
+                    j.turn.set_result(None)   # job tự thấy cancelled và kết thúc
+            return
+        while self._active < self.jobs:
+            job = self._lanes.pop()
+            if job is None:
+                break
+            self._active += 1
+            job.has_slot = True
+            job.turn.set_result(None)
+        self._maybe_preempt()
+
+    def _maybe_preempt(self):
+        if self._lanes.peek_lane() != PREEMPT_LANE:
+            return
+        waiting = len(self._lanes.q[PREEMPT_LANE])
+        victims = [j for j in self._jobs if j.status == "running" and not j.preempted
+                   and LANES[j.lane] < LANES[PREEMPT_LANE]]
+        already = sum(1 for j in self._jobs if j.status == "running" and j.preempted)
+        # ưu tiên đẩy job làn thấp nhất, bắt đầu muộn nhất (ít công sức bị gián đoạn nhất)
+        victims.sort(key=lambda j: (LANES[j.lane], -(j.started_at or 0)))
+        for j in victims[:max(waiting - already, 0)]:
+            j.preempted = True
+
+    def _settle_partials(self, job: Job):
+        job.partials = {p for p in job.partials if Path(p).exists()}
+        if self.keep_partial:
+            return
+        for p in list(job.partials):
+            try:
+                Path(p).unlink()
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"⚠️  Không xoá được {p}: {e}")
+
+    # --------- Upload ----------
+    def upload(self, fn: Callable, *args, job=None):
+        """Đưa 1 tác vụ upload (blocking) vào pool upload. Gọi được từ hook trong luồng tải."""
+        job = job or getattr(self._local, "job", None)
+        fut = asyncio.run_coroutine_threadsafe(self._upload(fn, args, job), self.loop)
+        # ghi nhận ngay (trước khi job tải kết thúc) để run() chờ đủ các upload còn dở
+        self._uploads.add(fut)
+        fut.add_done_callback(self._uploads.discard)
+        return fut
+
+    def _guarded_upload(self, fn: Callable, args, job):
+        if self._abort.is_set():
+            if job is not None:
+                job.leftovers.append(args)
+            raise DownloadCancelled("Bỏ qua upload do dừng nhanh")
+        with self._up_gate, flow_scope(self.upload_governor,
+                                       LANES[job.lane] if job is not None else LANES[DEFAULT_LANE]):
+            return fn(*args)
+
+    async def _upload(self, fn: Callable, args, job):
+        self.emit("upload_start", job, args)
+        try:
+            res = await self.loop.run_in_executor(self._up_pool, self._guarded_upload, fn, args, job)
+            self.emit("uploaded", job, res)
+            return res
+        except Exception as e:
+            self.emit("upload_error", job, e)
+
+    # --------- Vòng đời ----------
+    async def run(self, urls: List[str], numbers: Optional[List[int]] = None,
+                  tags: Optional[dict] = None) -> List[Job]:
+        """
+        Trong cùng 1 làn, job bắt đầu theo đúng thứ tự urls; numbers[i] = số thứ tự gốc của urls[i]
+        (nếu đã sắp lại). tags[url] = (lane, deadline) từ lanes.parse_lines; thiếu -> làn normal.
+        """
+        self.loop = asyncio.get_running_loop()
+        new = self._submit(urls, numbers, tags)
+        try:
+            await asyncio.gather(*(j.task for j in new), return_exceptions=True)
+            while self._uploads:
+                await asyncio.gather(*(asyncio.wrap_future(f) for f in list(self._uploads)),
+                                     return_exceptions=True)
+        finally:
+            self.emit("done", None, new)
+        return new
+
+    def _submit(self, urls: List[str], numbers: Optional[List[int]] = None,
+                tags: Optional[dict] = None) -> List[Job]:
+        """Tạo job và xếp vào làn (chạy trong event loop)."""
+        tags = tags or {}
+        start = len(self._jobs)
+        new = [Job(start + i + 1, u, numbers[i] if numbers else None, *tags.get(u, (DEFAULT_LANE, None)))
+               for i, u in enumerate(urls)]
+        self._jobs.extend(new)
+        for j in new:
+            j.turn = self.loop.create_future()
+            self._lanes.push(j)
+            j.task = asyncio.create_task(self._run_job(j))
+        self._dispatch()
+        return new
+
+    # --------- Chế độ thường trú (daemon) ----------
+    async def serve(self) -> List[Job]:
+        """Giữ pipeline ấm: nhận job qua submit_threadsafe() tới khi cancel(); chờ job và upload còn dở."""
+        self.loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        if self.cancelled:
+            self._stopped.set()
+        try:
+            await self._stopped.wait()
+            await asyncio.gather(*(j.task for j in self._jobs if j.task), return_exceptions=True)
+            while self._uploads:
+                await asyncio.gather(*(asyncio.wrap_future(f) for f in list(self._uploads)),
+                                     return_exceptions=True)
+        finally:
+            self.emit("done", None, list(self._jobs))
+        return list(self._jobs)
+
+    def _call(self, fn, *args, timeout: float = 10):
+        """Chạy fn(*args) trong event loop từ luồng khác và chờ kết quả."""
+        async def wrap():
+            return fn(*args)
+        return asyncio.run_coroutine_threadsafe(wrap(), self.loop).result(timeout)
+
+    def submit_threadsafe(self, urls: List[str], tags: Optional[dict] = None) -> List[Job]:
+        if self.cancelled:
+            raise RuntimeError("Bộ điều phối đang dừng, không nhận job mới")
+        return self._call(self._submit, urls, None, tags)
+
+    def list_jobs(self) -> List[Job]:
+        return list(self._jobs)
+
+    def get_job(self, job_id: int) -> Optional[Job]:
+        return self._jobs[job_id - 1] if 0 < job_id <= len(self._jobs) else None
+
+    def cancel_job(self, job_id: int) -> Optional[Job]:
+        """Huỷ 1 job: đang chờ -> bỏ khỏi làn; đang tải -> progress hook dừng nó (file .part giữ lại)."""
+        job = self.get_job(job_id)
+        if job is None or job.status not in ("queued", "running"):
+            return job
+
+        def do():
+            job.aborted = True
+            if job.status == "queued" and self._lanes.remove(job) and not job.turn.done():
+                job.turn.set_result(None)
+        self._call(do)
+        return job
+
+    def metrics(self) -> dict:
+        by_status: dict = {}
+        lanes: dict = {}
+        for j in self._jobs:
+            by_status[j.status] = by_status.get(j.status, 0) + 1
+            ln = lanes.setdefault(j.lane, {"queued": 0, "running": 0, "done": 0, "error": 0,
+                                           "cancelled": 0, "missed_deadline": 0, "max_wait": 0.0})
+            ln[j.status] = ln.get(j.status, 0) + 1
+            ln["missed_deadline"] += int(j.missed_deadline)
+            wait = (j.started_at or time.time()) - j.queued_at if j.status != "cancelled" else 0
+            ln["max_wait"] = round(max(ln["max_wait"], wait), 1)
+        return {"uptime": round(time.time() - self.started_at, 1), "workers": self.jobs,
+                "active": self._active, "uploads_pending": len(self._uploads),
+                "bytes": sum(j.bytes for j in self._jobs), "jobs": by_status, "lanes": lanes,
+                "bandwidth": self.governor.snapshot() if self.governor else None,
+                "upload_bandwidth": self.upload_governor.snapshot() if self.upload_governor else None,
+                "knobs": self.knobs(), "stopping": self.cancelled}
+
+    # --------- Đổi nóng ----------
+    def _set_bandwidth(self, rate: int):
+        if rate and self.governor:
+            self.governor.set_rate(rate)
+        elif rate:
+            self.governor = Governor(rate)
+        else:
+            self.governor = None
+        if self.governor:
+            # governor giữ trần; block nhỏ cố định để nhịp ngủ trong hook đều thay vì dồn từng khối 4MB
+            self.opts.pop("ratelimit", None)
+            self.opts.update({"buffersize": 64 * 1024, "noresizebuffer": True})
+            for ydl in list(self._ydls):
+                ydl.params.pop("ratelimit", None)
+        else:
+            for k in self.BUFFER_PARAMS:
+                self.opts.pop(k, None)
+            self.opts.update(self._user_buffer)
+
+    def _grow(self, attr: str, size: int, prefix: str):
+        """Pool không nới được -> tạo pool lớn hơn cho tác vụ mới, pool cũ chạy nốt rồi đóng ở close()."""
+        old = getattr(self, attr)
+        if size > old._max_workers:
+            self._old_pools.append(old)
+            setattr(self, attr, ThreadPoolExecutor(size, thread_name_prefix=prefix))
+
+    def knobs(self) -> dict:
+        return {"jobs": self.jobs, "upload_workers": self._up_gate.limit,
+                "bandwidth": int(self.governor.rate) if self.governor else 0,
+                "upload_bandwidth": int(self.upload_governor.rate) if self.upload_governor else 0,
+                **{k: self.opts.get(k) for k in self.LIVE_PARAMS}}
+
+    def tune(self, jobs: Optional[int] = None, upload_workers: Optional[int] = None,
+             bandwidth: Optional[int] = None, upload_bandwidth: Optional[int] = None, **params) -> dict:
+        """Gọi được từ mọi luồng (signal handler, API). None = giữ nguyên, bandwidth 0 = bỏ giới hạn."""
+        unknown = set(params) - set(self.LIVE_PARAMS)
+        if unknown:
+            raise ValueError(f"không đổi nóng được: {', '.join(sorted(unknown))}")
+        if bandwidth is not None:
+            self._set_bandwidth(int(bandwidth))
+        if upload_bandwidth is not None:
+            if int(upload_bandwidth) and self.upload_governor:
+                self.upload_governor.set_rate(int(upload_bandwidth))
+            else:
+                self.upload_governor = Governor(int(upload_bandwidth)) if int(upload_bandwidth) else None
+        for k, v in params.items():
+            if v is None or (k == "ratelimit" and self.governor):
+                continue      # đã có governor giữ trần tổng
+            self.opts[k] = v
+            for ydl in list(self._ydls):
+                ydl.params[k] = v          # YoutubeDL ấm đọc params ở mỗi request / mỗi video
+        if upload_workers is not None:
+            self._grow("_up_pool", max(int(upload_workers), 1), "up")
+            self._up_gate.resize(upload_workers)
+        if jobs is not None:
+            self.jobs = max(int(jobs), 1)
+            self._grow("_dl_pool", self.jobs, "dl")
+            if self.loop is not None and not self.loop.is_closed():
+                self.loop.call_soon_threadsafe(self._dispatch)
+        return self.knobs()
+
+    def cancel(self, drain: bool = False):
+        """Không bắt đầu job mới; drain=False thì huỷ luôn các mục đang tải."""
+        self.cancelled = True
+        if not drain:
+            self._abort.set()
+        if self.loop is not None and not self.loop.is_closed():
+            # giải phóng các job còn chờ lượt (chạy trong event loop)
+            self.loop.call_soon_threadsafe(self._dispatch)
+            if self._stopped is not None:
+                self.loop.call_soon_threadsafe(self._stopped.set)
+
+    def cancel_threadsafe(self, drain: bool = False):
+        # cờ là threading.Event/bool nên đặt thẳng được từ mọi luồng
+        self.cancel(drain)
+
+    def lane_summary(self) -> str:
+        return lane_summary(self._jobs)
+
+    def close(self):
+        for pool in self._old_pools + [self._dl_pool, self._up_pool]:
+            pool.shutdown(wait=True)
+        for ydl in self._ydls:
+            ydl.__exit__(None, None, None)
+        self._ydls.clear()
+
+
+# =============== Dùng từ code đồng bộ (CLI / GUI) ===============
+def install_stop_signals(orch: Orchestrator):
+    """Ctrl+C lần 1: drain (xong mục đang chạy + upload); lần 2 hoặc SIGTERM: dừng nhanh."""
+    if threading.current_thread() is not threading.main_thread():
+        return
+
+    def on_sigint(signum, frame):
+        if not orch.cancelled:
+            print("\n⏹ Đang dừng: chờ mục hiện tại và upload xong (Ctrl+C lần nữa để dừng ngay)…")
+            orch.cancel(drain=True)
+        else:
+            print("\n⏹ Dừng ngay.")
+            orch.cancel()
+
+    signal.signal(signal.SIGINT, on_sigint)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda signum, frame: orch.cancel())
+
+
+def run_sync(orch: Orchestrator, urls: List[str], on_event: Callable[[Event], None],
+             numbers: Optional[List[int]] = None, tags: Optional[dict] = None) -> List[Job]:
+    """Chạy orchestrator trong event loop riêng; on_event được gọi (trong luồng này) cho mọi sự kiện."""
+
+    async def main():
+        q = orch.subscribe()
+
+        async def pump():
+            while True:
+                ev = await q.get()
+                on_event(ev)
+                if ev.kind == "done":
+                    return
+
+        pump_task = asyncio.create_task(pump())
+        jobs = await orch.run(urls, numbers, tags)
+        await pump_task
+        return jobs
+
+    install_stop_signals(orch)
+    try:
+        return asyncio.run(main())
+    finally:
+        orch.close()
+
+
+def print_event(ev: Event):
+    """Subscriber mặc định cho CLI (tiến độ chi tiết do progress_hook của từng script in)."""
+    if ev.kind == "start":
+        print(f"\n— Bắt đầu [{ev.job.id}]: {ev.job.url}")
+    elif ev.kind == "error":
+        print(f"\n❌ Lỗi [{ev.job.id}]: {ev.data}")
+    elif ev.kind == "cancelled":
+        print(f"\n⏹ Đã huỷ [{ev.job.id}]: {ev.job.url}")
+        for p in sorted(ev.job.partials):
+            print(f"   … còn file dở (sẽ tải tiếp lần sau): {p}")
+    elif ev.kind == "done":
+        for j in ev.data or []:
+            for args in j.leftovers:
+                print(f"   ⚠️ Chưa upload (file vẫn ở local): {args[0]}")
+    elif ev.kind == "upload_error":
+        print(f"   ❌ Lỗi upload: {ev.data}")
+    elif ev.kind == "preempted":
+        print(f"\n⏸ Tạm dừng [{ev.job.id}] ({ev.job.lane}) nhường luồng cho mục ưu tiên, sẽ tải tiếp sau.")
+    elif ev.kind == "deadline_missed":
+        print(f"\n⏰ [{ev.job.id}] xong nhưng trễ hạn {ev.job.finished_at - ev.job.deadline:.0f}s: {ev.job.url}")
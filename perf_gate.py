@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Cổng hiệu năng: chạy đúng code pipeline (make_opts / hook / orchestrator / upload) trên media server, Hub và
+# YoutubeDL giả, so với baseline đã lưu (perf_baseline.json) và báo lỗi khi 1 chỉ số tụt quá ngưỡng.
+#   python perf_gate.py [--update] [--only TÊN] [--tolerance 0.25] [--repeat 3]
+#   python -m pytest perf_gate.py
+
+import contextlib
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from urllib.request import urlopen
+
+USAGE = """\
+  python perf_gate.py                 đo và so với perf_baseline.json (lỗi -> mã thoát 1)
+  python perf_gate.py --update        ghi lại baseline (sau khi chủ động đổi hiệu năng / đổi máy chạy)
+  --only run_download,hf_files        chỉ chạy vài kịch bản    --tolerance 0.25 (ENV PERF_TOLERANCE)
+  --repeat 3                          số lần đo, lấy lần tốt nhất
+  python -m pytest perf_gate.py       như trên, trong pytest (bỏ qua nếu chưa có baseline)
+Kịch bản: run_download, hf_files, hf_tar (items_per_sec, item_ms, peak_mb); hooks_run, hooks_run_hf (hook_us)"""
+
+HERE = Path(__file__).resolve().parent
+BASELINE_FILE = HERE / "perf_baseline.json"
+TOLERANCE = 0.25              # tụt quá 25% so với baseline (đã quy đổi theo tốc độ máy) = lỗi
+REPEAT = 3                    # lấy lần tốt nhất, bớt nhiễu
+ITEMS = 120                   # số mục mỗi kịch bản pipeline
+ITEM_BYTES = 128 * 1024       # payload nhỏ -> thời gian chủ yếu là overhead của pipeline, không phải I/O
+CHUNK = 64 * 1024             # mỗi khối = 1 lần gọi progress hook (như buffersize của yt-dlp khi có governor)
+HOOK_EVENTS = 20000
+HIGHER_BETTER = {"items_per_sec"}
+TIME_METRICS = {"item_ms", "hook_us"}
+SLACK = {"peak_mb": 2.0, "hook_us": 1.0}   # sai số tuyệt đối cho phép (số nhỏ dao động mạnh theo tỉ lệ)
+
+
+# =============== Server giả ===============
+class _MediaHandler(BaseHTTPRequestHandler):
+    """GET /media/<id>.<ext> -> ITEM_BYTES byte cố định (không đọc đĩa)."""
+    body = os.urandom(ITEM_BYTES)
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+
+class _HubHandler(BaseHTTPRequestHandler):
+    """
+    Đủ endpoint cho create_repo / preupload / create_commit. Mọi file đi đường "regular" (nội dung base64
+    trong body commit) -> không cần kho LFS giả; số file nhận được dùng để kiểm tra kịch bản chạy trọn.
+    """
+    protocol_version = "HTTP/1.1"
+    files: List[str] = []
+    lock = threading.Lock()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _reply(self, obj, code: int = 200):
+        data = json.dumps(obj).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def do_GET(self):
+        self._reply({})
+
+    def do_POST(self):
+        body = self._body()
+        path = self.path.split("?")[0]
+        if path == "/api/repos/create":
+            return self._reply({"url": f"http://{self.headers.get('Host')}/perf/gate"})
+        if "/preupload/" in path:
+            files = json.loads(body)["files"]
+            return self._reply({"files": [{"path": f["path"], "uploadMode": "regular", "shouldIgnore": False}
+                                          for f in files]})
+        if "/commit/" in path:
+            paths = [json.loads(ln)["value"]["path"] for ln in body.splitlines()
+                     if ln.strip() and json.loads(ln).get("key") == "file"]
+            with self.lock:
+                self.files.extend(paths)
+            return self._reply({"commitUrl": "http://hub/perf/gate/commit/0", "commitOid": "0" * 40})
+        self._reply({"error": f"perf hub: không hỗ trợ {path}"}, 404)
+
+
+def _serve(handler) -> ThreadingHTTPServer:
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+# =============== YoutubeDL giả ===============
+class FakeYoutubeDL:
+    """
+    Thay YoutubeDL (orchestrator.build_ydl) trong kịch bản: tải thật qua HTTP từ media server giả và gọi
+    match_filter, progress hook (mỗi CHUNK), "finished", rồi postprocessor hook như yt-dlp.
+    Không extractor, không ffmpeg, không chạy postprocessors -> chỉ đo phần code của repo quanh yt-dlp.
+    """
+
+    def __init__(self, params: dict):
+        self.params = params
+        self._num_downloads = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def download(self, urls: List[str]) -> int:
+        for url in urls:
+            self._one(url)
+        return 0
+
+    def _one(self, url: str):
+        name = url.rsplit("/", 1)[-1]
+        vid, ext = name.rsplit(".", 1)
+        info = {"id": vid, "title": f"perf {vid}", "ext": ext, "format_id": "perf", "duration": 60,
+                "webpage_url": url, "extractor": "perf"}
+        mf = self.params.get("match_filter")
+        if mf and mf(info, incomplete=False):
+            return
+        self._num_downloads += 1
+        number = self.params.get("autonumber_start", 1) - 1 + self._num_downloads
+        tmpl = self.params.get("outtmpl")
+        tmpl = tmpl.get("default") if isinstance(tmpl, dict) else tmpl
+        final = tmpl % {"autonumber": str(number).zfill(int(self.params.get("autonumber_size") or 5)),
+                        "title": info["title"], "id": vid, "ext": ext}
+        part = final + ".part"
+        info.update(_filename=final, filepath=final)
+        hooks = self.params.get("progress_hooks") or []
+        started, done = time.time(), 0
+        with urlopen(url) as r, open(part, "wb") as f:
+            total = int(r.headers.get("Content-Length") or 0)
+            while True:
+                buf = r.read(CHUNK)
+                if not buf:
+                    break
+                f.write(buf)
+                done += len(buf)
+                elapsed = max(time.time() - started, 1e-6)
+                d = {"status": "downloading", "downloaded_bytes": done, "total_bytes": total,
+                     "tmpfilename": part, "filename": final, "elapsed": elapsed, "speed": done / elapsed,
+                     "eta": 0, "_percent_str": f"{100 * done / max(total, 1):.1f}%", "info_dict": info}
+                for h in hooks:
+                    h(d)
+        os.replace(part, final)
+        d = {"status": "finished", "downloaded_bytes": done, "total_bytes": total, "filename": final,
+             "elapsed": time.time() - started, "info_dict": info}
+        for h in hooks:
+            h(d)
+        for h in self.params.get("postprocessor_hooks") or []:
+            h({"status": "finished", "postprocessor": "MoveFiles", "info_dict": info})
+
+
+@contextlib.contextmanager
+def _fake_ydl():
+    import orchestrator
+
+    real = orchestrator.build_ydl
+    orchestrator.build_ydl = FakeYoutubeDL
+    try:
+        yield
+    finally:
+        orchestrator.build_ydl = real
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Hook của CLI in mỗi khối: vẫn tính chi phí in, nhưng ra devnull. Giữ nguyên signal handler của gate."""
+    saved = {s: signal.getsignal(s) for s in (signal.SIGINT, getattr(signal, "SIGTERM", None),
+                                               getattr(signal, "SIGHUP", None)) if s is not None}
+    with open(os.devnull, "w", encoding="utf-8") as null, contextlib.redirect_stdout(null):
+        try:
+            yield
+        finally:
+            if threading.current_thread() is threading.main_thread():
+                for s, h in saved.items():
+                    signal.signal(s, h)
+
+
+# =============== Môi trường ===============
+class Bench:
+    """Server giả + thư mục làm việc tạm (run.py / run_hf-v3.py đặt downloads/ theo thư mục hiện tại)."""
+
+    def __init__(self):
+        self.media = _serve(_MediaHandler)
+        self.hub = _serve(_HubHandler)
+        self.hub_url = f"http://127.0.0.1:{self.hub.server_address[1]}"
+        self.media_url = f"http://127.0.0.1:{self.media.server_address[1]}/media"
+        self.cwd = os.getcwd()
+        self.dir = Path(tempfile.mkdtemp(prefix="perf_gate_"))
+        os.chdir(self.dir)
+        self._point_hub()
+        sys.path.insert(0, str(HERE))
+        import run
+        self.run = run
+        self.run_hf = _load("run_hf_v3", HERE / "run_hf-v3.py")
+
+    def _point_hub(self):
+        os.environ["HF_ENDPOINT"] = self.hub_url
+        os.environ["HF_HUB_DISABLE_TELEMETRY"] = "1"
+        if "huggingface_hub" in sys.modules:   # đã import trước (vd: pytest plugin) -> sửa tại chỗ
+            from huggingface_hub import constants, hf_api
+
+            constants.ENDPOINT = self.hub_url
+            hf_api.api.endpoint = self.hub_url
+
+    def urls(self, ext: str, n: int = ITEMS) -> List[str]:
+        return [f"{self.media_url}/v{i:05d}.{ext}" for i in range(n)]
+
+    def reset(self):
+        _HubHandler.files = []
+        shutil.rmtree(self.dir / "downloads", ignore_errors=True)
+        (self.dir / "downloads").mkdir()
+
+    def close(self):
+        os.chdir(self.cwd)
+        self.media.shutdown()
+        self.hub.shutdown()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def _load(name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def _hf_cfg(bench: Bench, **hf) -> dict:
+    cfg = bench.run_hf.merge_config({
+        "hf": {"repo_id": "perf/gate", "path_prefix": "perf/", "manifest_batch": 50, **hf},
+        "downloader": {"jobs": 4, "upload_workers": 2, "ratelimit": 0, "sleep_interval": 0,
+                       "max_sleep_interval": 0, "sleep_requests": 0},
+    })
+    cfg["hf"].update(token="hf_perf_gate", repo_id="perf/gate")   # ENV HF_* không được lái sang repo khác
+    cfg["cookies"].update(path="", dir="")
+    return cfg
+
+
+# =============== Kịch bản ===============
+def scenario_run_download(bench: Bench) -> int:
+    """run.py: build_opts (mode 4, staging) + Orchestrator 4 luồng, chỉ tải."""
+    with _fake_ydl(), _quiet():
+        bench.run.download_all(bench.urls("m4a"), "4", None, "3", jobs=4)
+    got = len(list((bench.dir / "downloads").glob("*.m4a")))
+    if got != ITEMS:
+        raise RuntimeError(f"run_download: {got}/{ITEMS} file")
+    return ITEMS
+
+
+def scenario_hf_files(bench: Bench) -> int:
+    """run_hf-v3: make_opts (mode 1) + manifest + upload từng file lên Hub giả, tải và upload chồng nhau."""
+    with _fake_ydl(), _quiet():
+        bench.run_hf.run_pipeline(bench.urls("mp4"), "1", _hf_cfg(bench), "3")
+    got = sum(1 for p in _HubHandler.files if p.endswith(".mp4"))
+    if got != ITEMS:
+        raise RuntimeError(f"hf_files: Hub nhận {got}/{ITEMS} file")
+    return ITEMS
+
+
+def scenario_hf_tar(bench: Bench) -> int:
+    """run_hf-v3: gom shard tar (2 MB/shard) + manifest, mỗi shard 1 commit."""
+    with _fake_ydl(), _quiet():
+        bench.run_hf.run_pipeline(bench.urls("mp4"), "1", _hf_cfg(bench, output="tar", shard_size_mb=2), "3")
+    if not any(p.endswith(".tar") for p in _HubHandler.files):
+        raise RuntimeError("hf_tar: Hub không nhận shard nào")
+    return ITEMS
+
+
+def _hook_cost(opts: dict) -> float:
+    """µs cho 1 sự kiện progress đi qua toàn bộ chuỗi hook (của script + orchestrator, có governor)."""
+    from orchestrator import Job, Orchestrator
+
+    orch = Orchestrator(opts, bandwidth=10 ** 12)     # trần rất cao: đo chi phí điều tiết, không ngủ
+    job = Job(1, "perf")
+    job.flow = orch.governor.open()
+    orch._local.job = job
+    hooks = orch.opts["progress_hooks"]
+    info = {"id": "perf", "format_id": "perf", "_filename": "downloads/perf.mp4"}
+    t = time.perf_counter()
+    with _quiet():
+        for i in range(HOOK_EVENTS):
+            d = {"status": "downloading", "downloaded_bytes": (i + 1) * CHUNK, "total_bytes": HOOK_EVENTS * CHUNK,
+                 "tmpfilename": "downloads/perf.mp4.part", "filename": "downloads/perf.mp4", "speed": 1e6,
+                 "eta": 1, "_percent_str": "50.0%", "info_dict": info}
+            for h in hooks:
+                h(d)
+    cost = (time.perf_counter() - t) / HOOK_EVENTS * 1e6
+    orch.close()
+    return cost
+
+
+def scenario_hooks_run(bench: Bench) -> float:
+    """Chuỗi progress hook của run.py (in tiến độ, staging) + orchestrator."""
+    with _quiet():
+        opts, _, _ = bench.run.build_opts("4", None, "3")
+    return _hook_cost(opts)
+
+
+def scenario_hooks_run_hf(bench: Bench) -> float:
+    """Chuỗi progress hook của run_hf-v3 (make_opts + attach_mode) + orchestrator."""
+    cfg = _hf_cfg(bench)
+    with _quiet():
+        opts = bench.run_hf.make_opts("1", None, cfg["downloader"], None, "", "", "", "", "", "3")
+        bench.run_hf.attach_mode(opts, "1", cfg)
+    return _hook_cost(opts)
+
+
+PIPELINES: Dict[str, Callable[[Bench], int]] = {
+    "run_download": scenario_run_download,
+    "hf_files": scenario_hf_files,
+    "hf_tar": scenario_hf_tar,
+}
+HOOKS: Dict[str, Callable[[Bench], float]] = {
+    "hooks_run": scenario_hooks_run,
+    "hooks_run_hf": scenario_hooks_run_hf,
+}
+JOBS = 4   # số luồng tải của các kịch bản pipeline (item_ms = thời gian 1 luồng bỏ ra cho 1 mục)
+
+
+# =============== Đo ===============
+def calibrate() -> float:
+    """Thời gian 1 khối việc cố định (hash + vòng Python) -> quy đổi baseline giữa các máy khác tốc độ."""
+    buf = b"\0" * (1 << 20)
+    best = float("inf")
+    for _ in range(5):
+        t = time.perf_counter()
+        h = hashlib.sha256()
+        for _ in range(32):
+            h.update(buf)
+        sum(i * i for i in range(300_000))
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def _peak_mb(fn: Callable, bench: Bench) -> float:
+    bench.reset()
+    tracemalloc.start()
+    try:
+        fn(bench)
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def measure(bench: Bench, only: Optional[List[str]] = None, repeat: int = REPEAT) -> Dict[str, dict]:
+    out: Dict[str, dict] = {}
+    for name, fn in PIPELINES.items():
+        if only and name not in only:
+            continue
+        best = float("inf")
+        for _ in range(repeat):
+            bench.reset()
+            t = time.perf_counter()
+            n = fn(bench)
+            best = min(best, time.perf_counter() - t)
+        out[name] = {"items_per_sec": round(n / best, 2), "item_ms": round(best * JOBS / n * 1000, 3),
+                     "peak_mb": round(_peak_mb(fn, bench), 2)}
+        print(f"   {name}: {out[name]}")
+    for name, fn in HOOKS.items():
+        if only and name not in only:
+            continue
+        bench.reset()
+        out[name] = {"hook_us": round(min(fn(bench) for _ in range(repeat)), 3)}
+        print(f"   {name}: {out[name]}")
+    return out
+
+
+def compare(current: Dict[str, dict], baseline: dict, tolerance: float, speed: float) -> List[str]:
+    """
+    speed = calibrate() máy này / của baseline: chỉ số thời gian được kỳ vọng chậm/nhanh theo cùng tỉ lệ.
+    Trả về danh sách dòng lỗi (rỗng = đạt).
+    """
+    failures = []
+    print(f"\n{'kịch bản':<14} {'chỉ số':<14} {'kỳ vọng':>12} {'hiện tại':>12} {'đổi':>8}")
+    for name, metrics in current.items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            print(f"{name:<14} (chưa có baseline, chạy --update)")
+            continue
+        for k, v in metrics.items():
+            if k not in base:
+                continue
+            want = base[k] / speed if k in HIGHER_BETTER else base[k] * speed if k in TIME_METRICS else base[k]
+            change = (v - want) / want if want else 0.0
+            if k in HIGHER_BETTER:
+                bad = v < want * (1 - tolerance)
+            else:
+                bad = v > want * (1 + tolerance) + SLACK.get(k, 0)
+            mark = "❌" if bad else "✓"
+            print(f"{name:<14} {k:<14} {want:>12.3f} {v:>12.3f} {change:>+7.0%} {mark}")
+            if bad:
+                failures.append(f"{name}.{k}: {v:.3f} so với kỳ vọng {want:.3f} ({change:+.0%}, ngưỡng ±{tolerance:.0%})")
+    return failures
+
+
+def load_baseline(path: Path = BASELINE_FILE) -> dict:
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+
+def save_baseline(current: Dict[str, dict], calib: float, tolerance: float, path: Path = BASELINE_FILE):
+    data = load_baseline(path)
+    data.update(calibration=round(calib, 5), tolerance=tolerance,
+                python=".".join(map(str, sys.version_info[:3])), updated=time.strftime("%Y-%m-%d"))
+    data.setdefault("scenarios", {}).update(current)
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+def gate(update: bool = False, only: Optional[List[str]] = None, tolerance: Optional[float] = None,
+         repeat: int = REPEAT) -> List[str]:
+    baseline = load_baseline()
+    tol = tolerance if tolerance is not None else float(os.getenv("PERF_TOLERANCE", baseline.get("tolerance", TOLERANCE)))
+    calib = calibrate()
+    speed = calib / baseline["calibration"] if baseline.get("calibration") else 1.0
+    print(f"⏱  Cổng hiệu năng: {ITEMS} mục x {ITEM_BYTES // 1024} KB, {JOBS} luồng; hệ số máy {speed:.2f}")
+    bench = Bench()
+    try:
+        current = measure(bench, only, repeat)
+    finally:
+        bench.close()
+    if update:
+        save_baseline(current, calib, tol)
+        print(f"\n💾 Đã ghi baseline: {BASELINE_FILE.name}")
+        return []
+    return compare(current, baseline, tol, speed)
+
+
+def test_perf_gate():
+    """python -m pytest perf_gate.py"""
+    import pytest
+
+    if not BASELINE_FILE.exists():
+        pytest.skip("chưa có perf_baseline.json (python perf_gate.py --update)")
+    failures = gate()
+    assert not failures, "Hiệu năng tụt:\n" + "\n".join(failures)
+
+
+def main(argv):
+    if "-h" in argv or "--help" in argv:
+        print(USAGE)
+        return
+    only = argv[argv.index("--only") + 1].split(",") if "--only" in argv else None
+    tol = float(argv[argv.index("--tolerance") + 1]) if "--tolerance" in argv else None
+    repeat = int(argv[argv.index("--repeat") + 1]) if "--repeat" in argv else REPEAT
+    failures = gate("--update" in argv, only, tol, repeat)
+    if failures:
+        print("\n❌ Hiệu năng tụt quá ngưỡng:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\n✅ Đạt cổng hiệu năng.")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Giai đoạn lập kế hoạch tải: chọn format 1 lần cho cả danh sách, lưu cache theo video, báo cáo dry-run
+
+import json
+import shutil
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from yt_dlp.postprocessor.common import PostProcessor
+
+from orchestrator import build_ydl
+
+PLAN_FILE = ".plans.json"
+PLAN_TTL = 3 * 24 * 3600     # format id của 1 video hầu như không đổi trong vài ngày
+
+
+class Plan:
+    """Kết quả chọn format của 1 video: format id, dung lượng dự kiến, các bước hậu xử lý."""
+
+    def __init__(self, url: str, video_id: str, title: str = "", duration: float = 0,
+                 format_ids: Optional[List[str]] = None, size: int = 0, ext: str = "",
+                 steps: Optional[List[str]] = None, at: float = 0):
+        self.url = url
+        self.id = video_id
+        self.title = title
+        self.duration = float(duration or 0)
+        self.format_ids = list(format_ids or [])
+        self.size = int(size or 0)          # byte, 0 = không biết
+        self.ext = ext
+        self.steps = list(steps or [])
+        self.at = at or time.time()
+        self.src = url          # URL đầu vào sinh ra kế hoạch này (playlist -> nhiều video)
+
+    @property
+    def format(self) -> str:
+        return "+".join(self.format_ids)
+
+    def to_dict(self) -> dict:
+        return {"url": self.url, "id": self.id, "title": self.title, "duration": self.duration,
+                "format_ids": self.format_ids, "size": self.size, "ext": self.ext,
+                "steps": self.steps, "at": self.at}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Plan":
+        return cls(d["url"], d["id"], d.get("title", ""), d.get("duration", 0), d.get("format_ids"),
+                   d.get("size", 0), d.get("ext", ""), d.get("steps"), d.get("at", 0))
+
+
+class PlanCache:
+    """
+    downloads/.plans.json: {"videos": {"<id>|<format spec>": plan}, "urls": {"<url>|<spec>": [id, ...]}}.
+    Khoá gồm cả chuỗi format -> đổi mode thì lập kế hoạch lại.
+    """
+
+    def __init__(self, download_dir: Path, ttl: float = PLAN_TTL):
+        self.path = Path(download_dir) / PLAN_FILE
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.videos: Dict[str, dict] = {}
+        self.urls: Dict[str, dict] = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                self.videos = data.get("videos", {})
+                self.urls = data.get("urls", {})
+            except Exception:
+                pass
+
+    def _fresh(self, d: Optional[dict]) -> bool:
+        return bool(d) and time.time() - d.get("at", 0) < self.ttl
+
+    def get_url(self, url: str, spec: str) -> Optional[List[Plan]]:
+        with self.lock:
+            u = self.urls.get(f"{url}|{spec}")
+            if not self._fresh(u):
+                return None
+            vids = [self.videos.get(f"{vid}|{spec}") for vid in u["ids"]]
+            if not all(self._fresh(v) for v in vids):
+                return None
+            return [Plan.from_dict(v) for v in vids]
+
+    def get(self, video_id: str, spec: str) -> Optional[Plan]:
+        with self.lock:
+            v = self.videos.get(f"{video_id}|{spec}")
+            return Plan.from_dict(v) if self._fresh(v) else None
+
+    def put(self, url: str, spec: str, plans: List[Plan]):
+        with self.lock:
+            for p in plans:
+                self.videos[f"{p.id}|{spec}"] = p.to_dict()
+            self.urls[f"{url}|{spec}"] = {"ids": [p.id for p in plans], "at": time.time()}
+
+    def save(self):
+        with self.lock:
+            now = time.time()
+            self.videos = {k: v for k, v in self.videos.items() if now - v.get("at", 0) < self.ttl}
+            self.urls = {k: v for k, v in self.urls.items() if now - v.get("at", 0) < self.ttl}
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"videos": self.videos, "urls": self.urls}, ensure_ascii=False),
+                           encoding="utf-8")
+            tmp.replace(self.path)
+
+
+def _entries(info: dict):
+    """Trải playlist lồng nhau thành từng video."""
+    if info.get("_type") in ("playlist", "multi_video"):
+        for e in info.get("entries") or []:
+            if e:
+                yield from _entries(e)
+    else:
+        yield info
+
+
+def _plan_from_info(url: str, info: dict, steps: List[str]) -> Plan:
+    fmts = info.get("requested_formats") or [info]
+    size = sum(int(f.get("filesize") or f.get("filesize_approx") or 0) for f in fmts)
+    if not size and info.get("tbr") and info.get("duration"):
+        size = int(info["tbr"] * 1000 / 8 * info["duration"])   # ước lượng từ bitrate
+    return Plan(info.get("webpage_url") or url, info.get("id"), info.get("title") or "",
+                info.get("duration") or 0, [f.get("format_id") for f in fmts], size,
+                info.get("ext") or "", (["merge"] if len(fmts) > 1 else []) + steps)
+
+
+def make_plans(urls: List[str], opts: dict, cache: Optional[PlanCache] = None, jobs: int = 1) -> List[Plan]:
+    """
+    extract_info(download=False) cho từng URL (song song `jobs` luồng) và lấy format yt-dlp chọn.
+    URL đã có kế hoạch còn hạn trong cache thì không gọi mạng. Trả về danh sách theo thứ tự đầu vào.
+    """
+    spec = opts.get("format")
+    spec = getattr(spec, "spec", spec) or "default"
+    local = threading.local()
+    base = {k: v for k, v in opts.items() if k not in ("progress_hooks", "match_filter")}
+    base.update({"quiet": True, "no_warnings": True, "ignoreerrors": True, "format": spec})
+    base["custom_postprocessors"] = [c for c in base.get("custom_postprocessors") or []
+                                     if c[1] not in ("before_dl", "after_filter")]
+
+    def ydl():
+        if not hasattr(local, "ydl"):
+            local.ydl = build_ydl(base)
+            local.steps = [type(pp).__name__.replace("PP", "") for pp in local.ydl._pps["post_process"]]
+        return local.ydl
+
+    def one(url: str) -> List[Plan]:
+        plans = resolve(url)
+        for p in plans:
+            p.src = url
+        return plans
+
+    def resolve(url: str) -> List[Plan]:
+        cached = cache.get_url(url, spec) if cache else None
+        if cached is not None:
+            return cached
+        try:
+            info = ydl().extract_info(url, download=False)
+        except Exception as e:
+            print(f"⚠️  Không lập được kế hoạch cho {url}: {e}")
+            return []
+        if not info:
+            return []
+        plans = [_plan_from_info(url, e, local.steps) for e in _entries(info) if e.get("id")]
+        if cache:
+            cache.put(url, spec, plans)
+        return plans
+
+    with ThreadPoolExecutor(max_workers=max(int(jobs), 1), thread_name_prefix="plan") as ex:
+        results = list(ex.map(one, urls))
+    if cache:
+        cache.save()
+    return [p for ps in results for p in ps]
+
+
+ORDERS = ("fifo", "longest", "shortest")
+
+
+def _weights(plans: List[Plan]) -> Dict[int, float]:
+    """Khối lượng ước tính (byte) mỗi kế hoạch; thiếu filesize thì quy đổi từ thời lượng theo bitrate trung bình."""
+    known = [p for p in plans if p.size and p.duration]
+    rate = sum(p.size for p in known) / sum(p.duration for p in known) if known else 128_000 / 8
+    return {id(p): float(p.size or p.duration * rate) for p in plans}
+
+
+def schedule(urls: List[str], plans: List[Plan], order: str = "fifo"):
+    """
+    Trả về (urls, numbers) cho Orchestrator.run: mỗi video 1 job, sắp theo khối lượng.
+      longest  : lớn trước (LPT) -> giảm makespan, đuôi lô toàn mục nhỏ
+      shortest : nhỏ trước -> kết quả đầu tiên có sớm nhất
+    numbers giữ số thứ tự theo danh sách gốc để tên file (autonumber) không đổi theo thứ tự tải.
+    URL không lập được kế hoạch chạy cuối, như cũ.
+    """
+    numbered = [(i + 1, p) for i, p in enumerate(plans)]
+    if order in ("longest", "shortest"):
+        w = _weights(plans)
+        numbered.sort(key=lambda np: w[id(np[1])], reverse=(order == "longest"))
+    planned_src = {p.src for p in plans}
+    rest = [u for u in urls if u not in planned_src]
+    return ([p.url for _, p in numbered] + rest,
+            [n for n, _ in numbered] + [None] * len(rest))
+
+
+def _fmt_size(n: int) -> str:
+    return f"{n / 1e6:,.1f} MB" if n else "?"
+
+
+def _fmt_dur(s: float) -> str:
+    s = int(s or 0)
+    return f"{s // 3600}:{s % 3600 // 60:02d}:{s % 60:02d}" if s else "?"
+
+
+def report(plans: List[Plan], download_dir: Path) -> str:
+    """Bảng dry-run: format được chọn, dung lượng, thời lượng, hậu xử lý + tổng so với dung lượng trống."""
+    lines = [f"{'ID':<12} {'Format':<12} {'Dung lượng':>12} {'Thời lượng':>10}  Hậu xử lý  | Tiêu đề"]
+    for p in plans:
+        lines.append(f"{p.id:<12} {p.format:<12} {_fmt_size(p.size):>12} {_fmt_dur(p.duration):>10}  "
+                     f"{','.join(p.steps) or '-'}  | {p.title[:50]}")
+    total = sum(p.size for p in plans)
+    unknown = sum(1 for p in plans if not p.size)
+    free = shutil.disk_usage(Path(download_dir).resolve()).free
+    lines.append("")
+    lines.append(f"Tổng: {len(plans)} video, ~{_fmt_size(total)}"
+                 f"{f' (+{unknown} mục chưa rõ dung lượng)' if unknown else ''}, "
+                 f"tổng thời lượng {_fmt_dur(sum(p.duration for p in plans))}")
+    lines.append(f"Ổ đĩa trống: {_fmt_size(free)}" + ("  ❌ KHÔNG ĐỦ CHỖ" if total > free else ""))
+    return "\n".join(lines)
+
+
+# --------- Dùng kế hoạch lúc tải ----------
+class PlannedSelector:
+    """
+    opts["format"] callable: video đã có kế hoạch -> chọn thẳng format id đã lưu,
+    chưa có (hoặc format đó không còn) -> chuỗi format gốc như cũ.
+    """
+
+    def __init__(self, spec: str, plans: Dict[str, Plan]):
+        self.spec = spec
+        self.plans = plans
+        self.local = threading.local()   # id video + weakref YoutubeDL của luồng đang chọn format
+
+    def _selector(self, ydl, spec: str):
+        # selector đã build giữ tham chiếu tới ydl -> cache nằm trên chính ydl, đóng ydl là giải phóng cả hai
+        compiled = ydl.__dict__.setdefault("_planned_selectors", {})
+        if spec not in compiled:
+            compiled[spec] = ydl.build_format_selector(spec)
+        return compiled[spec]
+
+    def __call__(self, ctx):
+        ydl = self.local.ydl()
+        plan = self.plans.get(getattr(self.local, "video_id", None))
+        have = {f.get("format_id") for f in ctx["formats"]}
+        if plan and plan.format_ids and all(fid in have for fid in plan.format_ids):
+            return self._selector(ydl, plan.format)(ctx)
+        return self._selector(ydl, self.spec)(ctx)
+
+
+class PlanBindPP(PostProcessor):
+    """after_filter (ngay trước bước chọn format, cùng luồng): cho selector biết video nào đang xử lý."""
+
+    def __init__(self, selector: PlannedSelector, downloader=None):
+        super().__init__(downloader)
+        self.selector = selector
+
+    def run(self, info):
+        self.selector.local.ydl = weakref.ref(self._downloader)
+        self.selector.local.video_id = info.get("id")
+        return [], info
+
+
+def attach_plans(opts: dict, plans: List[Plan]) -> PlannedSelector:
+    """Gọi sau cùng (sau attach_smart_audio...) để giữ đúng chuỗi format cuối làm phương án dự phòng."""
+    sel = PlannedSelector(opts.get("format") or "bestvideo*+bestaudio/best", {p.id: p for p in plans})
+    opts["format"] = sel
+    opts["custom_postprocessors"] = list(opts.get("custom_postprocessors") or []) + [
+        (lambda ydl: PlanBindPP(sel, ydl), "after_filter"),
+    ]
+    return sel
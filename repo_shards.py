@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Chia mục upload ra N repo hoặc N branch theo hash id: mỗi đích 1 lịch sử commit riêng, không tranh 1 branch
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+MODES = ("repo", "branch")
+SHARD_MAP = "shard_map.json"
+
+
+class ShardTarget:
+    def __init__(self, index: int, repo_id: str, branch: str, uploaders: int):
+        self.index = index
+        self.repo_id = repo_id
+        self.branch = branch
+        self.slots = threading.BoundedSemaphore(max(int(uploaders), 1))   # số commit song song vào đích này
+        self.files = 0
+        self.bytes = 0
+
+    def to_dict(self) -> dict:
+        return {"index": self.index, "repo_id": self.repo_id, "branch": self.branch}
+
+
+class ShardRouter:
+    """
+    n = 1: mọi mục vào repo_id@branch như cũ.
+    mode "repo":   repo_id-00 .. repo_id-(n-1), cùng branch.
+    mode "branch": cùng repo_id, branch-00 .. branch-(n-1).
+    Đích của 1 mục = sha1(id) mod n -> cố định giữa các lần chạy / các máy, người đọc tự tính lại được.
+    """
+
+    def __init__(self, repo_id: str, branch: str, n: int = 1, mode: str = "repo", uploaders: int = 1):
+        self.repo_id = repo_id
+        self.branch = branch
+        self.n = max(int(n), 1)
+        self.mode = mode if mode in MODES else "repo"
+        self.uploaders = max(int(uploaders), 1)
+        self.lock = threading.Lock()
+        if self.n == 1:
+            names = [(repo_id, branch)]
+        elif self.mode == "repo":
+            names = [(f"{repo_id}-{i:02d}", branch) for i in range(self.n)]
+        else:
+            names = [(repo_id, f"{branch}-{i:02d}") for i in range(self.n)]
+        self.targets: List[ShardTarget] = [ShardTarget(i, r, b, uploaders) for i, (r, b) in enumerate(names)]
+
+    def __len__(self):
+        return self.n
+
+    def pick(self, key: str) -> ShardTarget:
+        if self.n == 1:
+            return self.targets[0]
+        h = int.from_bytes(hashlib.sha1(str(key).encode("utf-8")).digest()[:8], "big")
+        return self.targets[h % self.n]
+
+    def count(self, target: ShardTarget, nbytes: int):
+        with self.lock:
+            target.files += 1
+            target.bytes += nbytes
+
+    def ensure(self, api, token: str, repo_type: str):
+        """Tạo các repo / branch đích nếu chưa có."""
+        from huggingface_hub import create_repo
+
+        for t in self.targets:
+            create_repo(repo_id=t.repo_id, repo_type=repo_type, token=token, exist_ok=True)
+            if self.mode == "branch" and self.n > 1:
+                api.create_branch(repo_id=t.repo_id, branch=t.branch, repo_type=repo_type, token=token,
+                                  exist_ok=True)
+
+    def shard_map(self) -> dict:
+        return {"mode": self.mode, "n": self.n, "hash": "sha1(id)[:8] big-endian % n",
+                "targets": [t.to_dict() for t in self.targets]}
+
+    def write_map(self, path: Path) -> Path:
+        Path(path).write_text(json.dumps(self.shard_map(), ensure_ascii=False, indent=2), encoding="utf-8")
+        return Path(path)
+
+    def summary(self) -> str:
+        with self.lock:
+            return "\n".join(f"  [{t.index:02d}] {t.repo_id}@{t.branch}: {t.files} file, {t.bytes / 1e6:,.1f} MB"
+                             for t in self.targets)
+
+
+def make_router(hf_cfg: dict, repo_id: str, branch: str) -> ShardRouter:
+    return ShardRouter(repo_id, branch, hf_cfg.get("shards", 1), hf_cfg.get("shard_mode", "repo"),
+                       hf_cfg.get("uploaders_per_shard", 1))
+
+
+def route_info(router: ShardRouter, key: str) -> Dict[str, str]:
+    """Cột thêm vào manifest khi chia nhiều đích (1 đích thì không thêm gì)."""
+    if router is None or len(router) == 1:
+        return {}
+    t = router.pick(key)
+    return {"repo_id": t.repo_id, "revision": t.branch}
@@ -5,13 +5,21 @@
 import sys
 import os
 import re
+import shutil
 from pathlib import Path
 from typing import List, Optional
-from yt_dlp import YoutubeDL
+from orchestrator import Orchestrator, run_sync, print_event
+from staging import attach_staging
+from audio_fastpath import attach_smart_audio
+from wav_shards import FLAC_LEVEL, attach_flac, attach_wav_options, wav_options_set
+from media_cache import attach_cache, open_cache
+from lanes import parse_lines
+from planner import ORDERS, PlanCache, attach_plans, make_plans, schedule, report as plan_report
 
 DOWNLOAD_DIR = Path("downloads")
 DOWNLOAD_DIR.mkdir(exist_ok=True)
 LINK_FILE = Path("link.txt")
+AUDIO_TARGETS = {"2": "mp3", "3": "wav", "5": "opus", "6": "m4a", "7": "flac"}  # mode -> codec đích của ffmpeg
 DEFAULT_COOKIES_CANDIDATES = [
     Path("cookies.txt"),          # ưu tiên cùng thư mục script
     Path.home() / "cookies.txt",  # fallback thư mục home
@@ -19,7 +27,7 @@ DEFAULT_COOKIES_CANDIDATES = [
 
 BANNER = r"""
 ==========================================
-  YouTube Downloader (MP4 / MP3 / WAV)
+  YouTube Downloader (MP4 / MP3 / WAV / Opus / AAC / FLAC)
   - Hỗ trợ video đơn, playlist, nhiều link
   - Đọc link từ link.txt
   - Hỗ trợ cookies (Netscape) để vượt giới hạn
@@ -28,23 +36,53 @@ BANNER = r"""
 
 HELP = f"""\
 Cách dùng:
-  python {Path(__file__).name} [--cookies PATH] [URL1 URL2 ...]
+  python {Path(__file__).name} [--cookies PATH] [--cookies-dir DIR] [--jobs N] [--cache DIR] [URL1 URL2 ...]
+
+  --jobs N    : số mục tải song song (mặc định 1)
+  --cache DIR : cache media dùng chung với run_hf-v3.py / GUI (hoặc ENV YT_CACHE_DIR, YT_CACHE_GB=20)
+  --plan      : chọn format cho cả danh sách trước khi tải (lưu ở downloads/.plans.json, lần sau dùng lại)
+  --dry-run   : chỉ in kế hoạch (format, dung lượng, thời lượng, hậu xử lý), không tải
+  --order longest|shortest|fifo : thứ tự tải theo dung lượng/thời lượng (tự bật --plan)
+                longest = lớn trước, lô hỗn hợp xong sớm nhất; shortest = có kết quả đầu tiên nhanh nhất
+  --mode 1..7 --style 1..5 : chọn sẵn chế độ / kiểu đánh số (không hỏi)
+  --daemon [--port 8787]   : chạy thường trú, nhận job qua HTTP/JSON (python daemon.py --help)
+  --watch     : tải hết link.txt rồi chạy tiếp, dòng nào ghi thêm vào file thì tải luôn (không khởi động lại)
+  --crawl OUT.jsonl|OUT.parquet [--rps N] : chỉ lấy metadata (không tải media), mặc định 16 luồng
+                (--jobs để đổi), --rps = tối đa N video/giây; chạy lại cùng file thì bỏ qua video đã có
+                (.parquet: phần mới ghi vào OUT.1.parquet, OUT.2.parquet..., không ghi đè file cũ)
+
+WAV / FLAC cho huấn luyện (mode 3 và 7, tất cả làm trong 1 lần ffmpeg):
+  --wav-rate 16000   --wav-channels 1   --wav-bits 16|24|32   --wav-segment 30  (cắt đoạn 30 giây)
+  --flac-level 0..12 : mức nén FLAC (mặc định 5; cao hơn = nhỏ hơn chút, encode chậm hơn)
 
 Ưu tiên lấy URL:
   1) Tham số dòng lệnh (URL1 URL2 ...)
   2) Nếu có file link.txt -> đọc từ đó (mỗi dòng 1 URL)
   3) Nếu không có -> bạn dán thủ công trong terminal
 
+Làn ưu tiên (thêm sau URL, trong link.txt hoặc dòng lệnh):
+  URL #urgent | #normal | #bulk   -> urgent được chen ngang, tạm dừng mục bulk/normal đang tải
+  URL @30m | @2h | @2026-10-20T18:00  -> hạn chót; sắp tới hạn thì được phục vụ trước
+
 Cookies (tùy chọn, định dạng Netscape):
   - Tự động tìm {DEFAULT_COOKIES_CANDIDATES[0]} hoặc {DEFAULT_COOKIES_CANDIDATES[1]}
   - Hoặc chỉ định: --cookies path/to/cookies.txt
   - Hoặc set biến môi trường: YT_COOKIES=path/to/cookies.txt
+
+Cookies pool (nhiều tài khoản, mỗi file *.txt 1 tài khoản):
+  - --cookies-dir path/to/cookies/  hoặc  YT_COOKIES_DIR=path/to/cookies/
+  - Các mục được chia đều cho profile khoẻ; profile dính 403/429 bị cách ly tạm thời
 """
 
-def parse_args(argv: List[str]):
-    """Trả về (cookies_path, urls_list)"""
-    cookies_path: Optional[str] = None
-    urls: List[str] = []
+def parse_args(argv: List[str]) -> dict:
+    """Trả về dict: cookies, cookies_dir, jobs, wav, cache, plan, dry_run, order, daemon, watch, port, crawl, rps,
+    flac_level, mode, style, urls. jobs = None khi không có --jobs (tải: 1 luồng, --crawl: CRAWL_JOBS)."""
+    args = {"cookies": None, "cookies_dir": None, "jobs": None, "wav": {}, "cache": None,
+            "plan": False, "dry_run": False, "order": "fifo",
+            "daemon": False, "watch": False, "port": 0, "crawl": None, "rps": 0, "flac_level": FLAC_LEVEL, "mode": None, "style": None, "urls": []}
+    wav_flags = {"--wav-rate": "sample_rate", "--wav-channels": "channels",
+                 "--wav-bits": "bit_depth", "--wav-segment": "segment_seconds"}
+    urls: List[str] = args["urls"]
 
     i = 1
     while i < len(argv):
@@ -57,13 +95,76 @@ def parse_args(argv: List[str]):
             if i + 1 >= len(argv):
                 print("Thiếu đường dẫn sau --cookies")
                 sys.exit(1)
-            cookies_path = argv[i + 1]
+            args["cookies"] = argv[i + 1]
+            i += 2
+            continue
+        if a == "--cookies-dir":
+            if i + 1 >= len(argv):
+                print("Thiếu thư mục sau --cookies-dir")
+                sys.exit(1)
+            args["cookies_dir"] = argv[i + 1]
+            i += 2
+            continue
+        if a == "--jobs":
+            if i + 1 >= len(argv) or not argv[i + 1].isdigit():
+                print("Thiếu số sau --jobs")
+                sys.exit(1)
+            args["jobs"] = max(int(argv[i + 1]), 1)
+            i += 2
+            continue
+        if a in ("--port", "--mode", "--style", "--flac-level"):
+            if i + 1 >= len(argv) or not argv[i + 1].isdigit():
+                print(f"Thiếu số sau {a}")
+                sys.exit(1)
+            key = a.lstrip("-").replace("-", "_")
+            args[key] = int(argv[i + 1]) if a in ("--port", "--flac-level") else argv[i + 1]
+            i += 2
+            continue
+        if a in ("--plan", "--dry-run", "--daemon", "--watch"):
+            args[a.lstrip("-").replace("-", "_")] = True
+            i += 1
+            continue
+        if a == "--order":
+            if i + 1 >= len(argv) or argv[i + 1] not in ORDERS:
+                print(f"Sau --order cần 1 trong: {', '.join(ORDERS)}")
+                sys.exit(1)
+            args["order"] = argv[i + 1]
+            i += 2
+            continue
+        if a == "--cache":
+            if i + 1 >= len(argv):
+                print("Thiếu thư mục sau --cache")
+                sys.exit(1)
+            args["cache"] = argv[i + 1]
+            i += 2
+            continue
+        if a == "--crawl":
+            if i + 1 >= len(argv):
+                print("Thiếu file kết quả sau --crawl (vd. catalog.jsonl)")
+                sys.exit(1)
+            args["crawl"] = argv[i + 1]
+            i += 2
+            continue
+        if a == "--rps":
+            try:
+                args["rps"] = float(argv[i + 1])
+            except (IndexError, ValueError):
+                print("Thiếu số sau --rps")
+                sys.exit(1)
+            i += 2
+            continue
+        if a in wav_flags:
+            try:
+                args["wav"][wav_flags[a]] = float(argv[i + 1])
+            except (IndexError, ValueError):
+                print(f"Thiếu số sau {a}")
+                sys.exit(1)
             i += 2
             continue
         urls.append(a)
         i += 1
 
-    return cookies_path, urls
+    return args
 
 
 def detect_cookies_path(cli_path: Optional[str]) -> Optional[str]:
@@ -82,6 +183,30 @@ def detect_cookies_path(cli_path: Optional[str]) -> Optional[str]:
     return None
 
 
+def validate_cookies(cookies_path: str):
+    """Parse + kiểm tra cookies 1 lần trước khi chạy; cookie hỏng/hết hạn thì dừng ngay."""
+    from cookie_jar import check_cookies
+
+    chk = check_cookies(cookies_path)
+    if not chk.ok:
+        print(chk.report())
+        print("Hãy xuất lại cookies (Netscape) rồi chạy lại.")
+        sys.exit(1)
+    for w in chk.warnings:
+        print(f"⚠️  {w}")
+
+
+def detect_cookie_pool(cli_dir: Optional[str]):
+    """Ưu tiên: CLI --cookies-dir > ENV YT_COOKIES_DIR. Trả về CookiePool hoặc None."""
+    d = cli_dir or os.getenv("YT_COOKIES_DIR")
+    if not d or not Path(d).is_dir():
+        return None
+    from cookie_pool import CookiePool
+
+    pool = CookiePool(Path(d))
+    return pool if len(pool) else None
+
+
 def parse_input_urls(cli_urls: List[str]) -> List[str]:
     """
     Lấy URL theo thứ tự ưu tiên:
@@ -123,11 +248,14 @@ def choose_mode() -> str:
     print("  2) Âm thanh MP3 (convert)")
     print("  3) Âm thanh WAV (convert)")
     print("  4) Âm thanh gốc (không convert)")
+    print("  5) Âm thanh Opus (copy nếu nguồn đã là Opus)")
+    print("  6) Âm thanh AAC/M4A (copy nếu nguồn đã là AAC)")
+    print("  7) Âm thanh FLAC (lossless, nhỏ hơn WAV 2-3 lần)")
     while True:
-        choice = input("Nhập 1 / 2 / 3 / 4: ").strip()
-        if choice in {"1", "2", "3", "4"}:
+        choice = input("Nhập 1 / 2 / 3 / 4 / 5 / 6 / 7: ").strip()
+        if choice in {"1", "2", "3", "4", "5", "6", "7"}:
             return choice
-        print("Lựa chọn không hợp lệ, hãy nhập 1, 2 hoặc 3, 4")
+        print("Lựa chọn không hợp lệ, hãy nhập 1, 2, 3, 4, 5, 6 hoặc 7")
 
 def danh_so() -> int():
     print("\nChọn định dạng đánh số thứ tự:")
@@ -214,51 +342,168 @@ def make_opts_for_mode(mode: str, cookies_path: Optional[str], style):
             **common,
             "format": "bestaudio[ext=m4a]/bestaudio/best",
         }
-    
+
+    if mode in ("5", "6", "7"):
+        # Opus / AAC: attach_smart_audio sẽ ưu tiên nguồn cùng codec để copy thẳng; FLAC: attach_flac
+        return {
+            **common,
+            "format": "bestaudio/best",
+            "postprocessors": [
+                {"key": "FFmpegExtractAudio", "preferredcodec": AUDIO_TARGETS[mode], "preferredquality": "0"},
+                {"key": "FFmpegMetadata"},
+            ],
+            "prefer_ffmpeg": True,
+        }
+
 
 
-def download_all(urls: List[str], mode: str, cookies_path: Optional[str], style):
+def build_opts(mode: str, cookies_path: Optional[str], style, wav: Optional[dict] = None,
+               cache_dir: Optional[str] = None, flac_level: int = FLAC_LEVEL):
+    """Options yt-dlp theo mode + staging, cache, đường tắt âm thanh/WAV/FLAC. Trả về (opts, audio_stats, cache)."""
     ydl_opts = make_opts_for_mode(mode, cookies_path, style)
+    attach_staging(ydl_opts, DOWNLOAD_DIR)
+    cache = attach_cache(ydl_opts, open_cache(cache_dir))
+    audio_stats = None
+    if mode == "7":
+        attach_flac(ydl_opts, wav, flac_level)
+    elif mode == "3" and wav_options_set(wav):
+        attach_wav_options(ydl_opts, wav)
+    elif mode in AUDIO_TARGETS:
+        audio_stats = attach_smart_audio(ydl_opts, AUDIO_TARGETS[mode])
+    return ydl_opts, audio_stats, cache
+
+
+def pool_runner(pool):
+    from cookie_pool import download_with_pool
+
+    def runner(job, opts):
+        if download_with_pool(pool, [job.url], opts,
+                              per_item_opts=lambda _: {"autonumber_start": job.number or job.id}):
+            raise RuntimeError("tải thất bại (cookies pool)")
+    return runner
+
+
+def run_daemon(mode: str, cookies_path: Optional[str], style, pool=None, jobs: int = 1,
+               wav: Optional[dict] = None, cache_dir: Optional[str] = None, port: Optional[int] = 0,
+               watch: bool = False, flac_level: int = FLAC_LEVEL):
+    """
+    Giữ YoutubeDL/cookies/cache ấm, nhận job qua HTTP/JSON (xem: python daemon.py --help)
+    và/hoặc theo dõi link.txt (watch). port=None: không mở HTTP API.
+    """
+    from daemon import DEFAULT_PORT, serve
+
+    ydl_opts, audio_stats, cache = build_opts(mode, cookies_path, style, wav, cache_dir, flac_level)
+    orch = Orchestrator(ydl_opts, jobs=jobs, runner=pool_runner(pool) if pool else None)
+    if watch:
+        LINK_FILE.touch()
+    done = serve(orch, print_event, port=None if port is None else (port or DEFAULT_PORT),
+                 watch=LINK_FILE if watch else None)
+    ok = sum(1 for j in done if j.status == "done")
+    if audio_stats:
+        print(f"\n{audio_stats.summary()}")
+    print(f"\n✅ Daemon dừng ({ok}/{len(done)} job hoàn tất).")
+
+
+def download_all(urls: List[str], mode: str, cookies_path: Optional[str], style, pool=None, jobs: int = 1,
+                 wav: Optional[dict] = None, cache_dir: Optional[str] = None,
+                 plan: bool = False, dry_run: bool = False, order: str = "fifo", flac_level: int = FLAC_LEVEL):
+    urls, tags = parse_lines(urls)
+    ydl_opts, audio_stats, cache = build_opts(mode, cookies_path, style, wav, cache_dir, flac_level)
+
+    numbers = None
+    if plan or dry_run or order != "fifo":
+        plans = make_plans(urls, ydl_opts, PlanCache(DOWNLOAD_DIR), jobs=jobs)
+        if dry_run:
+            print(plan_report(plans, DOWNLOAD_DIR))
+            return
+        attach_plans(ydl_opts, plans)
+        if order != "fifo":
+            tags.update({p.url: tags[p.src] for p in plans if p.src in tags})
+            urls, numbers = schedule(urls, plans, order)
+        need, free = sum(p.size for p in plans), shutil.disk_usage(DOWNLOAD_DIR.resolve()).free
+        if need > free:
+            print(f"⚠️  Dự kiến cần ~{need / 1e9:.1f} GB nhưng ổ chỉ còn {free / 1e9:.1f} GB.")
 
     kind_map = {
     "1": "MP4",
     "2": "MP3",
     "3": "WAV",
     "4": "M4A",
+    "5": "OPUS",
+    "6": "AAC (M4A)",
+    "7": "FLAC",
     }
     kind = kind_map.get(mode, "Unknown")
     print("\n======== THÔNG TIN TÁC VỤ ========")
     print("Đầu ra    :", kind)
     print("Thư mục   :", DOWNLOAD_DIR.resolve())
-    if cookies_path:
+    if pool:
+        print("Cookies   :", f"pool {pool.dir} ({len(pool)} profile)")
+    elif cookies_path:
         print("Cookies   :", cookies_path)
     else:
         print("Cookies   : (không dùng)")
     print("Số link   :", len(urls))
+    print("Song song :", jobs)
+    if order != "fifo":
+        print("Thứ tự    :", order)
+    if cache:
+        print("Cache     :", f"{cache.root} (tối đa {cache.budget / 1024 ** 3:.0f} GB)")
     print("===================================\n")
 
-    with YoutubeDL(ydl_opts) as ydl:
-        try:
-            ydl.download(urls)
-        except Exception as e:
-            print(f"\n❌ Lỗi: {e}")
-            sys.exit(2)
+    runner = None
+    if pool:
+        from cookie_pool import expand_for_pool
+
+        if numbers is None:   # đã lập kế hoạch thì urls đã là từng video
+            urls = expand_for_pool(urls, pool)
+        runner = pool_runner(pool)
 
-    print("\n✅ Hoàn tất.")
+    orch = Orchestrator(ydl_opts, jobs=jobs, runner=runner)
+    done = run_sync(orch, urls, print_event, numbers, tags)
+    ok = sum(1 for j in done if j.status == "done")
+    if pool:
+        print(f"\nCookies pool: {pool.summary()}")
+    if any(lane != "normal" or deadline for lane, deadline in tags.values()):
+        print(f"\nTheo làn:\n{orch.lane_summary()}")
+    if audio_stats:
+        print(f"\n{audio_stats.summary()}")
+    if cache:
+        print(f"\nCache: {cache.hits} mục lấy từ cache, {cache.stored} format mới được lưu.")
+    print(f"\n✅ Hoàn tất ({ok}/{len(done)} link).")
 
 
 def main():
     print(BANNER)
-    cookies_cli, cli_urls = parse_args(sys.argv)
-    urls = parse_input_urls(cli_urls)
-    mode = choose_mode()
-    style = danh_so()
+    args = parse_args(sys.argv)
+    cookies_cli, cookies_dir = args["cookies"], args["cookies_dir"]
+    resident = args["daemon"] or args["watch"]
+    urls = [] if resident else parse_input_urls(args["urls"])
+    if args["crawl"]:
+        from crawler import CRAWL_JOBS, crawl
+
+        cookies_path = detect_cookies_path(cookies_cli)
+        crawl(parse_lines(urls)[0], {"cookiefile": cookies_path} if cookies_path else {}, args["crawl"],
+              args["jobs"] or CRAWL_JOBS, args["rps"])
+        return
+    mode = args["mode"] if args["mode"] in AUDIO_TARGETS or args["mode"] in ("1", "4") else choose_mode()
+    style = int(args["style"]) if args["style"] else danh_so()
     cookies_path = detect_cookies_path(cookies_cli)
     if cookies_cli and not cookies_path:
         print("⚠️  Đường dẫn cookies từ --cookies không tồn tại, tiếp tục chạy không dùng cookies.")
     elif os.getenv("YT_COOKIES") and not cookies_path:
         print("⚠️  Biến môi trường YT_COOKIES không trỏ tới file hợp lệ, tiếp tục chạy không dùng cookies.")
-    download_all(urls, mode, cookies_path, style)
+    if cookies_path:
+        validate_cookies(cookies_path)
+    pool = detect_cookie_pool(cookies_dir)
+    if cookies_dir and not pool:
+        print("⚠️  Thư mục --cookies-dir không có file cookies nào, bỏ qua pool.")
+    if resident:
+        run_daemon(mode, cookies_path, style, pool, args["jobs"] or 1, args["wav"], args["cache"],
+                   args["port"] if args["daemon"] else None, args["watch"], args["flac_level"])
+        return
+    download_all(urls, mode, cookies_path, style, pool, args["jobs"] or 1, args["wav"], args["cache"],
+                 args["plan"], args["dry_run"], args["order"], args["flac_level"])
 
 
 if __name__ == "__main__":
@@ -1,18 +1,36 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import sys, os, re, time
+import sys, os, re, time, signal, shutil, threading
+from datetime import datetime
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
 from typing import List, Optional, Dict
 
-from yt_dlp import YoutubeDL
-from huggingface_hub import HfApi, create_repo, hf_hub_url, upload_file
+from huggingface_hub import HfApi, CommitOperationAdd, create_commit, create_repo, hf_hub_url
+
+from orchestrator import Orchestrator, build_ydl, run_sync, print_event
+from staging import attach_staging
+from audio_fastpath import attach_smart_audio
+from wav_shards import FLAC_LEVEL, attach_flac, attach_wav_options, wav_options_set
+from shard_writer import ItemTooLarge, ShardWriter, item_key, item_meta
+from manifest import ManifestWriter, file_sha256
+from media_cache import attach_cache, open_cache
+from lanes import parse_lines
+from bandwidth import ThrottledReader, current_flow
+from audio_fingerprint import open_dedup
+from repo_shards import SHARD_MAP, make_router, route_info
+from lfs_multipart import upload_large
+from planner import ORDERS, Plan, PlanCache, attach_plans, make_plans, schedule, report as plan_report
 
 ROOT = Path.cwd()
+MULTIPART = {"workers": 0, "min_bytes": 0}   # [hf] multipart_*, đặt trong resolve_target
 CONF_FILE = ROOT / "run_hf.toml"
 DOWNLOAD_DIR = ROOT / "downloads"
 DOWNLOAD_DIR.mkdir(exist_ok=True)
 LINK_FILE = ROOT / "link.txt"
+MODE_EXT = {"1": "mp4", "2": "mp3", "3": "wav", "5": "opus", "6": "m4a", "7": "flac"}    # cùng số mode với run.py (4 = giữ m4a gốc: chỉ có ở run.py)
+MODE_KIND = {"1": "MP4", "2": "MP3", "3": "WAV", "5": "OPUS", "6": "AAC (M4A)", "7": "FLAC"}
 
 # =============== Config loader ===============
 def load_toml(path: Path) -> dict:
@@ -31,6 +49,12 @@ def merge_config(conf: dict) -> dict:
     hf = conf.get("hf", {}) if conf else {}
     cookies = conf.get("cookies", {}) if conf else {}
     dl = conf.get("downloader", {}) if conf else {}
+    wav = conf.get("wav", {}) if conf else {}
+    cache = conf.get("cache", {}) if conf else {}
+    sync = conf.get("sync", {}) if conf else {}
+    dedup = conf.get("dedup", {}) if conf else {}
+    crawl = conf.get("crawl", {}) if conf else {}
+    flac = conf.get("flac", {}) if conf else {}
 
     merged = {
         "hf": {
@@ -39,16 +63,58 @@ def merge_config(conf: dict) -> dict:
             "repo_type":   os.getenv("HF_REPO_TYPE",   hf.get("repo_type",   "dataset").strip() or "dataset"),
             "branch":      os.getenv("HF_BRANCH",      hf.get("branch",      "main").strip() or "main"),
             "path_prefix": os.getenv("HF_PATH_PREFIX", hf.get("path_prefix", "").strip()),
+            "output":        (hf.get("output", "files") or "files").strip(),   # files | tar | parquet
+            "shard_size_mb": int(hf.get("shard_size_mb", 1024)),
+            "manifest":       bool(hf.get("manifest", True)),     # manifest metadata kèm dữ liệu
+            "manifest_batch": int(hf.get("manifest_batch", 100)),
+            "shards":              int(hf.get("shards", 1)),              # chia ra N repo/branch theo hash id
+            "shard_mode":          str(hf.get("shard_mode", "repo")).strip().lower(),   # repo | branch
+            "uploaders_per_shard": int(hf.get("uploaders_per_shard", 1)),  # số commit song song mỗi đích
+            "multipart_workers":   int(hf.get("multipart_workers", 0)),    # > 0: file lớn upload LFS nhiều phần song song
+            "multipart_min_mb":    int(hf.get("multipart_min_mb", 256)),
         },
         "cookies": {
             "path": os.getenv("YT_COOKIES", cookies.get("path", "").strip()),
+            "dir":  os.getenv("YT_COOKIES_DIR", cookies.get("dir", "").strip()),
+            "min_interval": float(cookies.get("min_interval", 0)),  # nhịp tối thiểu/tài khoản (giây)
         },
         "downloader": {
             "ratelimit":          int(dl.get("ratelimit",          2_000_000)),  # ~2MB/s
             "sleep_interval":     float(dl.get("sleep_interval",   2)),
             "max_sleep_interval": float(dl.get("max_sleep_interval",5)),
             "sleep_requests":     float(dl.get("sleep_requests",   0.5)),
-        }
+            "jobs":               int(dl.get("jobs",               1)),   # số mục tải song song
+            "upload_workers":     int(dl.get("upload_workers",     2)),   # số luồng upload HF
+            "order":              str(dl.get("order", "fifo")).strip().lower(),   # fifo | longest | shortest
+            "bandwidth":          int(dl.get("bandwidth",          0)),   # tổng byte/s mọi luồng tải; 0 = dùng ratelimit
+            "upload_bandwidth":   int(dl.get("upload_bandwidth",   0)),   # tổng byte/s mọi luồng upload; 0 = tắt
+        },
+        "flac": {  # mode FLAC (6): resample / kênh / bit depth / cắt đoạn lấy theo [wav]
+            "compression_level": int(flac.get("compression_level", FLAC_LEVEL)),   # 0..12
+        },
+        "wav": {   # dùng cho mode WAV và FLAC; để 0 = giữ nguyên như nguồn
+            "sample_rate":     int(wav.get("sample_rate",     0)),
+            "channels":        int(wav.get("channels",        0)),
+            "bit_depth":       int(wav.get("bit_depth",       16)),
+            "segment_seconds": float(wav.get("segment_seconds", 0)),
+        },
+        "cache": {   # cache media dùng chung với run.py / GUI; dir rỗng = tắt
+            "dir":    os.getenv("YT_CACHE_DIR", cache.get("dir", "").strip()),
+            "max_gb": float(os.getenv("YT_CACHE_GB", cache.get("max_gb", 20))),
+        },
+        "sync": {    # --sync: chỉ tải video mới của kênh/playlist kể từ lần trước
+            "stop_after_known": int(sync.get("stop_after_known", 5)),
+        },
+        "dedup": {   # vân tay âm thanh: bản re-upload của cùng bài chỉ được ghi vào manifest, không upload lại
+            "enabled":   bool(dedup.get("enabled", False)),
+            "index":     os.getenv("YT_DEDUP_INDEX", str(dedup.get("index", "") or DOWNLOAD_DIR / "fingerprints.sqlite")),
+            "threshold": float(dedup.get("threshold", 0.32)),
+        },
+        "crawl": {   # --crawl OUT: chỉ lấy metadata, không tải media
+            "jobs":   int(crawl.get("jobs", 16)),
+            "rps":    float(crawl.get("requests_per_second", 0)),   # tối đa video/giây cả tiến trình; 0 = không giới hạn
+            "fields": list(crawl.get("fields", [])),                 # rỗng = bộ trường mặc định của crawler.py
+        },
     }
     return merged
 
@@ -56,29 +122,74 @@ def merge_config(conf: dict) -> dict:
 def ensure_hf_repo(api: HfApi, token: str, repo_id: str, repo_type: str):
     create_repo(repo_id=repo_id, repo_type=repo_type, token=token, exist_ok=True)
 
+class ThrottledAdd(CommitOperationAdd):
+    """CommitOperationAdd đọc dữ liệu qua ngân sách upload chung (bandwidth.py) nếu được tạo trong 1 lượt upload."""
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.flow = current_flow()   # hub có thể đọc file ở luồng khác -> giữ luồng băng thông từ lúc tạo
+
+    @contextmanager
+    def as_file(self, with_tqdm: bool = False):
+        with super().as_file(with_tqdm=with_tqdm) as f:
+            yield ThrottledReader(f, self.flow) if self.flow is not None else f
+
+def preupload_large(ops: List[CommitOperationAdd], token: str, repo_id: str, repo_type: str, branch: str):
+    """[hf] multipart_workers > 0: file lớn được đẩy trước bằng LFS multipart song song (lfs_multipart.py)."""
+    if not MULTIPART["workers"]:
+        return
+    for op in ops:
+        if upload_large(op, repo_id, repo_type, branch, token, MULTIPART["workers"], MULTIPART["min_bytes"]):
+            print(f"   ⇉ {op.path_in_repo}: LFS multipart {MULTIPART['workers']} luồng")
+
 def hf_upload(api: HfApi, token: str, repo_id: str, repo_type: str,
               branch: str, fpath: Path, path_in_repo: str) -> str:
-    upload_file(
-        path_or_fileobj=str(fpath),
-        path_in_repo=path_in_repo,
+    ops = [ThrottledAdd(path_in_repo=path_in_repo, path_or_fileobj=str(fpath))]
+    preupload_large(ops, token, repo_id, repo_type, branch)
+    create_commit(
         repo_id=repo_id,
         repo_type=repo_type,
         token=token,
         revision=branch,
+        operations=ops,
+        commit_message=f"Upload {path_in_repo} with huggingface_hub",
     )
     return hf_hub_url(repo_id=repo_id, filename=path_in_repo,
                       repo_type=repo_type, revision=branch)
 
+def hf_upload_shard(api: HfApi, token: str, repo_id: str, repo_type: str,
+                    branch: str, prefix: str, shard: Path, index: Path):
+    """Đẩy 1 shard + file index của nó trong cùng 1 commit, rồi xoá bản local."""
+    ops = [ThrottledAdd(path_in_repo=infer_path_in_repo(prefix, p.name), path_or_fileobj=str(p))
+           for p in (shard, index)]
+    print(f"↑ Upload shard HF: {shard.name} ({shard.stat().st_size / 1e6:.1f} MB)")
+    preupload_large(ops, token, repo_id, repo_type, branch)
+    api.create_commit(repo_id=repo_id, repo_type=repo_type, revision=branch, token=token,
+                      operations=ops, commit_message=f"Add {shard.name}")
+    for p in (shard, index):
+        p.unlink(missing_ok=True)
+    print(f"   ✓ {shard.name}")
+
+
 def infer_path_in_repo(prefix: str, name: str) -> str:
     prefix = (prefix or "").strip().lstrip("/")
     return f"{prefix}/{name}" if prefix else name
 
 # =============== yt-dlp options (per-item upload) ===============
 def make_opts(mode: str, cookies_path: Optional[str], dl_cfg: dict,
-             api: HfApi, token: str, repo_id: str, repo_type: str, branch: str, prefix: str, style):
+             api: HfApi, token: str, repo_id: str, repo_type: str, branch: str, prefix: str, style,
+             on_uploaded=None, uploader=None, shards=None, manifest=None, dedup=None, router=None):
+    """
+    on_uploaded(info, path_in_repo, nbytes): gọi sau mỗi lần upload thành công (vd: báo về hàng đợi).
+    uploader(fn, *args): nếu có, việc upload + xoá local được giao cho pool upload (không chặn luồng tải).
+    shards: ShardWriter -> gom file vào shard (tar/parquet) thay vì đẩy từng file.
+    manifest: ManifestWriter -> ghi metadata + sha256 + đường dẫn trong repo của từng mục.
+    dedup: AudioDedup -> file trùng âm thanh với bản đã upload thì chỉ ghi manifest trỏ tới bản đó.
+    router: ShardRouter -> mỗi file vào repo/branch theo hash id (repo_shards.py), manifest ghi kèm đích.
+    """
 
     uploaded_once = set()
-    wanted_ext = {"1": "mp4", "2": "mp3", "3": "wav"}[mode]  # <— đuôi mong muốn
+    wanted_ext = MODE_EXT[mode]  # <— đuôi mong muốn
 
     def progress_hook(d):
         if d.get("status") == "downloading":
@@ -103,20 +214,81 @@ def make_opts(mode: str, cookies_path: Optional[str], dl_cfg: dict,
                     break
         if not target:
             return
-        key = str(target.resolve())
-        if key in uploaded_once:
+        # WAV cắt đoạn: 1 video -> nhiều file, đẩy đủ từng đoạn
+        targets = [Path(p) for p in info.get("shard_files") or []] or [target]
+        for t in targets:
+            key = str(t.resolve())
+            if key in uploaded_once or not t.exists():
+                continue
+            uploaded_once.add(key)
+            if uploader:
+                uploader(push, t, info)
+            else:
+                push(t, info)
+
+    def push(target: Path, info: dict):
+        vid = info.get("id")
+        use_dedup = dedup is not None and vid and not info.get("shard_files")   # WAV cắt đoạn: không so
+        if use_dedup:
+            dup = dedup.check(target, vid)
+            if dup:
+                print(f"   ♻️  Trùng âm thanh với [{dup['id']}] (BER {dup['ber']}) -> không upload {target.name}")
+                if on_uploaded and dup["repo_path"]:
+                    on_uploaded(info, dup["repo_path"], 0)
+                if manifest:
+                    manifest.add(info, repo_path=dup["repo_path"], duplicate_of=dup["id"], duplicate_ber=dup["ber"],
+                                 **route_info(router, dup["id"]))
+                target.unlink(missing_ok=True)
+                return
+
+        entry = None
+        if shards is not None:
+            # Gom vào shard; shard đầy sẽ tự upload (1 commit / shard)
+            try:
+                sha = file_sha256(target) if manifest else None
+                size = target.stat().st_size
+                entry = shards.add(target, item_key(target, info), item_meta(info))
+                target.unlink()
+            except ItemTooLarge as e:
+                print(f"   ⚠️  {e} -> upload riêng file này")
+            except Exception as e:
+                print(f"   ❌ Lỗi ghi shard: {e}")
+                if use_dedup:
+                    dedup.index.forget(vid)
+                return
+        if entry is not None:
+            if use_dedup:
+                dedup.index.set_path(vid, infer_path_in_repo(prefix, entry["shard"]))
+            if manifest:
+                manifest.add(info, repo_path=infer_path_in_repo(prefix, entry["shard"]), sha256=sha,
+                             size=size, shard_key=entry["key"], **route_info(router, entry["shard"]))
             return
-        uploaded_once.add(key)
 
         # Upload
         path_in_repo = infer_path_in_repo(prefix, target.name)
+        dest = router.pick(vid or target.name) if router and len(router) > 1 else None
         try:
             print(f"↑ Upload HF: {path_in_repo}")
-            url_file = hf_upload(api, token, repo_id, repo_type, branch, target, path_in_repo)
+            with dest.slots if dest else nullcontext():
+                url_file = hf_upload(api, token, dest.repo_id if dest else repo_id, repo_type,
+                                     dest.branch if dest else branch, target, path_in_repo)
             print(f"   ✓ {url_file}")
         except Exception as e:
             print(f"   ❌ Lỗi upload: {e}")
+            if use_dedup:
+                dedup.index.forget(vid)   # để bản trùng sau (hoặc lần chạy sau) làm bản gốc
             return
+        if use_dedup:
+            dedup.index.set_path(vid, path_in_repo)
+        if dest:
+            router.count(dest, target.stat().st_size)
+        if on_uploaded:
+            on_uploaded(info, path_in_repo, target.stat().st_size)
+        if manifest:
+            # FLAC cắt đoạn: số mẫu của đúng đoạn này (info["samples"] là tổng cả video)
+            seg = (info.get("segment_samples") or {}).get(str(target))
+            manifest.add(info, target, repo_path=path_in_repo, **route_info(router, vid or target.name),
+                         **({"samples": seg} if seg is not None else {}))
 
         # Xoá local
         try:
@@ -155,8 +327,8 @@ def make_opts(mode: str, cookies_path: Optional[str], dl_cfg: dict,
                 {"key": "FFmpegMetadata"},
             ],
         }
-    else:           # MP3 / WAV
-        target = "mp3" if mode == "2" else "wav"
+    else:           # MP3 / WAV / Opus / AAC
+        target = wanted_ext
         return {
             **common,
             "format": "bestaudio/best",
@@ -175,8 +347,9 @@ def make_opts(mode: str, cookies_path: Optional[str], dl_cfg: dict,
 
 
 # =============== Orchestrator ===============
-def run_pipeline(urls: List[str], mode: str, cfg: dict, style):
-    hf = cfg["hf"]; cookies = cfg["cookies"]; dl_cfg = cfg["downloader"]
+def resolve_target(cfg: dict) -> dict:
+    """Kiểm tra token/repo, cookies và tạo repo HF nếu chưa có. Trả về context dùng chung."""
+    hf = cfg["hf"]; cookies = cfg["cookies"]
 
     token = (hf.get("token") or "").strip()
     repo_id = (hf.get("repo_id") or "").strip()
@@ -194,31 +367,419 @@ def run_pipeline(urls: List[str], mode: str, cfg: dict, style):
         cookies_path = None
     elif not cookies_path:
         cookies_path = None
+    if cookies_path:
+        from cookie_jar import check_cookies
 
+        chk = check_cookies(cookies_path)   # dừng trước khi tốn hàng giờ cho 1 lô chắc chắn 403
+        if not chk.ok:
+            print(chk.report())
+            sys.exit(2)
+        for w in chk.warnings:
+            print(f"⚠️  {w}")
+
+    pool = None
+    cookies_dir = (cookies.get("dir") or "").strip()
+    if cookies_dir:
+        from cookie_pool import CookiePool
+
+        if Path(cookies_dir).is_dir():
+            pool = CookiePool(Path(cookies_dir), cookies.get("min_interval", 0))
+        if not pool:
+            print(f"⚠️  Thư mục cookies không có file nào: {cookies_dir}. Bỏ qua pool.")
+            pool = None
+
+    MULTIPART.update(workers=max(hf.get("multipart_workers", 0), 0),
+                     min_bytes=hf.get("multipart_min_mb", 256) * 1024 * 1024)
     api = HfApi()
     ensure_hf_repo(api, token, repo_id, repo_type)
+    router = make_router(hf, repo_id, branch)
+    if len(router) > 1:
+        # repo_id@branch vẫn là "repo chính": giữ manifest + shard_map.json để người đọc tìm file
+        router.ensure(api, token, repo_type)
+        hf_upload(api, token, repo_id, repo_type, branch, router.write_map(DOWNLOAD_DIR / SHARD_MAP),
+                  infer_path_in_repo(prefix, f"manifest/{SHARD_MAP}"))
+    manifest = make_manifest(api, token, repo_id, repo_type, branch, prefix, hf)
+    return {
+        "manifest": manifest, "dedup": open_dedup(cfg["dedup"]), "router": router,
+        "api": api, "token": token, "repo_id": repo_id, "repo_type": repo_type,
+        "branch": branch, "prefix": prefix, "cookies_path": cookies_path, "pool": pool,
+        "output": hf.get("output", "files"), "shard_size_mb": hf.get("shard_size_mb", 1024),
+    }
+
 
-    kind = "MP4" if mode == "1" else ("MP3" if mode == "2" else "WAV")
+def print_summary(ctx: dict, mode: str, n_urls):
+    kind = MODE_KIND[mode]
     print("\n======== THÔNG TIN TÁC VỤ ========")
     print("Đầu ra    :", kind)
     print("Local     :", DOWNLOAD_DIR.resolve(), "(tạm)")
-    print("Cookies   :", cookies_path or "(không dùng)")
-    print("HF repo   :", repo_id, f"({repo_type})")
-    print("HF branch :", branch)
-    print("HF prefix :", prefix or "(root)")
-    print("Số link   :", len(urls))
+    if ctx["pool"]:
+        print("Cookies   :", f"pool {ctx['pool'].dir} ({len(ctx['pool'])} profile)")
+    else:
+        print("Cookies   :", ctx["cookies_path"] or "(không dùng)")
+    print("HF repo   :", ctx["repo_id"], f"({ctx['repo_type']})")
+    print("HF branch :", ctx["branch"])
+    print("HF prefix :", ctx["prefix"] or "(root)")
+    if len(ctx["router"]) > 1:
+        r = ctx["router"]
+        print("HF shards :", f"{r.n} {r.mode} ({r.targets[0].repo_id}@{r.targets[0].branch} .. "
+                             f"{r.targets[-1].repo_id}@{r.targets[-1].branch}), "
+                             f"{r.uploaders} upload/đích")
+    if ctx.get("output", "files") != "files":
+        print("HF output :", f"shard {ctx['output']} (~{ctx['shard_size_mb']} MB/shard)")
+    if ctx.get("dedup"):
+        print("Chống trùng:", f"vân tay âm thanh ({ctx['dedup'].index.path})")
+    print("Số link   :", n_urls)
     print("===================================\n")
 
-    opts = make_opts(mode, cookies_path, dl_cfg, api, token, repo_id, repo_type, branch, prefix, style)
-    with YoutubeDL(opts) as ydl:
-        ydl.download(urls)
 
-    print("\n✅ Hoàn tất toàn bộ danh sách (đã upload từng bài & dọn file tạm).")
+def ctx_opts(ctx: dict, mode: str, dl_cfg: dict, style, on_uploaded=None, uploader=None, shards=None) -> dict:
+    return make_opts(mode, ctx["cookies_path"], dl_cfg, ctx["api"], ctx["token"], ctx["repo_id"],
+                     ctx["repo_type"], ctx["branch"], ctx["prefix"], style,
+                     on_uploaded=on_uploaded, uploader=uploader, shards=shards, manifest=ctx["manifest"],
+                     dedup=ctx["dedup"], router=ctx["router"])
+
+
+def make_manifest(api: HfApi, token: str, repo_id: str, repo_type: str, branch: str,
+                  prefix: str, hf_cfg: dict) -> Optional[ManifestWriter]:
+    if not hf_cfg.get("manifest", True):
+        return None
+
+    def on_batch(part: Path):
+        path_in_repo = infer_path_in_repo(prefix, f"manifest/{part.name}")
+        try:
+            hf_upload(api, token, repo_id, repo_type, branch, part, path_in_repo)
+            print(f"   ✓ Manifest: {path_in_repo}")
+        except Exception as e:
+            print(f"   ❌ Lỗi upload manifest {part.name}: {e} (giữ lại ở {part.parent})")
+
+    return ManifestWriter(DOWNLOAD_DIR / "manifest.jsonl", hf_cfg.get("manifest_batch", 100), on_batch)
+
+
+def make_shard_writer(ctx: dict, hf_cfg: dict) -> Optional[ShardWriter]:
+    output = hf_cfg.get("output", "files")
+    if output not in ("tar", "parquet"):
+        return None
+
+    def on_shard(shard: Path, index: Path):
+        router = ctx["router"]
+        dest = router.pick(shard.name)
+        try:
+            size = shard.stat().st_size
+            with dest.slots if len(router) > 1 else nullcontext():
+                hf_upload_shard(ctx["api"], ctx["token"], dest.repo_id, ctx["repo_type"],
+                                dest.branch, ctx["prefix"], shard, index)
+            router.count(dest, size)
+        except Exception as e:
+            print(f"   ❌ Lỗi upload shard {shard.name}: {e} (giữ lại ở {shard.parent})")
+
+    writer = ShardWriter(DOWNLOAD_DIR / "shards", fmt=output,
+                         max_bytes=hf_cfg.get("shard_size_mb", 1024) * 1024 * 1024, on_shard=on_shard)
+    writer.recover()   # shard đã đóng nhưng chưa kịp upload ở lần chạy trước
+    return writer
+
+
+def attach_mode(opts: dict, mode: str, cfg: dict):
+    """Staging, cache, đường tắt âm thanh / WAV / FLAC theo mode. Trả về (audio_stats, cache)."""
+    attach_staging(opts, DOWNLOAD_DIR)
+    cache = attach_cache(opts, open_cache(cfg["cache"]["dir"], cfg["cache"]["max_gb"]))
+    audio_stats = None
+    if mode == "7":
+        attach_flac(opts, cfg["wav"], cfg["flac"]["compression_level"])
+    elif mode == "3" and wav_options_set(cfg["wav"]):
+        attach_wav_options(opts, cfg["wav"])
+    elif mode != "1":
+        audio_stats = attach_smart_audio(opts, MODE_EXT[mode])
+    return audio_stats, cache
+
+
+def warn_disk(plans: List[Plan]):
+    need = sum(p.size for p in plans)
+    free = shutil.disk_usage(DOWNLOAD_DIR.resolve()).free
+    if need > free:
+        print(f"⚠️  Dự kiến cần ~{need / 1e9:.1f} GB nhưng ổ chỉ còn {free / 1e9:.1f} GB "
+              f"(upload xong sẽ xoá dần, nhưng nên chạy --jobs nhỏ).")
+
+
+def dry_run(urls: List[str], mode: str, cfg: dict, style):
+    """Chỉ lập kế hoạch (không cần token HF, không tải): in format/dung lượng/hậu xử lý từng video."""
+    cookies_path = (cfg["cookies"].get("path") or "").strip() or None
+    opts = make_opts(mode, cookies_path, cfg["downloader"], None, "", "", "", "", "", style)
+    attach_mode(opts, mode, cfg)
+    urls, _ = parse_lines(urls)
+    plans = make_plans(urls, opts, PlanCache(DOWNLOAD_DIR), jobs=cfg["downloader"]["jobs"])
+    print(plan_report(plans, DOWNLOAD_DIR))
+
+
+def collect_sync(sources: List[str], mode: str, cfg: dict, style):
+    """--sync: nguồn (kênh/playlist) trong link.txt -> các video mới kể từ lần đồng bộ trước."""
+    from channel_sync import SyncState, sync_sources
+
+    cookies_path = (cfg["cookies"].get("path") or "").strip() or None
+    opts = make_opts(mode, cookies_path, cfg["downloader"], None, "", "", "", "", "", style)
+    sources, tags = parse_lines(sources)
+    state = SyncState(DOWNLOAD_DIR)
+    items = sync_sources(sources, opts, state, jobs=cfg["downloader"]["jobs"],
+                         stop_after=cfg["sync"]["stop_after_known"])
+
+    def suffix(src):   # video mới giữ làn / hạn chót của nguồn
+        lane, deadline = tags[src]
+        return f"#{lane}" + (f" @{datetime.fromtimestamp(deadline).isoformat()}" if deadline else "")
+    return state, items, [f"{it.url} {suffix(it.source)}" for it in items]
+
+
+def install_reload(orch: Orchestrator, shard_count: int = 1, uploaders_per_shard: int = 1):
+    """
+    SIGHUP (kill -HUP <pid>): đọc lại [downloader] trong run_hf.toml (ENV vẫn ưu tiên) và đổi nóng
+    jobs, upload_workers, bandwidth/ratelimit, upload_bandwidth, sleep_* cho pipeline đang chạy.
+    Các khoá khác (repo, mode, order...) chỉ đọc lúc khởi động.
+    """
+    if not hasattr(signal, "SIGHUP") or threading.current_thread() is not threading.main_thread():
+        return    # Windows: đổi nóng qua daemon (POST /config)
+
+    def reload():
+        try:
+            dl = merge_config(load_toml(CONF_FILE))["downloader"]
+            if dl["upload_bandwidth"]:
+                from huggingface_hub import constants as hf_constants
+
+                hf_constants.HF_HUB_DISABLE_XET = True
+            knobs = orch.tune(
+                jobs=dl["jobs"],
+                upload_workers=max(dl["upload_workers"], shard_count * uploaders_per_shard)
+                if shard_count > 1 else dl["upload_workers"],
+                bandwidth=dl["bandwidth"] or dl["ratelimit"] or 0, upload_bandwidth=dl["upload_bandwidth"],
+                sleep_interval=dl["sleep_interval"], max_sleep_interval=dl["max_sleep_interval"],
+                sleep_requests=dl["sleep_requests"])
+            print("🔧 Đã nạp lại cấu hình: " + ", ".join(f"{k}={v}" for k, v in knobs.items() if v is not None))
+        except Exception as e:
+            print(f"⚠️  Nạp lại cấu hình lỗi, giữ nguyên tham số cũ: {e}")
+
+    # làm ngoài signal handler: tune() lấy lock của governor mà luồng chính có thể đang giữ
+    signal.signal(signal.SIGHUP, lambda signum, frame: threading.Thread(target=reload, daemon=True).start())
+
+
+def run_pipeline(urls: List[str], mode: str, cfg: dict, style, plan: bool = False,
+                 daemon_port: Optional[int] = None, watch: bool = False):
+    """
+    daemon_port: không chạy danh sách urls mà giữ pipeline ấm, nhận job qua HTTP/JSON (daemon.py).
+    watch: tải hết link.txt rồi theo dõi, dòng ghi thêm được đưa thẳng vào bộ điều phối đang chạy.
+    """
+    resident = daemon_port is not None or watch
+    ctx = resolve_target(cfg)
+    print_summary(ctx, mode, len(urls) if not resident else
+                  ", ".join(t for t in (f"daemon, cổng {daemon_port}" if daemon_port is not None else "",
+                                        f"theo dõi {LINK_FILE.name}" if watch else "") if t))
+
+    dl_cfg = cfg["downloader"]
+    # Tải và upload chồng lên nhau: hook hậu xử lý chỉ xếp việc upload vào pool của orchestrator
+    orch_ref: List[Orchestrator] = []
+    shards = make_shard_writer(ctx, cfg["hf"])
+    opts = ctx_opts(ctx, mode, dl_cfg, style,
+                    uploader=lambda fn, *a: orch_ref[0].upload(fn, *a), shards=shards)
+    audio_stats, cache = attach_mode(opts, mode, cfg)
+    urls, tags = parse_lines(urls)
+    numbers = None
+    order = dl_cfg["order"]
+    if not resident and (plan or order != "fifo"):
+        plans = make_plans(urls, opts, PlanCache(DOWNLOAD_DIR), jobs=dl_cfg["jobs"])
+        warn_disk(plans)
+        attach_plans(opts, plans)
+        if order != "fifo":
+            tags.update({p.url: tags[p.src] for p in plans if p.src in tags})
+            urls, numbers = schedule(urls, plans, order)
+            print(f"Thứ tự tải: {order} ({len(urls)} mục)")
+
+    runner = None
+    pool = ctx["pool"]
+    if pool:
+        from cookie_pool import download_with_pool, expand_for_pool
+
+        if numbers is None and urls:   # đã lập kế hoạch thì urls đã là từng video
+            urls = expand_for_pool(urls, pool)
+
+        def runner(job, job_opts):
+            if download_with_pool(pool, [job.url], job_opts,
+                                  per_item_opts=lambda _: {"autonumber_start": job.number or job.id}):
+                raise RuntimeError("tải thất bại (cookies pool)")
+
+    if dl_cfg["upload_bandwidth"]:
+        from huggingface_hub import constants as hf_constants
+
+        # hf_xet đọc file trực tiếp (không qua Python) -> tắt để ngân sách upload có hiệu lực
+        hf_constants.HF_HUB_DISABLE_XET = True
+    # ratelimit trong TOML là trần tổng của cả tiến trình, không nhân theo số luồng tải
+    router = ctx["router"]
+    # chia nhiều đích: đủ luồng upload để mọi đích cùng nhận commit
+    upload_workers = max(dl_cfg["upload_workers"], len(router) * router.uploaders) \
+        if len(router) > 1 else dl_cfg["upload_workers"]
+    orch = Orchestrator(opts, jobs=dl_cfg["jobs"], upload_workers=upload_workers, runner=runner,
+                        bandwidth=dl_cfg["bandwidth"] or dl_cfg["ratelimit"] or None,
+                        upload_bandwidth=dl_cfg["upload_bandwidth"] or None)
+    orch_ref.append(orch)
+    install_reload(orch, len(router), router.uploaders)
+    if resident:
+        from daemon import serve
+
+        if watch:
+            LINK_FILE.touch()
+        done = serve(orch, print_event, port=daemon_port, watch=LINK_FILE if watch else None)
+        tags = {j.url: (j.lane, j.deadline) for j in done}
+    else:
+        done = run_sync(orch, urls, print_event, numbers, tags)
+    ok = sum(1 for j in done if j.status == "done")
+    if shards is not None:
+        shards.close()   # shard cuối (chưa đầy) cũng được đẩy lên
+    if ctx["manifest"]:
+        ctx["manifest"].flush()
+    if pool:
+        print(f"\nCookies pool: {pool.summary()}")
+    if any(lane != "normal" or deadline for lane, deadline in tags.values()):
+        print(f"\nTheo làn:\n{orch.lane_summary()}")
+    if audio_stats:
+        print(f"\n{audio_stats.summary()}")
+    if cache:
+        print(f"\nCache: {cache.hits} mục lấy từ cache, {cache.stored} format mới được lưu.")
+    if ctx["dedup"]:
+        print(f"\n{ctx['dedup'].summary()}")
+    if len(router) > 1:
+        print(f"\nTheo đích HF:\n{router.summary()}")
+
+    print(f"\n✅ Hoàn tất {ok}/{len(done)} link (đã upload từng bài & dọn file tạm).")
+    return done
+
+
+def run_worker(queue_path: Path, mode: str, cfg: dict, style, worker_id: Optional[str] = None):
+    """Worker: kéo từng job từ hàng đợi chung, tải + upload, báo kết quả về chỉ mục chống trùng."""
+    from work_queue import WorkQueue, default_worker_id
+
+    worker_id = worker_id or default_worker_id()
+    q = WorkQueue(queue_path)
+    ctx = resolve_target(cfg)
+    if ctx["output"] != "files":
+        # chỉ mục chống trùng cần đường dẫn từng file -> worker luôn đẩy từng file
+        print("⚠️  Worker hàng đợi chỉ hỗ trợ output = files, bỏ qua chế độ shard.")
+        ctx["output"] = "files"
+    print_summary(ctx, mode, f"(hàng đợi {queue_path}, worker {worker_id})")
+
+    uploaded: List[tuple] = []
+    nbytes = [0]
+
+    def on_uploaded(info, path_in_repo, size):
+        uploaded.append((info.get("id"), path_in_repo))
+        nbytes[0] += size
+
+    # Ctrl+C/SIGTERM: làm nốt job đang chạy rồi thoát (lease chưa làm tự quay lại hàng đợi khi hết hạn)
+    draining = []
+
+    def on_stop(signum, frame):
+        if draining:
+            raise KeyboardInterrupt
+        draining.append(signum)
+        print("\n⏹ Sẽ dừng sau job hiện tại (Ctrl+C lần nữa để thoát ngay)…")
+
+    signal.signal(signal.SIGINT, on_stop)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, on_stop)
+
+    opts = ctx_opts(ctx, mode, cfg["downloader"], style, on_uploaded=on_uploaded)
+    attach_mode(opts, mode, cfg)
+    # 1 job = 1 video -> lỗi phải nổi lên để trả job về hàng đợi
+    opts["ignoreerrors"] = False
+    with build_ydl(opts) as ydl:
+        while not draining:
+            jobs = q.lease(worker_id)
+            if not jobs:
+                break
+            job_id, url, vid = jobs[0]
+            if vid and q.is_done(vid):
+                q.complete(job_id, worker_id)
+                continue
+            print(f"\n----- [job {job_id}] {url}")
+            uploaded.clear(); nbytes[0] = 0
+            # tải + upload (push chạy trong postprocessor hook) có thể lâu hơn lease -> gia hạn liên tục
+            with q.heartbeat(job_id, worker_id):
+                if ctx["pool"]:
+                    from cookie_pool import download_with_pool
+
+                    if download_with_pool(ctx["pool"], [url], opts):
+                        q.fail(job_id, worker_id, "tải thất bại (cookies pool)")
+                        continue
+                else:
+                    try:
+                        ydl.download([url])
+                    except Exception as e:
+                        print(f"❌ Lỗi: {e}")
+                        q.fail(job_id, worker_id, str(e))
+                        continue
+            if not q.complete(job_id, worker_id, nbytes[0], [u for u in uploaded if u[0]]):
+                print(f"⚠️  [job {job_id}] lease đã thuộc worker khác, không đánh dấu xong")
+
+    q.close()
+    if ctx["manifest"]:
+        ctx["manifest"].flush()
+    print("\n✅ Hàng đợi đã hết việc.")
 
 # =============== Run ===============
+def parse_cli(argv: List[str]) -> Dict[str, str]:
+    """Tham số tuỳ chọn: --queue DB, --worker-id ID, --mode 1|2|3|5|6|7, --style 1..5, --plan, --dry-run,
+    --order fifo|longest|shortest (ghi đè [downloader] order), --daemon [--port N], --watch,
+    --sync (link.txt là kênh/playlist: chỉ tải video mới kể từ lần chạy trước),
+    --crawl OUT.jsonl|OUT.parquet (chỉ lấy metadata của link.txt, không tải, không cần HF)"""
+    ov: Dict[str, str] = {}
+    i = 1
+    while i < len(argv):
+        a = argv[i]
+        if a in ("--plan", "--dry-run", "--daemon", "--watch", "--sync"):
+            # --plan: chọn format cho cả danh sách trước (dùng lại cache kế hoạch); --dry-run: chỉ in kế hoạch
+            ov[a.lstrip("-").replace("-", "_")] = "1"; i += 1; continue
+        if a in ("--queue", "--worker-id", "--mode", "--style", "--order", "--port", "--crawl"):
+            if i + 1 >= len(argv):
+                print(f"Thiếu giá trị sau {a}"); sys.exit(1)
+            ov[a.lstrip("-").replace("-", "_")] = argv[i + 1]; i += 2; continue
+        print(f"⚠️  Bỏ qua tham số không hỗ trợ: {a}")
+        i += 1
+    return ov
+
+
+def ask_mode_style(ov: Dict[str, str]):
+    mode = ov.get("mode")
+    if mode is None:
+        print("Chọn mode: 1) MP4  2) MP3  3) WAV  5) Opus  6) AAC  7) FLAC")
+        mode = input("→ ").strip()
+    if mode not in MODE_EXT:
+        mode = "1"
+    style = ov.get("style")
+    if style is None:
+        print("\n")
+        print("Chọn kiểu đánh số: 1-2-3-4-5")
+        style = input("→ ").strip()
+    if style not in {"1", "2", "3", "4", "5"}:
+        style = "5"
+    return mode, style
+
+
 def main():
+    ov = parse_cli(sys.argv)
     conf = load_toml(CONF_FILE)
     cfg = merge_config(conf)
+    if ov.get("order"):
+        cfg["downloader"]["order"] = ov["order"]
+    if cfg["downloader"]["order"] not in ORDERS:
+        print(f"⚠️  order không hợp lệ: {cfg['downloader']['order']} -> dùng fifo")
+        cfg["downloader"]["order"] = "fifo"
+
+    if ov.get("queue"):
+        mode, style = ask_mode_style(ov)
+        run_worker(Path(ov["queue"]), mode, cfg, style, ov.get("worker_id"))
+        return
+
+    if ov.get("daemon") or ov.get("watch"):
+        from daemon import DEFAULT_PORT
+
+        mode, style = ask_mode_style(ov)
+        port = int(ov.get("port") or DEFAULT_PORT) if ov.get("daemon") else None
+        run_pipeline([], mode, cfg, style, daemon_port=port, watch=bool(ov.get("watch")))
+        return
 
     # Thu thập URL
     urls: List[str] = []
@@ -236,17 +797,28 @@ def main():
     if not urls:
         print("❌ Không có URL."); sys.exit(1)
 
-    print("Chọn mode: 1) MP4  2) MP3  3) WAV")
-    mode = input("→ ").strip()
-    if mode not in {"1", "2", "3"}:
-        mode = "1"
-    print("\n")
-    print("Chọn kiểu đánh số: 1-2-3-4-5")
-    style = input("→ ").strip()
-    if style not in {"1", "2", "3", "4", "5"}:
-        style = "5"
+    if ov.get("crawl"):
+        from crawler import crawl
+
+        cookies = cfg["cookies"]["path"]
+        crawl(parse_lines(urls)[0], {"cookiefile": cookies} if cookies and Path(cookies).exists() else {},
+              ov["crawl"], cfg["crawl"]["jobs"], cfg["crawl"]["rps"], cfg["crawl"]["fields"] or None)
+        return
+
+    mode, style = ask_mode_style(ov)
+    if ov.get("sync"):
+        state, items, urls = collect_sync(urls, mode, cfg, style)
+        if not items:
+            print("✅ Không có video mới."); return
+    if ov.get("dry_run"):
+        dry_run(urls, mode, cfg, style)
+        return
+    done = run_pipeline(urls, mode, cfg, style, plan=bool(ov.get("plan")))
+    if ov.get("sync"):
+        from channel_sync import record
 
-    run_pipeline(urls, mode, cfg, style)
+        n = record(state, items, [j.url for j in done if j.status == "done"])
+        print(f"🔄 Đã ghi mốc đồng bộ: {n}/{len(items)} video mới ({DOWNLOAD_DIR / '.sync.json'}).")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Gom file đã xử lý thành shard giới hạn dung lượng (tar kiểu WebDataset hoặc Parquet) + file index
+
+import io
+import re
+import json
+import tarfile
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+META_KEYS = ("id", "title", "duration", "uploader", "channel_id", "upload_date",
+             "webpage_url", "format_id", "ext", "abr", "asr", "audio_channels")
+PARQUET_MAX_ITEM = 256 * 1024 * 1024   # parquet: cả file nằm trong RAM lúc ghi -> file lớn hơn không gom
+
+
+class ItemTooLarge(ValueError):
+    """File quá lớn để gom vào shard parquet (người gọi upload riêng file đó)."""
+
+
+def item_key(target: Path, info: dict) -> str:
+    """Khoá WebDataset (không chứa dấu chấm): video id, thêm _NNNN nếu là 1 đoạn WAV."""
+    vid = info.get("id")
+    if not vid:
+        return re.sub(r"[^\w-]+", "_", target.stem)
+    m = re.search(r"_(\d{4})$", target.stem) if info.get("shard_files") else None
+    return f"{vid}_{m.group(1)}" if m else vid
+
+
+def item_meta(info: dict) -> dict:
+    return {k: info.get(k) for k in META_KEYS if info.get(k) is not None}
+
+
+class ShardWriter:
+    """
+    add(path, key, meta): ghi 1 mục vào shard hiện tại; shard vượt max_bytes thì đóng lại
+    và gọi on_shard(shard_path, index_path). close(): đóng shard cuối (nếu có dữ liệu).
+    fmt="tar": <key>.<ext> + <key>.json (WebDataset). fmt="parquet": cột key/ext/data/meta (cần pyarrow);
+    file lớn hơn max_item_bytes -> ItemTooLarge (không đọc cả file vào RAM).
+    recover(): đẩy các shard đã đóng của lần chạy trước (bị dừng / crash trước khi upload xong).
+    """
+
+    def __init__(self, out_dir: Path, fmt: str = "tar", max_bytes: int = 1 << 30,
+                 prefix: str = "shard", on_shard: Optional[Callable[[Path, Path], None]] = None,
+                 max_item_bytes: int = PARQUET_MAX_ITEM):
+        self.dir = Path(out_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.fmt = fmt
+        self.max_bytes = int(max_bytes)
+        self.prefix = prefix
+        self.on_shard = on_shard
+        self.max_item_bytes = int(max_item_bytes)
+        self.lock = threading.Lock()
+        self.seq = self._next_seq()
+        self._cur = None           # tarfile.TarFile | pq.ParquetWriter
+        self._cur_path: Optional[Path] = None
+        self._cur_bytes = 0
+        self._index: List[dict] = []
+        if fmt == "parquet":
+            import pyarrow  # noqa: F401  (báo lỗi sớm nếu thiếu: pip install pyarrow)
+
+    def _next_seq(self) -> int:
+        # không ghi đè shard của lần chạy trước còn sót lại
+        seqs = [int(m.group(1)) for p in self.dir.glob(f"{self.prefix}-*")
+                if (m := re.match(rf"{re.escape(self.prefix)}-(\d+)\.", p.name))]
+        return max(seqs) + 1 if seqs else 0
+
+    def leftovers(self) -> Tuple[List[Tuple[Path, Path]], List[Path]]:
+        """
+        Shard của lần chạy trước còn trong thư mục (upload xong thì đã bị xoá):
+        ([(shard, index)] đã đóng đủ -> upload được, [shard] thiếu index -> đang ghi dở lúc dừng, không dùng được).
+        """
+        done, broken = [], []
+        indexes = {p.name[:-len(".index.json")]: p for p in self.dir.glob(f"{self.prefix}-*.index.json")}
+        for p in sorted(self.dir.glob(f"{self.prefix}-*")):
+            if p.suffix not in (".tar", ".parquet") or p == self._cur_path:
+                continue
+            if p.stem in indexes:
+                done.append((p, indexes[p.stem]))
+            else:
+                broken.append(p)
+        return done, broken
+
+    def recover(self) -> int:
+        """Gọi on_shard cho các shard đã đóng còn sót lại. Trả về số shard đã đẩy lại."""
+        done, broken = self.leftovers()
+        for p in broken:
+            print(f"⚠️  Shard ghi dở từ lần chạy trước (thiếu index, bỏ qua): {p}")
+        if self.on_shard:
+            for shard, index in done:
+                print(f"↻ Shard chưa upload từ lần chạy trước: {shard.name}")
+                self.on_shard(shard, index)
+        return len(done)
+
+    # --------- Ghi ----------
+    def _open(self):
+        ext = "tar" if self.fmt == "tar" else "parquet"
+        self._cur_path = self.dir / f"{self.prefix}-{self.seq:06d}.{ext}"
+        if self.fmt == "tar":
+            self._cur = tarfile.open(self._cur_path, "w")
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            schema = pa.schema([("key", pa.string()), ("ext", pa.string()),
+                                ("data", pa.binary()), ("meta", pa.string())])
+            self._cur = pq.ParquetWriter(str(self._cur_path), schema)
+        self._cur_bytes = 0
+        self._index = []
+
+    def add(self, path: Path, key: str, meta: dict) -> dict:
+        """Trả về mục index (key, shard, offset/row...) của file vừa ghi."""
+        path = Path(path)
+        if self.fmt == "parquet" and path.stat().st_size > self.max_item_bytes:
+            raise ItemTooLarge(f"{path.name}: {path.stat().st_size / 1e6:,.0f} MB > "
+                               f"{self.max_item_bytes / 1e6:,.0f} MB (giới hạn 1 mục parquet)")
+        ext = path.suffix.lstrip(".").lower()
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        done = None
+        with self.lock:
+            if self._cur is None:
+                self._open()
+            size = path.stat().st_size
+            entry = {"key": key, "ext": ext, "size": size, "shard": self._cur_path.name}
+            if self.fmt == "tar":
+                ti = self._cur.gettarinfo(str(path), arcname=f"{key}.{ext}")
+                # addfile() ghi bản sao của ti -> ti.offset_data không được cập nhật, tự tính từ header
+                header = ti.tobuf(self._cur.format, self._cur.encoding, self._cur.errors)
+                entry["offset"] = self._cur.offset + len(header)   # đọc thẳng 1 mục bằng HTTP Range
+                with open(path, "rb") as f:
+                    self._cur.addfile(ti, f)
+                mi = tarfile.TarInfo(f"{key}.json")
+                mi.size = len(meta_bytes)
+                self._cur.addfile(mi, io.BytesIO(meta_bytes))
+            else:
+                import pyarrow as pa
+
+                table = pa.table({"key": [key], "ext": [ext], "data": [path.read_bytes()],
+                                  "meta": [meta_bytes.decode("utf-8")]})
+                self._cur.write_table(table)
+                entry["row"] = len(self._index)
+            self._index.append(entry)
+            self._cur_bytes += size + len(meta_bytes)
+            if self._cur_bytes >= self.max_bytes:
+                done = self._finish()
+        # upload shard ngoài lock để luồng khác vẫn ghi tiếp vào shard mới
+        if done and self.on_shard:
+            self.on_shard(*done)
+        return entry
+
+    def _finish(self):
+        """Đóng shard hiện tại (đang giữ lock), ghi index. Trả về (shard, index)."""
+        self._cur.close()
+        shard, index = self._cur_path, self._cur_path.with_suffix(".index.json")
+        index.write_text(json.dumps({"shard": shard.name, "format": self.fmt, "items": self._index},
+                                    ensure_ascii=False), encoding="utf-8")
+        self._cur = None
+        self._cur_path = None
+        self.seq += 1
+        return shard, index
+
+    def close(self):
+        done = None
+        with self.lock:
+            if self._cur is not None and self._index:
+                done = self._finish()
+            elif self._cur is not None:
+                self._cur.close()
+                self._cur_path.unlink(missing_ok=True)
+                self._cur = None
+        if done and self.on_shard:
+            self.on_shard(*done)
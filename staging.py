@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Chỉ mục file tải dở (.part): gắn mỗi file dở với video id / format để tải tiếp sau khi crash
+
+import os
+import glob
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from yt_dlp.postprocessor.common import PostProcessor
+
+INDEX_NAME = ".staging.json"
+ORPHAN_MAX_AGE = 7 * 24 * 3600   # file dở không ai nhận quá 7 ngày -> dọn
+PARTIAL_SUFFIXES = (".part", ".ytdl")
+
+
+def _is_partial(p: Path) -> bool:
+    return p.name.endswith(PARTIAL_SUFFIXES) or ".part-Frag" in p.name
+
+
+class StagingIndex:
+    """
+    downloads/.staging.json: { "<đường dẫn .part>": {video_id, format_id, expected_size, stem, updated} }
+    - track(d): gọi từ progress hook, ghi nhận file dở mới / xoá khi tải xong.
+    - Lần chạy sau, ResumePP (before_dl) đổi tên file dở cũ theo tên file mới (vd: autonumber khác)
+      để yt-dlp tải tiếp bằng HTTP Range thay vì tải lại từ đầu.
+    """
+
+    def __init__(self, download_dir: Path):
+        self.dir = Path(download_dir)
+        self.path = self.dir / INDEX_NAME
+        self.lock = threading.Lock()
+        self.entries: Dict[str, dict] = {}
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except Exception:
+                self.entries = {}
+
+    def _save(self):
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.entries, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    # --------- Ghi nhận từ progress hook ----------
+    def track(self, d: dict):
+        status = d.get("status")
+        info = d.get("info_dict") or {}
+        if status == "downloading":
+            part = d.get("tmpfilename")
+            if not part or part in self.entries:
+                return
+            final = info.get("_filename") or d.get("filename") or part
+            with self.lock:
+                self.entries[part] = {
+                    "video_id": info.get("id"),
+                    "format_id": info.get("format_id"),
+                    "expected_size": d.get("total_bytes") or d.get("total_bytes_estimate"),
+                    "stem": Path(final).stem,
+                    "updated": time.time(),
+                }
+                self._save()
+        elif status == "finished":
+            fn = d.get("filename")
+            if not fn:
+                return
+            with self.lock:
+                if self.entries.pop(fn + ".part", None) is not None:
+                    self._save()
+
+    # --------- Tải tiếp ----------
+    def find(self, video_id: str, format_id: Optional[str]):
+        for part, e in list(self.entries.items()):
+            if e.get("video_id") != video_id:
+                continue
+            if format_id and e.get("format_id") and e["format_id"] != format_id:
+                continue
+            yield part, e
+
+    def adopt(self, video_id: str, format_ids, new_stem: str) -> int:
+        """Đổi tên các file dở của video sang stem mới. Trả về số file dở được nhận lại."""
+        adopted = 0
+        with self.lock:
+            for fid in format_ids or [None]:
+                for part, e in list(self.find(video_id, fid)):
+                    old = Path(part)
+                    if not old.exists():
+                        self.entries.pop(part, None)
+                        continue
+                    size = old.stat().st_size
+                    if e.get("expected_size") and size > e["expected_size"]:
+                        # lớn hơn dự kiến -> hỏng, bỏ
+                        self._remove_family(old)
+                        self.entries.pop(part, None)
+                        continue
+                    old_stem = e.get("stem") or ""
+                    if old_stem and old.name.startswith(old_stem) and old_stem != new_stem:
+                        new = old.with_name(new_stem + old.name[len(old_stem):])
+                        if not new.exists():
+                            self._rename_family(old, new)
+                            self.entries[str(new)] = {**e, "stem": new_stem, "updated": time.time()}
+                            self.entries.pop(part, None)
+                    print(f"↻ Tải tiếp file dở ({size / 1e6:.1f} MB): {old.name}")
+                    adopted += 1
+            self._save()
+        return adopted
+
+    @staticmethod
+    def _family(part: Path):
+        """File .part + các file kèm theo (.ytdl, .part-FragN) của cùng 1 lượt tải."""
+        base = part.name[: -len(".part")] if part.name.endswith(".part") else part.name
+        for f in part.parent.glob(glob.escape(base) + ".*"):
+            rest = f.name[len(base):]
+            if rest == ".ytdl" or rest == ".part" or rest.startswith(".part-Frag"):
+                yield f, rest
+
+    def _rename_family(self, old: Path, new: Path):
+        new_base = new.name[: -len(".part")] if new.name.endswith(".part") else new.name
+        for f, rest in list(self._family(old)):
+            f.rename(f.with_name(new_base + rest))
+
+    def _remove_family(self, part: Path):
+        for f, _ in list(self._family(part)):
+            f.unlink(missing_ok=True)
+
+    # --------- Dọn rác ----------
+    def gc(self, max_age: float = ORPHAN_MAX_AGE) -> int:
+        """Xoá file dở cũ hơn max_age (kể cả file không có trong chỉ mục). Trả về số file đã xoá."""
+        now = time.time()
+        removed = 0
+        with self.lock:
+            for f in self.dir.iterdir():
+                if not f.is_file() or not _is_partial(f):
+                    continue
+                try:
+                    if now - f.stat().st_mtime > max_age:
+                        f.unlink()
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+            stale = [part for part in self.entries if not Path(part).exists()]
+            for part in stale:
+                self.entries.pop(part, None)
+            if stale:        # không đổi gì -> không ghi lại chỉ mục (không tạo file ở mỗi lần chạy)
+                self._save()
+        return removed
+
+
+class ResumePP(PostProcessor):
+    """before_dl: nhận lại file dở của cùng video/format trước khi yt-dlp bắt đầu tải."""
+
+    def __init__(self, index: StagingIndex, downloader=None):
+        super().__init__(downloader)
+        self.index = index
+
+    def run(self, info):
+        fname = info.get("_filename") or info.get("filepath")
+        if fname and info.get("id"):
+            fmts = info.get("requested_formats") or [info]
+            self.index.adopt(info["id"], [f.get("format_id") for f in fmts], Path(fname).stem)
+        return [], info
+
+
+def attach_staging(opts: dict, download_dir: Path, max_age: float = ORPHAN_MAX_AGE) -> StagingIndex:
+    """Gắn chỉ mục file dở vào opts của yt-dlp (progress hook + PostProcessor before_dl)."""
+    index = StagingIndex(download_dir)
+    removed = index.gc(max_age)
+    if removed:
+        print(f"🧹 Đã dọn {removed} file tải dở quá hạn trong {download_dir}")
+    if index.entries:
+        print(f"↻ Có {len(index.entries)} file tải dở sẽ được tải tiếp nếu gặp lại.")
+    opts["progress_hooks"] = list(opts.get("progress_hooks") or []) + [index.track]
+    opts["custom_postprocessors"] = list(opts.get("custom_postprocessors") or []) + [
+        (lambda ydl: ResumePP(index, ydl), "before_dl"),
+    ]
+    opts.setdefault("continuedl", True)
+    return index
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Đường tắt âm thanh: ffprobe đúng 1 lần mỗi file, đếm copy / transcode, cùng số mode giữa run.py và run_hf-v3.py.
+#   python -m pytest test_audio_fastpath.py   (không cần ffmpeg: probe và encode đều giả)
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor  # noqa: E402
+
+import audio_fastpath  # noqa: E402
+from audio_fastpath import AudioStats, SmartExtractAudioPP, attach_smart_audio  # noqa: E402
+
+HERE = Path(__file__).resolve().parent
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    calls = {"probe": [], "encode": []}
+    codec = {"value": "opus"}
+
+    def probe(self, path):
+        calls["probe"].append(path)
+        return codec["value"]
+
+    def encode(self, path, out_path, acodec, more_opts):
+        calls["encode"].append(acodec)
+        Path(out_path).write_bytes(b"out")
+
+    monkeypatch.setattr(FFmpegPostProcessor, "get_audio_codec", probe)
+    monkeypatch.setattr(SmartExtractAudioPP, "run_ffmpeg", encode)
+    return calls, codec
+
+
+def _run(pp: SmartExtractAudioPP, path: Path):
+    path.write_bytes(b"in")
+    return pp.run({"filepath": str(path), "ext": path.suffix[1:]})
+
+
+def test_copy_probes_once(tmp_path, fake_ffmpeg):
+    calls, _ = fake_ffmpeg
+    stats = AudioStats()
+    pp = SmartExtractAudioPP(None, stats=stats, preferredcodec="opus")
+    _, info = _run(pp, tmp_path / "a.webm")
+    assert calls["probe"] == [str(tmp_path / "a.webm")]
+    assert calls["encode"] == ["copy"] and info["ext"] == "opus"
+    assert (stats.copied, stats.transcoded) == (1, 0)
+
+
+def test_transcode_probes_once_and_takes_slot(tmp_path, fake_ffmpeg, monkeypatch):
+    calls, codec = fake_ffmpeg
+    codec["value"] = "aac"
+    taken = []
+
+    class Slots:
+        def __enter__(self):
+            taken.append(1)
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(audio_fastpath, "TRANSCODE_SLOTS", Slots())
+    stats = AudioStats()
+    pp = SmartExtractAudioPP(None, stats=stats, preferredcodec="mp3")
+    _run(pp, tmp_path / "a.m4a")
+    _run(pp, tmp_path / "b.m4a")
+    assert len(calls["probe"]) == 2                          # 1 lần mỗi file, không probe lại trong super().run()
+    assert calls["encode"] == ["libmp3lame"] * 2 and taken == [1, 1]
+    assert (stats.copied, stats.transcoded) == (0, 2)
+    assert "0 copy / 2 transcode" in stats.summary()
+
+
+def test_probe_cache_is_per_file(tmp_path, fake_ffmpeg):
+    calls, _ = fake_ffmpeg
+    pp = SmartExtractAudioPP(None, preferredcodec="opus")
+    _run(pp, tmp_path / "a.webm")
+    assert pp.get_audio_codec(str(tmp_path / "a.webm")) == "opus"   # xong run() -> không trả kết quả cũ
+    assert len(calls["probe"]) == 2
+
+
+def test_attach_smart_audio_keeps_order():
+    opts = {"format": "bestaudio/best", "postprocessors": [
+        {"key": "FFmpegExtractAudio", "preferredcodec": "opus", "preferredquality": "0"},
+        {"key": "FFmpegMetadata"},
+    ]}
+    stats = attach_smart_audio(opts, "opus")
+    assert opts["format"].startswith("bestaudio[acodec=opus]")
+    assert "postprocessors" not in opts and [w for _, w in opts["custom_postprocessors"]] == ["post_process"] * 2
+    pp = opts["custom_postprocessors"][0][0](None)
+    assert isinstance(pp, SmartExtractAudioPP) and pp.stats is stats
+
+
+def _load(name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def test_same_mode_numbers_in_both_menus(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)                               # run.py tạo downloads/ ở thư mục hiện tại
+    run = _load("run_for_modes", HERE / "run.py")
+    run_hf = _load("run_hf_for_modes", HERE / "run_hf-v3.py")
+    for mode, ext in run_hf.MODE_EXT.items():
+        if mode != "1":
+            assert run.AUDIO_TARGETS[mode] == ext, mode
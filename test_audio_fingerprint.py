@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Vân tay âm thanh: cùng bản ghi âm bị lệch / đổi âm lượng / thêm nhiễu / encode lại vẫn phải khớp, bài khác thì không.
+#   python -m pytest test_audio_fingerprint.py
+
+import shutil
+import subprocess
+import threading
+import time
+import wave
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import audio_fingerprint as af  # noqa: E402
+
+SR = af.SAMPLE_RATE
+MARGIN = 0.05     # cùng bản phải thấp hơn ngưỡng ít nhất chừng này, khác bài phải cao hơn
+
+
+def song(seed: int, seconds: float = 60) -> "np.ndarray":
+    """Giai điệu giả: nốt ngẫu nhiên (4 hoạ âm, tắt dần) nối nhau + nền nhiễu nhỏ."""
+    rng = np.random.default_rng(seed)
+    out = np.zeros(int(seconds * SR), dtype=np.float32)
+    pos = 0
+    while pos < len(out):
+        t = np.arange(int(rng.choice([0.125, 0.25, 0.5]) * SR)) / SR
+        f = 220 * 2 ** (rng.integers(0, 24) / 12)
+        note = sum(np.sin(2 * np.pi * f * k * t) / k for k in range(1, 5)) * np.exp(-3 * t) * 0.2
+        out[pos:pos + len(t)] += note[:len(out) - pos].astype(np.float32)
+        pos += len(t)
+    return out + rng.normal(0, 0.005, len(out)).astype(np.float32)
+
+
+def add_noise(x, snr_db: float, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return x + rng.normal(0, x.std() / 10 ** (snr_db / 20), len(x)).astype(np.float32)
+
+
+def aligned_ber(a, b, shift: int) -> float:
+    """b = a bỏ `shift` mẫu đầu: so khung gần nhất (shift làm tròn theo HOP), phần lẻ dưới 1 hop là cái cần đo."""
+    fa, fb = af.fingerprint(a), af.fingerprint(b)
+    k = round(shift / af.HOP)
+    n = min(len(fa) - k, len(fb))
+    return af.bit_error_rate(fa[k:k + n], fb[:n])
+
+
+@pytest.fixture
+def index(tmp_path):
+    return af.FingerprintIndex(tmp_path / "fp.sqlite")
+
+
+@pytest.mark.parametrize("shift", [af.HOP // 4, af.HOP // 2, 3 * af.HOP // 4 + 5 * SR])
+def test_offset_and_gain(shift):
+    x = song(1)
+    assert aligned_ber(x, x[shift:] * 0.4, shift) < af.BER_THRESHOLD - MARGIN
+
+
+@pytest.mark.parametrize("snr", [30, 20])
+def test_noise(snr):
+    x = song(2)
+    shift = af.HOP // 2
+    assert aligned_ber(x, add_noise(x[shift:] * 0.7, snr), shift) < af.BER_THRESHOLD - MARGIN
+
+
+def test_different_songs():
+    a, b = af.fingerprint(song(3)), af.fingerprint(song(4))
+    n = min(len(a), len(b))
+    assert af.bit_error_rate(a[:n], b[:n]) > af.BER_THRESHOLD + MARGIN
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_claim_matches_shifted_copies(index, seed):
+    x = song(10 + seed)
+    assert index.claim("orig", af.fingerprint(x)) is None
+    for i, shift in enumerate([af.HOP // 2 + 37, 3 * af.HOP // 4 + 5 * SR]):
+        copy = add_noise(x[shift:] * 0.5, 20, seed)
+        dup = index.claim(f"copy{i}", af.fingerprint(copy))
+        assert dup and dup["id"] == "orig" and dup["ber"] < af.BER_THRESHOLD - MARGIN, (shift, dup)
+    assert index.claim("other", af.fingerprint(song(100 + seed))) is None
+
+
+def test_claim_is_idempotent_and_forget(index):
+    fp = af.fingerprint(song(5))
+    assert index.claim("a", fp) is None
+    assert index.claim("a", fp) is None          # chính nó: không tự trùng
+    assert index.claim("b", fp)["id"] == "a"
+    index.forget("a")
+    assert index.claim("b", fp) is None
+
+
+def test_old_index_is_rebuilt(tmp_path):
+    import sqlite3
+
+    path = tmp_path / "fp.sqlite"
+    db = sqlite3.connect(str(path))
+    db.execute("CREATE TABLE tracks (video_id TEXT PRIMARY KEY, repo_path TEXT, frames INTEGER, fp BLOB, added_at REAL)")
+    db.execute("INSERT INTO tracks VALUES ('old', NULL, 0, x'', 0)")
+    db.commit()
+    db.close()
+    index = af.FingerprintIndex(path)
+    assert index.db.execute("SELECT COUNT(*) FROM tracks").fetchone()[0] == 0
+
+
+@pytest.mark.skipif(not shutil.which("ffmpeg"), reason="cần ffmpeg")
+@pytest.mark.parametrize("codec", [["-c:a", "libmp3lame", "-b:a", "96k", "x.mp3"],
+                                   ["-c:a", "aac", "-b:a", "64k", "x.m4a"]])
+def test_reencode(index, tmp_path, codec):
+    src = tmp_path / "src.wav"
+    pcm = (song(6) * 32767).clip(-32768, 32767).astype("<i2")
+    with wave.open(str(src), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SR)
+        w.writeframes(pcm.tobytes())
+    out = tmp_path / codec[-1]
+    # encode lại ở 44.1 kHz, bỏ 1.3 s đầu, giảm âm lượng: như 1 bản re-upload
+    subprocess.run(["ffmpeg", "-v", "error", "-nostdin", "-ss", "1.3", "-i", str(src), "-af", "volume=0.6",
+                    "-ar", "44100"] + codec[:-1] + [str(out)], check=True)
+    assert index.claim("orig", af.fingerprint(af.decode(src))) is None
+    dup = index.claim("copy", af.fingerprint(af.decode(out)))
+    assert dup and dup["id"] == "orig" and dup["ber"] < af.BER_THRESHOLD - MARGIN, dup
+
+
+@pytest.fixture
+def dedup(tmp_path, monkeypatch):
+    # decode giả: tên file -> tín hiệu (không cần ffmpeg)
+    signals = {}
+    monkeypatch.setattr(af, "decode", lambda path, ffmpeg=None: signals[path.name])
+    d = af.AudioDedup(tmp_path / "fp.sqlite")
+    d.signals = signals
+    return d
+
+
+def _check_in_thread(dedup, path, vid):
+    out = []
+    th = threading.Thread(target=lambda: out.append(dedup.check(path, vid)))
+    th.start()
+    return th, out
+
+
+def test_duplicate_waits_for_original_upload(dedup, tmp_path):
+    x = song(7)
+    dedup.signals.update({"a.mp3": x, "b.mp3": add_noise(x * 0.5, 30)})
+    (tmp_path / "b.mp3").write_bytes(b"x" * 10)
+    assert dedup.check(tmp_path / "a.mp3", "a") is None             # bản gốc, đang upload (repo_path NULL)
+    th, out = _check_in_thread(dedup, tmp_path / "b.mp3", "b")
+    th.join(0.3)
+    assert th.is_alive()                                            # chưa biết bản gốc có lên được repo không
+    dedup.index.set_path("a", "audio/a.mp3")
+    th.join(5)
+    assert out[0]["id"] == "a" and out[0]["repo_path"] == "audio/a.mp3"
+    assert dedup.duplicates == 1
+
+
+def test_original_upload_fails_duplicate_becomes_original(dedup, tmp_path):
+    x = song(8)
+    dedup.signals.update({"a.mp3": x, "b.mp3": add_noise(x * 0.5, 30)})
+    assert dedup.check(tmp_path / "a.mp3", "a") is None
+    th, out = _check_in_thread(dedup, tmp_path / "b.mp3", "b")
+    th.join(0.3)
+    dedup.index.forget("a")                                         # upload bản gốc lỗi
+    th.join(5)
+    assert out == [None] and dedup.duplicates == 0                  # b được upload thay
+    rows = dedup.index.db.execute("SELECT video_id, repo_path FROM tracks").fetchall()
+    assert rows == [("b", None)]
+
+
+def test_stale_pending_original_is_ignored(index):
+    fp = af.fingerprint(song(9))
+    assert index.claim("a", fp) is None
+    index.db.execute("UPDATE tracks SET added_at = ?", (time.time() - af.PENDING_STALE - 1,))
+    assert index.claim("b", fp) is None                             # tiến trình cũ chết giữa chừng -> không chờ
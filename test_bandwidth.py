@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Bộ điều tiết băng thông: tốc độ đo được bám trần, chia theo trọng số, đổi trần khi đang chạy.
+#   python -m pytest test_bandwidth.py   (đo thời gian thật, mỗi test ~1 s)
+
+import io
+import threading
+import time
+
+from bandwidth import BURST_SECONDS, Governor, ThrottledReader, current_flow, flow_scope
+
+RATE = 4 * 1024 * 1024
+CHUNK = 64 * 1024
+
+
+def _send(gov: Governor, flow, nbytes: int) -> float:
+    t0 = time.monotonic()
+    for _ in range(nbytes // CHUNK):
+        gov.consume(flow, CHUNK)
+    return time.monotonic() - t0
+
+
+def test_single_flow_rate():
+    gov = Governor(RATE)
+    flow = gov.open()
+    elapsed = _send(gov, flow, 2 * RATE)
+    # 2 giây dữ liệu, trừ phần burst được gửi ngay
+    expected = 2 - BURST_SECONDS
+    assert expected * 0.85 < elapsed < expected * 1.25, elapsed
+
+
+def test_weighted_split():
+    gov = Governor(RATE)
+    flows = {"big": gov.open(weight=3), "small": gov.open(weight=1)}
+    sent = {k: 0 for k in flows}
+    stop = time.monotonic() + 1.5
+
+    def run(name):
+        while time.monotonic() < stop:
+            gov.consume(flows[name], CHUNK)
+            sent[name] += CHUNK
+
+    threads = [threading.Thread(target=run, args=(k,)) for k in flows]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = sum(sent.values())
+    assert total < RATE * (1.5 + BURST_SECONDS) * 1.15 + 2 * CHUNK, total     # tổng không vượt trần
+    assert 2.0 < sent["big"] / sent["small"] < 4.5, sent
+
+
+def test_idle_flow_share_goes_to_busy_flow():
+    gov = Governor(RATE)
+    busy = gov.open()
+    gov.open()                                         # mở nhưng không gửi gì
+    elapsed = _send(gov, busy, RATE + RATE // 2)
+    # chu kỳ đầu (REALLOC_SECONDS) còn chia đôi -> ~1.6 s; chia đôi cố định thì mất ~2.75 s
+    assert elapsed < 2.2, elapsed
+
+
+def test_set_rate_applies_to_running_flow():
+    gov = Governor(RATE)
+    flow = gov.open()
+    _send(gov, flow, RATE // 2)
+    gov.set_rate(RATE * 4)
+    elapsed = _send(gov, flow, RATE * 2)
+    assert elapsed < 0.8, elapsed                      # trần cũ thì mất ~2 s
+
+
+def test_throttled_reader_and_flow_scope():
+    gov = Governor(RATE)
+    with flow_scope(gov) as flow:
+        assert current_flow() is flow
+        data = b"".join(ThrottledReader(io.BytesIO(b"x" * 300_000), flow))
+    assert len(data) == 300_000 and gov.total == 300_000
+    assert current_flow() is None and gov.flows == []
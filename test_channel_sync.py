@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Đồng bộ kênh/playlist: chỉ trả video mới, dừng sớm ở nguồn mới-nhất-trước, video chung nhiều nguồn ghi cho mọi nguồn.
+#   python -m pytest test_channel_sync.py   (extractor giả qua channel_sync.build_ydl)
+
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+import channel_sync  # noqa: E402
+from channel_sync import SyncState, new_items, record, sync_sources  # noqa: E402
+
+CHANNEL = "https://www.youtube.com/@A/videos"
+PLAYLIST = "https://www.youtube.com/playlist?list=PLx"
+
+
+class FakeYoutubeDL:
+    """extract_info(process=False) như yt-dlp: entries là generator, đếm số mục đã thực sự liệt kê."""
+
+    listings = {}
+    pulled = {}
+
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def extract_info(self, url, download=False, process=True):
+        def entries():
+            for vid, date in self.listings[url]:
+                self.pulled[url] = self.pulled.get(url, 0) + 1
+                yield {"_type": "url", "id": vid, "url": f"https://y/{vid}", "upload_date": date}
+        return {"_type": "playlist", "id": url, "entries": entries()}
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    FakeYoutubeDL.listings = {}
+    FakeYoutubeDL.pulled = {}
+    monkeypatch.setattr(channel_sync, "build_ydl", FakeYoutubeDL)
+    return FakeYoutubeDL
+
+
+def _ids(items):
+    return [it.id for it in items]
+
+
+def test_new_items_stops_early_on_newest_first_source(tmp_path, fake):
+    fake.listings[CHANNEL] = [(f"v{i}", f"2024{12 - i:02d}01") for i in range(10)]   # v0 mới nhất
+    state = SyncState(tmp_path)
+    items, scanned = new_items(fake(), CHANNEL, state)
+    assert _ids(items) == [f"v{i}" for i in range(10)] and scanned == 10
+    state.mark(CHANNEL, items[3:])                              # lần trước đã tải v3..v9
+    fake.pulled.clear()
+    items, scanned = new_items(fake(), CHANNEL, state, stop_after=2)
+    assert _ids(items) == ["v0", "v1", "v2"]
+    assert fake.pulled[CHANNEL] == 5                            # v3, v4 đã biết liên tiếp -> không liệt kê tiếp
+
+
+def test_new_items_playlist_scans_all_and_adds_retry(tmp_path, fake):
+    fake.listings[PLAYLIST] = [("a", ""), ("b", ""), ("c", ""), ("d", "")]
+    state = SyncState(tmp_path)
+    first, _ = new_items(fake(), PLAYLIST, state)
+    state.mark(PLAYLIST, [first[0], first[1]], failed=[first[2]])
+    fake.listings[PLAYLIST] = [("a", ""), ("b", ""), ("d", ""), ("e", "")]   # c bị gỡ khỏi playlist
+    items, scanned = new_items(fake(), PLAYLIST, state, stop_after=1)
+    assert scanned == 4                                         # playlist thường: không dừng sớm
+    assert _ids(items) == ["d", "e", "c"]                       # c lỗi lần trước -> thử lại
+
+
+def test_new_items_stops_at_older_date(tmp_path, fake):
+    fake.listings[CHANNEL] = [("n1", "20240301"), ("old", "20240101"), ("x", "20231201")]
+    state = SyncState(tmp_path)
+    state.mark(CHANNEL, [channel_sync.SyncItem("https://y/k", "k", CHANNEL, "20240201")])
+    items, _ = new_items(fake(), CHANNEL, state)
+    assert _ids(items) == ["n1"] and fake.pulled[CHANNEL] == 2
+
+
+def test_shared_video_recorded_under_every_source(tmp_path, fake):
+    fake.listings[CHANNEL] = [("v1", "20240201"), ("v2", "20240101")]
+    fake.listings[PLAYLIST] = [("v2", ""), ("v3", "")]
+    state = SyncState(tmp_path)
+    items = sync_sources([CHANNEL, PLAYLIST], {"format": "x", "progress_hooks": []}, state, jobs=2)
+    assert _ids(items) == ["v1", "v2", "v3"]
+    v2 = items[1]
+    assert v2.source == CHANNEL and v2.sources == [CHANNEL, PLAYLIST]
+    assert record(state, items, [it.url for it in items]) == 3
+    assert state.known(PLAYLIST) == {"v2", "v3"} and state.known(CHANNEL) == {"v1", "v2"}
+
+    again = SyncState(tmp_path)                                 # lần chạy sau đọc lại .sync.json
+    assert sync_sources([CHANNEL, PLAYLIST], {}, again) == []
+
+
+def test_record_failed_shared_video_retried_from_both_sources(tmp_path, fake):
+    fake.listings[CHANNEL] = [("v1", "20240201"), ("v2", "20240101")]
+    fake.listings[PLAYLIST] = [("v2", ""), ("v3", "")]
+    state = SyncState(tmp_path)
+    items = sync_sources([CHANNEL, PLAYLIST], {}, state)
+    assert record(state, items, ["https://y/v1", "https://y/v3"]) == 2
+    assert set(state.retry(CHANNEL)) == {"v2"} and set(state.retry(PLAYLIST)) == {"v2"}
+    again = sync_sources([CHANNEL, PLAYLIST], {}, SyncState(tmp_path))
+    assert _ids(again) == ["v2"] and again[0].sources == [CHANNEL, PLAYLIST]
+
+
+def test_scan_error_skips_source(tmp_path, fake):
+    fake.listings[PLAYLIST] = [("a", "")]
+    items = sync_sources(["https://www.youtube.com/@missing", PLAYLIST], {}, SyncState(tmp_path))
+    assert _ids(items) == ["a"]
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Cookies dùng chung: parse 1 lần (đổi file thì đọc lại), báo lỗi sớm trước khi chạy cả lô, gắn jar vào YoutubeDL.
+#   python -m pytest test_cookie_jar.py
+
+import os
+import time
+
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+from yt_dlp import YoutubeDL  # noqa: E402
+
+from cookie_jar import check_cookies, load_jar, share_jar  # noqa: E402
+
+DAY = 86400
+
+
+def _write(path, rows):
+    lines = ["# Netscape HTTP Cookie File"]
+    lines += [f"{dom}\tTRUE\t/\tTRUE\t{int(exp)}\t{name}\tv" for dom, name, exp in rows]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def test_load_jar_is_cached_until_file_changes(tmp_path):
+    p = _write(tmp_path / "c.txt", [(".youtube.com", "SID", time.time() + 30 * DAY)])
+    jar = load_jar(p)
+    assert load_jar(str(p)) is jar
+    _write(p, [(".youtube.com", "SID", time.time() + 30 * DAY), (".youtube.com", "PREF", 0)])
+    st = os.stat(p)
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    again = load_jar(p)
+    assert again is not jar and len(list(again)) == 2
+
+
+def test_check_ok_and_expiry_warning(tmp_path):
+    soon = time.time() + DAY
+    res = check_cookies(_write(tmp_path / "c.txt", [(".youtube.com", "SAPISID", soon),
+                                                    (".youtube.com", "SID", time.time() + 90 * DAY)]))
+    assert res.ok and res.count == 2 and abs(res.expires_at - int(soon)) < 1
+    assert any("sắp hết hạn" in w for w in res.warnings)
+
+
+def test_check_problems(tmp_path):
+    bad = tmp_path / "bad.txt"
+    bad.write_text("không phải cookies\n", encoding="utf-8")
+    assert not check_cookies(bad).ok
+    other = check_cookies(_write(tmp_path / "g.txt", [(".google.com", "SID", time.time() + DAY)]))
+    assert other.problems == ["không có cookie nào cho youtube.com"]
+    expired = check_cookies(_write(tmp_path / "e.txt", [(".youtube.com", "SID", time.time() - DAY)]))
+    assert not expired.ok and "đã hết hạn" in expired.report()
+    guest = check_cookies(_write(tmp_path / "p.txt", [(".youtube.com", "PREF", time.time() + DAY)]))
+    assert guest.ok and "chỉ dùng như khách" in guest.warnings[0]
+
+
+def test_share_jar_between_instances(tmp_path):
+    p = _write(tmp_path / "c.txt", [(".youtube.com", "SID", time.time() + 30 * DAY)])
+    with YoutubeDL({"cookiefile": str(p), "quiet": True}) as a, YoutubeDL({"cookiefile": str(p), "quiet": True}) as b:
+        share_jar(a)
+        share_jar(b)
+        assert a.cookiejar is b.cookiejar is load_jar(p)
+    with YoutubeDL({"quiet": True}) as c:
+        share_jar(c)                                          # không có cookiefile -> giữ nguyên
+        assert "cookiejar" not in c.__dict__
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Pool cookies: profile bị 403/429 bị cách ly (tăng gấp đôi mỗi lần), trạng thái giữ qua lần chạy sau.
+#   python -m pytest test_cookie_pool.py
+
+import time
+
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+from cookie_pool import QUARANTINE_BASE, QUARANTINE_MAX, CookiePool  # noqa: E402
+
+
+def _cookie_file(path, name="SID"):
+    exp = int(time.time()) + 30 * 86400
+    path.write_text("# Netscape HTTP Cookie File\n"
+                    f".youtube.com\tTRUE\t/\tTRUE\t{exp}\t{name}\tvalue-{path.stem}\n", encoding="utf-8")
+
+
+@pytest.fixture
+def pool(tmp_path):
+    for name in ("a", "b"):
+        _cookie_file(tmp_path / f"{name}.txt")
+    (tmp_path / "broken.txt").write_text("không phải cookies\n", encoding="utf-8")
+    return CookiePool(tmp_path)
+
+
+def test_loads_only_valid_profiles(pool):
+    assert sorted(p.name for p in pool.profiles) == ["a.txt", "b.txt"]
+
+
+def test_throttle_quarantines_and_doubles(pool):
+    a = next(p for p in pool.profiles if p.name == "a.txt")
+    now = time.time()
+    assert pool.report_error(a, "ERROR: HTTP Error 429: Too Many Requests")
+    assert abs(a.quarantined_until - now - QUARANTINE_BASE) < 5
+    assert not a.available(time.time())
+    assert pool.acquire().name == "b.txt"
+    a.quarantined_until = 0
+    pool.report_error(a, "HTTP Error 403: Forbidden")
+    assert abs(a.quarantined_until - time.time() - 2 * QUARANTINE_BASE) < 5
+    a.strikes = 30
+    pool.report_error(a, "Sign in to confirm you're not a bot")
+    assert a.quarantined_until - time.time() <= QUARANTINE_MAX
+
+
+def test_other_errors_do_not_quarantine(pool):
+    a = pool.profiles[0]
+    assert not pool.report_error(a, "ERROR: Video unavailable")
+    assert a.available(time.time()) and a.strikes == 0 and a.health < 1
+
+
+def test_all_quarantined_or_excluded(pool):
+    a, b = pool.profiles
+    pool.report_error(a, "HTTP Error 429")
+    assert pool.acquire(exclude={"b.txt"}) is None
+    pool.report_error(b, "HTTP Error 429")
+    assert pool.acquire() is None
+
+
+def test_ok_resets_strikes(pool):
+    a = pool.profiles[0]
+    pool.report_error(a, "HTTP Error 429")
+    pool.report_ok(a)
+    assert a.strikes == 0 and a.ok == 1
+
+
+def test_quarantine_survives_restart(pool, tmp_path):
+    a = pool.profiles[0]
+    pool.report_error(a, "HTTP Error 429")
+    again = CookiePool(tmp_path)
+    a2 = next(p for p in again.profiles if p.name == a.name)
+    assert a2.strikes == 1 and not a2.available(time.time())
+    assert again.acquire().name != a.name
+
+
+def test_acquire_prefers_idle_then_paces(tmp_path):
+    for name in ("a", "b"):
+        _cookie_file(tmp_path / f"{name}.txt")
+    pool = CookiePool(tmp_path, min_interval=0.3)
+    first, second = pool.acquire(), pool.acquire()
+    assert {first.name, second.name} == {"a.txt", "b.txt"}     # đang bận -> chọn profile còn rảnh
+    pool.release(first)
+    pool.release(second)
+    t0 = time.monotonic()
+    pool.acquire()
+    pool.acquire()
+    pool.acquire()                                           # profile thứ 3 lượt phải chờ tới nhịp
+    assert time.monotonic() - t0 >= 0.25
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Crawl metadata: trải playlist, ghi JSONL/Parquet, chạy lại thì bỏ qua video đã có và không ghi đè catalog cũ.
+#   python -m pytest test_crawler.py   (extractor giả qua crawler.build_ydl)
+
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+import crawler  # noqa: E402
+from crawler import Crawler, crawl, parquet_parts, slim  # noqa: E402
+
+
+class FakeYoutubeDL:
+    """'pl:a,b' -> playlist phẳng (entries kiểu url), 'id' -> video, 'bad' -> lỗi như extractor."""
+
+    calls = []
+    lock = threading.Lock()
+
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def extract_info(self, url, download=False, process=True):
+        with self.lock:
+            self.calls.append(url)
+        if url.startswith("pl:"):
+            return {"_type": "playlist", "id": url,
+                    "entries": [{"_type": "url", "id": v, "url": v} for v in url[3:].split(",")]}
+        if url == "bad":
+            raise RuntimeError("ERROR: Video unavailable\nchi tiết")
+        return {"id": url, "title": f"Bài {url}", "duration": 61, "view_count": 5, "tags": ["a", "b"],
+                "webpage_url": f"https://y/{url}",
+                "formats": [{"format_id": "251", "ext": "webm", "url": "https://secret", "acodec": "opus"}]}
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    FakeYoutubeDL.calls = []
+    monkeypatch.setattr(crawler, "build_ydl", FakeYoutubeDL)
+    return FakeYoutubeDL
+
+
+def _jsonl(path):
+    return [json.loads(x) for x in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_slim_drops_format_urls():
+    rec = slim({"id": "a", "title": None, "formats": [{"format_id": "1", "url": "u", "http_headers": {}}]})
+    assert rec == {"id": "a", "formats": [{"format_id": "1"}]}
+
+
+def test_jsonl_crawl_and_rerun_skips_done(tmp_path, fake):
+    out = tmp_path / "catalog.jsonl"
+    stats = crawl(["pl:a,b,c", "d", "bad"], {}, out, jobs=4)
+    assert stats["written"] == 4 and stats["failed"] == 1
+    assert sorted(r["id"] for r in _jsonl(out)) == ["a", "b", "c", "d"]
+    assert (tmp_path / "catalog.jsonl.failed.txt").read_text(encoding="utf-8") == "bad\n"
+
+    with open(out, "a", encoding="utf-8") as f:
+        f.write('{"id": "cụt')                                   # dòng cuối bị cắt lúc dừng giữa chừng
+    fake.calls.clear()
+    stats = crawl(["pl:a,b,e", "d"], {}, out, jobs=2)
+    assert stats["written"] == 1 and stats["skipped"] == 4
+    assert fake.calls == ["pl:a,b,e", "e"]                      # video đã có: không extract lại
+
+
+def test_parquet_rerun_adds_part_and_keeps_catalog(tmp_path, fake):
+    pq = pytest.importorskip("pyarrow.parquet")
+    ds = pytest.importorskip("pyarrow.dataset")
+    out = tmp_path / "catalog.parquet"
+    crawl(["pl:a,b"], {}, out)
+    first = pq.read_table(out)
+    assert sorted(first.column("id").to_pylist()) == ["a", "b"]
+    assert json.loads(first.column("tags").to_pylist()[0]) == ["a", "b"]
+
+    fake.calls.clear()
+    stats = crawl(["pl:a,b,c", "d"], {}, out)
+    assert (stats["written"], stats["skipped"]) == (2, 2)
+    assert "a" not in fake.calls and "b" not in fake.calls
+    assert pq.read_table(out).equals(first)                   # catalog cũ còn nguyên
+    assert parquet_parts(out) == [out, tmp_path / "catalog.1.parquet"]
+    stats = crawl(["a", "d"], {}, out)                          # không có gì mới -> không tạo part rỗng
+    assert stats["written"] == 0 and len(parquet_parts(out)) == 2
+
+    crawl(["e"], {}, out)
+    assert parquet_parts(out)[-1].name == "catalog.2.parquet"
+    table = ds.dataset([str(p) for p in parquet_parts(out)], format="parquet").to_table()
+    assert sorted(table.column("id").to_pylist()) == ["a", "b", "c", "d", "e"]
+
+
+def test_parquet_broken_part_is_skipped(tmp_path, fake, capsys):
+    pytest.importorskip("pyarrow")
+    out = tmp_path / "catalog.parquet"
+    crawl(["a"], {}, out)
+    (tmp_path / "catalog.1.parquet").write_bytes(b"PAR1\x00\x00")   # dừng giữa chừng: thiếu footer
+    c = Crawler({}, out)
+    assert c.seen == {"a", "https://y/a"}
+    assert "Bỏ qua catalog.1.parquet" in capsys.readouterr().out
+    c.run(["a", "b"])
+    assert c.sink.path.name == "catalog.2.parquet" and c.written == 1
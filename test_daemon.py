@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Daemon: API HTTP/JSON trên orchestrator thật (runner giả) — thêm / xem / huỷ job, đổi nóng /config, token, dừng có drain.
+#   python -m pytest test_daemon.py
+
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+import daemon  # noqa: E402
+from orchestrator import Orchestrator  # noqa: E402
+
+TOKEN = "s3cret-token"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Server:
+    """daemon.serve() chạy ở luồng phụ (không đụng signal handler); runner giữ mỗi job tới khi release."""
+
+    def __init__(self, token: str = TOKEN):
+        self.release = threading.Event()
+        self.started = []
+        self.orch = Orchestrator({}, jobs=1, runner=self._runner)
+        self.port = _free_port()
+        self.base = f"http://127.0.0.1:{self.port}"
+        self.result = None
+        self.thread = threading.Thread(target=self._serve, args=(token,), daemon=True)
+        self.thread.start()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.2).close()
+                return
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError("daemon không mở cổng")
+
+    def _runner(self, job, opts):
+        self.started.append(job.url)
+        self.release.wait(5)
+        opts["progress_hooks"][-1]({"status": "finished", "total_bytes": 10})
+
+    def _serve(self, token):
+        self.result = daemon.serve(self.orch, lambda ev: None, port=self.port, token=token)
+
+    def call(self, method: str, path: str, body=None, token: str = TOKEN, raw: bytes = None):
+        data = raw if raw is not None else (json.dumps(body).encode("utf-8") if body is not None else None)
+        req = urllib.request.Request(self.base + path, method=method, data=data)
+        if token:
+            req.add_header("Authorization", f"Bearer {token}")
+        try:
+            with urllib.request.urlopen(req, timeout=5) as r:
+                return r.status, json.loads(r.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read().decode("utf-8"))
+
+    def wait(self, cond, timeout: float = 5):
+        deadline = time.monotonic() + timeout
+        while not cond():
+            assert time.monotonic() < deadline, "hết thời gian chờ"
+            time.sleep(0.02)
+
+    def stop(self):
+        self.release.set()
+        if self.thread.is_alive():
+            self.call("POST", "/shutdown", {"drain": True})
+            self.thread.join(10)
+
+
+@pytest.fixture
+def server():
+    s = Server()
+    yield s
+    s.stop()
+
+
+def test_token_required(server):
+    assert server.call("GET", "/metrics", token="") == (401, {"error": "unauthorized"})
+    assert server.call("GET", "/metrics", token="sai")[0] == 401
+    assert server.call("POST", "/jobs", {"urls": ["a"]}, token="")[0] == 401
+    assert server.call("GET", "/metrics")[0] == 200
+
+
+def test_submit_status_and_cancel(server):
+    code, jobs = server.call("POST", "/jobs", {"urls": ["a", "b #urgent"], "deadline": "2h"})
+    assert code == 201 and [j["url"] for j in jobs] == ["a", "b"]
+    assert [j["lane"] for j in jobs] == ["normal", "urgent"] and all(j["deadline"] for j in jobs)
+    server.wait(lambda: server.started)
+    queued = next(j for j in jobs if j["url"] not in server.started)
+    code, job = server.call("POST", f"/jobs/{queued['id']}/cancel", {})
+    assert code == 200 and job["status"] == "cancelled"
+    assert server.call("GET", f"/jobs/{queued['id']}")[1]["status"] == "cancelled"
+    assert server.call("GET", "/jobs/999")[0] == 404
+    assert server.call("POST", "/jobs/999/cancel", {})[0] == 404
+    server.release.set()
+    server.wait(lambda: all(j["status"] != "running" for j in server.call("GET", "/jobs")[1]))
+    metrics = server.call("GET", "/metrics")[1]
+    assert metrics["jobs"] == {"done": 1, "cancelled": 1}
+
+
+def test_bad_requests(server):
+    assert server.call("POST", "/jobs", raw=b"{not json")[0] == 400
+    assert server.call("POST", "/jobs", {"urls": []}) == (400, {"error": "thiếu urls"})
+    assert server.call("GET", "/nope")[0] == 404
+    assert server.call("POST", "/nope", {})[0] == 404
+
+
+def test_shutdown_drains_and_returns_jobs(server):
+    server.call("POST", "/jobs", {"urls": "a"})
+    server.wait(lambda: server.started)
+    assert server.call("POST", "/shutdown", {"drain": True}) == (202, {"stopping": True})
+    server.release.set()
+    server.thread.join(10)
+    assert [j.status for j in server.result] == ["done"]
+    assert server.orch.metrics()["stopping"]
+
+
+def test_no_token_means_open():
+    s = Server(token="")
+    try:
+        assert s.call("GET", "/jobs", token="") == (200, [])
+    finally:
+        s.stop()
+
+
+def test_config_get_and_post(server):
+    code, knobs = server.call("GET", "/config")
+    assert code == 200 and knobs["jobs"] == 1 and knobs["bandwidth"] == 0
+    code, knobs = server.call("POST", "/config", {"jobs": "3", "bandwidth": 5000, "sleep_interval": "1.5"})
+    assert code == 200 and (knobs["jobs"], knobs["bandwidth"], knobs["sleep_interval"]) == (3, 5000, 1.5)
+    assert server.orch.jobs == 3
+    assert server.call("POST", "/config", {"format": "best"})[0] == 400
+    assert server.call("POST", "/config", {"jobs": "nhiều"})[0] == 400
+    assert server.call("GET", "/config")[1]["jobs"] == 3
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Làn ưu tiên: đọc #lane/@hạn từ link.txt / argv, thứ tự pop của LaneQueue (stride, hạn chót, sắp trễ hạn).
+#   python -m pytest test_lanes.py
+
+import time
+from itertools import count
+
+import pytest
+
+from lanes import DEFAULT_LANE, ESCALATE_SECONDS, LaneQueue, parse_deadline, parse_lines
+
+_seq = count()
+
+
+class Job:
+    def __init__(self, name: str, lane: str = DEFAULT_LANE, deadline=None):
+        self.name = name
+        self.lane = lane
+        self.deadline = deadline
+        self.seq = next(_seq)
+
+    def __repr__(self):
+        return self.name
+
+
+def _pop_all(q: LaneQueue):
+    out = []
+    while len(q):
+        out.append(q.pop().name)
+    return out
+
+
+def test_parse_deadline():
+    assert parse_deadline("30m", now=1000) == 1000 + 1800
+    assert parse_deadline("1.5h", now=0) == 5400
+    assert parse_deadline("2026-10-20T18:00") is not None
+    assert parse_deadline("mai") is None
+
+
+def test_parse_lines_tags_and_comments():
+    now = time.time()
+    urls, tags = parse_lines(["u1 #urgent @30m", "u2", "# chú thích cả dòng", "u3 #bulk # ghi chú u4",
+                              "u5 @1h #URGENT"])
+    assert urls == ["u1", "u2", "u3", "u5"]
+    assert tags["u1"][0] == "urgent" and now + 1790 < tags["u1"][1] < now + 1810
+    assert tags["u2"] == ("normal", None)
+    assert tags["u3"] == ("bulk", None)
+    assert tags["u5"][0] == "urgent" and tags["u5"][1] is not None
+
+
+def test_parse_lines_loose_tokens():
+    # argv / nhập tay: tag là token rời đứng sau URL của nó; tag trước mọi URL bị bỏ
+    urls, tags = parse_lines(["#urgent", "u1", "#bulk", "u2", "@2h"])
+    assert urls == ["u1", "u2"]
+    assert tags["u1"] == ("bulk", None)
+    assert tags["u2"][0] == "normal" and tags["u2"][1] is not None
+
+
+def test_stride_follows_weights():
+    q = LaneQueue({"urgent": 3, "normal": 1})
+    for i in range(6):
+        q.push(Job(f"n{i}"))
+        q.push(Job(f"u{i}", "urgent"))
+    order = _pop_all(q)
+    first8 = order[:8]
+    assert sum(n.startswith("u") for n in first8) == 6    # 3:1 cho tới khi làn urgent hết việc
+    assert [n for n in order if n.startswith("n")] == [f"n{i}" for i in range(6)]
+
+
+def test_earliest_deadline_first_within_lane():
+    now = time.time()
+    q = LaneQueue()
+    q.push(Job("no-deadline"))
+    q.push(Job("late", deadline=now + 7200))
+    q.push(Job("early", deadline=now + 3600))
+    assert _pop_all(q) == ["early", "late", "no-deadline"]
+
+
+def test_near_deadline_jumps_lanes():
+    q = LaneQueue()
+    for i in range(3):
+        q.push(Job(f"u{i}", "urgent"))
+    q.push(Job("bulk-due", "bulk", deadline=time.time() + ESCALATE_SECONDS / 2))
+    assert q.pop().name == "bulk-due"
+
+
+def test_idle_lane_does_not_bank_turns():
+    q = LaneQueue({"urgent": 1, "normal": 1})
+    for i in range(5):
+        q.push(Job(f"n{i}"))
+    assert [q.pop().name for _ in range(3)] == ["n0", "n1", "n2"]
+    for i in range(2):
+        q.push(Job(f"u{i}", "urgent"))
+    # làn urgent trống suốt 3 lượt vừa rồi -> xen kẽ 1:1, không chạy liền các job urgent để "bù"
+    assert _pop_all(q) == ["u0", "n3", "u1", "n4"]
+
+
+def test_front_remove_drain():
+    q = LaneQueue()
+    a, b, c = Job("a"), Job("b"), Job("c", "bulk")
+    for j in (a, b, c):
+        q.push(j)
+    assert q.peek_lane() == "normal"
+    assert q.remove(b) and not q.remove(b)
+    q.push(b, front=True)
+    assert q.q["normal"][0] is b
+    assert sorted(j.name for j in q.drain()) == ["a", "b", "c"]
+    assert len(q) == 0 and q.pop() is None
+
+
+@pytest.mark.parametrize("lane", ["unknown", None])
+def test_unknown_lane_goes_to_default(lane):
+    q = LaneQueue()
+    j = Job("x", lane)
+    q.push(j)
+    assert q.q[DEFAULT_LANE] == [j]
+    assert q.pop() is j
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# LFS multipart trên kho LFS giả: chia phần, thử lại từng phần, gửi completion / verify, nội dung ghép lại đúng.
+#   python -m pytest test_lfs_multipart.py
+
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("huggingface_hub")
+
+from huggingface_hub import CommitOperationAdd  # noqa: E402
+
+import lfs_multipart  # noqa: E402
+from bandwidth import Governor  # noqa: E402
+
+CHUNK = 4096
+REPO = "test/lfs"
+
+# body dạng file/iterator qua data= chỉ còn là DeprecationWarning của httpx -> coi là lỗi
+pytestmark = pytest.mark.filterwarnings("error::DeprecationWarning")
+
+
+class _LfsHandler(BaseHTTPRequestHandler):
+    """
+    POST .../info/lfs/objects/batch -> upload (chunk_size + URL từng phần, hoặc "basic") + verify;
+    PUT /part/N -> lưu phần, trả etag (phần nằm trong `fail` trả 500 đúng 1 lần); POST /complete, /verify -> ghi lại.
+    """
+    protocol_version = "HTTP/1.1"
+    mode = "multipart"          # multipart | basic | present
+    fail = set()
+    parts = {}
+    puts = {}
+    calls = []
+    lock = threading.Lock()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _reply(self, obj=None, code: int = 200, headers=None):
+        data = json.dumps(obj or {}).encode("utf-8")
+        self.send_response(code)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def do_POST(self):
+        body = json.loads(self._body() or b"{}")
+        base = f"http://{self.headers.get('Host')}"
+        with self.lock:
+            self.calls.append((self.path, body))
+        if self.path.endswith("/info/lfs/objects/batch"):
+            obj = body["objects"][0]
+            actions = {"verify": {"href": f"{base}/verify"}}
+            if self.mode == "multipart":
+                n = -(-obj["size"] // CHUNK)
+                header = {"chunk_size": str(CHUNK), **{str(i + 1): f"{base}/part/{i + 1}" for i in range(n)}}
+                actions["upload"] = {"href": f"{base}/complete", "header": header}
+            elif self.mode == "basic":
+                actions["upload"] = {"href": f"{base}/part/1"}
+            else:
+                actions = {}
+            return self._reply({"transfer": "multipart", "objects": [{**obj, "actions": actions}]})
+        self._reply({})
+
+    def do_PUT(self):
+        number = int(self.path.rsplit("/", 1)[1])
+        data = self._body()
+        with self.lock:
+            self.puts[number] = self.puts.get(number, 0) + 1
+            if number in self.fail:
+                self.fail.discard(number)
+                return self._reply({"error": "tạm lỗi"}, 500)
+            self.parts[number] = data
+        self._reply(headers={"ETag": f'"etag-{number}"'})
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    handler = type("Handler", (_LfsHandler,), {"fail": set(), "parts": {}, "puts": {}, "calls": []})
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    monkeypatch.setattr(lfs_multipart.time, "sleep", lambda s: None)
+    yield handler, f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+    srv.server_close()
+
+
+def _op(tmp_path, size: int) -> CommitOperationAdd:
+    path = tmp_path / "big.bin"
+    path.write_bytes(os.urandom(size))
+    return CommitOperationAdd(path_in_repo="big.bin", path_or_fileobj=str(path))
+
+
+def _upload(op, endpoint: str) -> bool:
+    return lfs_multipart.upload_large(op, REPO, "dataset", "main", "hf_test", workers=3, min_bytes=1,
+                                      endpoint=endpoint)
+
+
+def _calls(handler, suffix: str):
+    return [body for path, body in handler.calls if path.endswith(suffix)]
+
+
+@pytest.mark.parametrize("throttled", [False, True])
+def test_multipart_retries_failed_part(hub, tmp_path, throttled):
+    handler, endpoint = hub
+    handler.fail = {2}
+    op = _op(tmp_path, 3 * CHUNK + 123)
+    if throttled:   # đi qua ThrottledReader như khi có [bandwidth]
+        op.flow = Governor(1 << 30).open()
+    assert _upload(op, endpoint)
+
+    data = b"".join(handler.parts[i] for i in sorted(handler.parts))
+    assert sorted(handler.parts) == [1, 2, 3, 4]
+    assert hashlib.sha256(data).digest() == op.upload_info.sha256
+    assert handler.puts == {1: 1, 2: 2, 3: 1, 4: 1}   # chỉ phần lỗi được gửi lại
+    [complete] = _calls(handler, "/complete")
+    assert complete["oid"] == op.upload_info.sha256.hex()
+    assert complete["parts"] == [{"partNumber": i, "etag": f'"etag-{i}"'} for i in (1, 2, 3, 4)]
+    assert _calls(handler, "/verify") == [{"oid": op.upload_info.sha256.hex(), "size": op.upload_info.size}]
+    assert op._is_uploaded and op._upload_mode == "lfs"
+
+
+def test_part_gives_up_after_retries(hub, tmp_path, monkeypatch):
+    handler, endpoint = hub
+    monkeypatch.setattr(lfs_multipart, "PART_RETRIES", 1)
+
+    class _Always(set):
+        def discard(self, x):
+            pass
+
+    handler.fail = _Always({3})
+    op = _op(tmp_path, 3 * CHUNK)
+    with pytest.raises(Exception):
+        _upload(op, endpoint)
+    assert handler.puts[3] == 2
+    assert not _calls(handler, "/complete")
+    assert not getattr(op, "_is_uploaded", False)
+
+
+def test_basic_transfer_single_put(hub, tmp_path):
+    handler, endpoint = hub
+    handler.mode = "basic"
+    op = _op(tmp_path, 2 * CHUNK + 7)
+    assert _upload(op, endpoint)
+    assert handler.puts == {1: 1}
+    assert hashlib.sha256(handler.parts[1]).digest() == op.upload_info.sha256
+    assert not _calls(handler, "/complete")
+
+
+def test_already_on_hub(hub, tmp_path):
+    handler, endpoint = hub
+    handler.mode = "present"
+    op = _op(tmp_path, CHUNK)
+    assert _upload(op, endpoint)
+    assert handler.puts == {} and op._is_uploaded
+
+
+def test_small_file_uses_regular_path(hub, tmp_path):
+    handler, endpoint = hub
+    op = _op(tmp_path, CHUNK)
+    assert not lfs_multipart.upload_large(op, REPO, "dataset", "main", "hf_test", min_bytes=CHUNK + 1,
+                                          endpoint=endpoint)
+    assert handler.calls == []
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Theo dõi link.txt: chỉ trả dòng mới hoàn chỉnh, đọc lại từ đầu khi file bị cắt ngắn, không thêm URL trùng.
+#   python -m pytest test_link_watch.py
+
+import threading
+import time
+
+import pytest
+
+import link_watch
+from link_watch import LinkTail, follow, watch_into
+
+
+def _append(path, text: str):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _wait(cond, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "hết thời gian chờ"
+        time.sleep(0.02)
+
+
+def test_tail_appended_and_partial_lines(tmp_path):
+    p = tmp_path / "link.txt"
+    tail = LinkTail(p)
+    assert tail.read_new() == []                              # chưa có file
+    p.write_text("a\nb\n", encoding="utf-8")
+    assert tail.read_new() == ["a", "b"]
+    assert tail.read_new() == []
+    _append(p, "c\nd")                                        # "d" chưa có xuống dòng -> đợi
+    assert tail.read_new() == ["c"]
+    _append(p, "ờ\n")
+    assert tail.read_new() == ["dờ"]
+
+
+def test_tail_truncated_file_restarts(tmp_path):
+    p = tmp_path / "link.txt"
+    p.write_text("a\nb\nc\n", encoding="utf-8")
+    tail = LinkTail(p)
+    tail.read_new()
+    p.write_text("x\n", encoding="utf-8")                      # editor viết lại file ngắn hơn
+    assert tail.read_new() == ["x"]
+    assert LinkTail(p, offset=2).read_new() == []             # offset lưu từ trước: bỏ phần đã đọc
+
+
+@pytest.mark.parametrize("inotify", [True, False])
+def test_follow_reports_new_lines(tmp_path, monkeypatch, inotify):
+    if not inotify:
+        monkeypatch.setattr(link_watch, "_inotify", lambda directory: None)
+    p = tmp_path / "link.txt"
+    p.write_text("old\n", encoding="utf-8")
+    got, stop = [], threading.Event()
+    th = threading.Thread(target=follow, args=(p, got.extend, stop, p.stat().st_size, 0.05))
+    th.start()
+    try:
+        _append(p, "new1\n")
+        _wait(lambda: got == ["new1"])
+        tmp = tmp_path / "link.txt.tmp"                       # lưu kiểu "ghi file mới rồi đổi tên"
+        tmp.write_text("old\nnew1\nnew2\n", encoding="utf-8")
+        tmp.replace(p)
+        _wait(lambda: got == ["new1", "new2"])
+    finally:
+        stop.set()
+        th.join(5)
+    assert not th.is_alive()
+
+
+class FakeOrch:
+    def __init__(self):
+        self.batches = []
+        self.closed = False
+
+    def submit_threadsafe(self, urls, tags=None):
+        if self.closed:
+            raise RuntimeError("đang dừng")
+        self.batches.append((urls, tags))
+
+
+def test_watch_into_skips_seen_urls_and_stops_with_orchestrator(tmp_path):
+    p = tmp_path / "link.txt"
+    p.write_text("", encoding="utf-8")
+    orch, stop = FakeOrch(), threading.Event()
+    th = watch_into(orch, p, stop)
+    try:
+        _append(p, "https://y/a\nhttps://y/a #urgent\n")
+        _wait(lambda: orch.batches)
+        urls, tags = orch.batches[0]
+        assert urls == ["https://y/a"] and tags["https://y/a"][0] == "urgent"
+        p.write_text("https://y/a\n", encoding="utf-8")       # viết lại cả file -> URL cũ không thêm lại
+        _append(p, "https://y/b\n")
+        _wait(lambda: len(orch.batches) == 2)
+        assert orch.batches[1][0] == ["https://y/b"]
+        orch.closed = True
+        _append(p, "https://y/c\n")
+        _wait(stop.is_set)
+    finally:
+        stop.set()
+        th.join(5)
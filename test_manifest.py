@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Manifest: JSONL append-only, cắt part theo lô, mọi part cùng schema -> đọc chung như 1 dataset.
+#   python -m pytest test_manifest.py
+
+import json
+
+import pytest
+
+from manifest import EXTRA_KEYS, RECORD_KEYS, ManifestWriter, file_sha256, part_schema
+
+
+def _info(i: int, **kw) -> dict:
+    return {"id": f"v{i}", "title": f"Bài {i}", "duration": 60 + i, **kw}
+
+
+def test_jsonl_append_and_sha(tmp_path):
+    f = tmp_path / "a.mp3"
+    f.write_bytes(b"abc")
+    m = ManifestWriter(tmp_path / "manifest.jsonl", batch_size=10)
+    rec = m.add(_info(1, junk=None), local_path=f, repo_path="audio/a.mp3")
+    assert rec["sha256"] == file_sha256(f) and rec["size"] == 3 and "junk" not in rec
+    m.add(_info(2), repo_path=None, duplicate_of="audio/a.mp3")
+    lines = [json.loads(x) for x in (tmp_path / "manifest.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [r["id"] for r in lines] == ["v1", "v2"] and lines[1]["duplicate_of"] == "audio/a.mp3"
+
+
+def test_cut_parts_by_batch(tmp_path):
+    pytest.importorskip("pyarrow")
+    parts = []
+    m = ManifestWriter(tmp_path / "manifest.jsonl", batch_size=2, on_batch=parts.append)
+    for i in range(5):
+        m.add(_info(i))
+    assert [p.name for p in parts] == ["part-000000.parquet", "part-000001.parquet"]
+    m.flush()
+    m.flush()                                                 # không còn dòng chờ -> không ra part rỗng
+    assert [p.name for p in parts][-1] == "part-000002.parquet" and len(parts) == 3
+    again = ManifestWriter(tmp_path / "manifest.jsonl", batch_size=2, on_batch=parts.append)
+    again.add(_info(9))
+    again.flush()
+    assert parts[-1].name == "part-000003.parquet"            # lần chạy sau không ghi đè part cũ
+
+
+def test_parts_share_schema_and_read_as_dataset(tmp_path):
+    ds = pytest.importorskip("pyarrow.dataset")
+    parts = []
+    m = ManifestWriter(tmp_path / "manifest.jsonl", batch_size=2, on_batch=parts.append)
+    m.add(_info(0), repo_path="a/0.mp3", size=10)
+    m.add(_info(1, asr="44100"), repo_path="a/1.mp3", shard_key="v1", note={"x": 1})
+    m.add({"id": "v2", "duration": "không phải số"}, samples=123)     # part chỉ có vài cột vẫn cùng schema
+    m.flush()
+    assert all(ds.dataset(str(p), format="parquet").schema == part_schema() for p in parts)
+    table = ds.dataset([str(p) for p in parts], format="parquet").to_table()
+    assert table.schema.names == list(RECORD_KEYS + EXTRA_KEYS + ("extra",))
+    rows = {r["id"]: r for r in table.to_pylist()}
+    assert rows["v1"]["asr"] == 44100 and json.loads(rows["v1"]["extra"]) == {"note": {"x": 1}}
+    assert rows["v2"]["duration"] is None and rows["v2"]["samples"] == 123
+    assert rows["v0"]["size"] == 10 and rows["v0"]["extra"] is None
+
+
+def test_jsonl_parts_without_pyarrow(tmp_path, monkeypatch):
+    import builtins
+
+    real_import = builtins.__import__
+
+    def no_pyarrow(name, *args, **kw):
+        if name.startswith("pyarrow"):
+            raise ModuleNotFoundError(name)
+        return real_import(name, *args, **kw)
+
+    monkeypatch.setattr(builtins, "__import__", no_pyarrow)
+    parts = []
+    m = ManifestWriter(tmp_path / "manifest.jsonl", batch_size=1, on_batch=parts.append)
+    m.add(_info(0))
+    [part] = parts
+    assert part.name == "part-000000.jsonl" and json.loads(part.read_text(encoding="utf-8"))["id"] == "v0"
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Cache media: trúng cache thì link ra đúng tên yt-dlp chờ, vượt ngân sách thì bỏ mục dùng lâu nhất.
+#   python -m pytest test_media_cache.py
+
+import itertools
+import types
+
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+import media_cache  # noqa: E402
+from media_cache import CacheLookupPP, MediaCache, attach_cache, open_cache  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # last_used tăng đều mỗi lần gọi -> thứ tự LRU không phụ thuộc độ phân giải đồng hồ
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(media_cache, "time", types.SimpleNamespace(time=lambda: next(ticks)))
+
+
+def _src(tmp_path, name: str, size: int):
+    p = tmp_path / "dl" / name
+    p.parent.mkdir(exist_ok=True)
+    p.write_bytes(b"x" * size)
+    return p
+
+
+def test_put_get_and_materialize(tmp_path):
+    cache = MediaCache(tmp_path / "cache")
+    src = _src(tmp_path, "001 - Bài.webm", 100)
+    cache.put("v1", "251", src)
+    got = cache.get("v1", "251")
+    assert got == tmp_path / "cache" / "objects" / "v1" / "251.webm" and got.read_bytes() == src.read_bytes()
+    assert cache.get("v1", "140") is None
+    src.unlink()                                              # bản ở downloads/ bị xoá sau upload
+    dest = tmp_path / "dl" / "007 - Bài.webm"
+    assert cache.materialize("v1", "251", dest) and dest.stat().st_size == 100
+    assert not cache.materialize("v2", "251", tmp_path / "x.webm")
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path, clock):
+    cache = MediaCache(tmp_path / "cache", budget_bytes=250)
+    cache.put("a", "1", _src(tmp_path, "a.m4a", 100))
+    cache.put("b", "1", _src(tmp_path, "b.m4a", 100))
+    assert cache.get("a", "1")                               # a mới dùng lại -> b là mục cũ nhất
+    cache.put("c", "1", _src(tmp_path, "c.m4a", 100))
+    assert cache.get("b", "1") is None
+    assert cache.get("a", "1") and cache.get("c", "1")
+    assert not (tmp_path / "cache" / "objects" / "b" / "1.m4a").exists()
+
+
+def test_index_shared_between_instances_and_missing_file(tmp_path):
+    MediaCache(tmp_path / "cache").put("v1", "251", _src(tmp_path, "a.webm", 10))
+    other = MediaCache(tmp_path / "cache")                   # tiến trình khác (GUI / run.py)
+    path = other.get("v1", "251")
+    assert path
+    path.unlink()
+    assert other.get("v1", "251") is None                    # file mất -> bỏ khỏi index
+
+
+def test_progress_hook_and_lookup_pp(tmp_path):
+    cache = MediaCache(tmp_path / "cache")
+    src = _src(tmp_path, "a.f251.webm", 50)
+    info = {"id": "v1", "format_id": "251"}
+    cache.on_progress({"status": "finished", "filename": str(src), "info_dict": info})
+    cache.on_progress({"status": "finished", "filename": str(src), "info_dict": {"id": "v1", "format_id": "1+2"}})
+    assert cache.stored == 1
+
+    pp = CacheLookupPP(cache)
+    want = tmp_path / "out" / "003 - a.webm"
+    pp.run({"id": "v1", "format_id": "251", "_filename": str(want)})
+    assert want.exists() and cache.hits == 1
+    missing = {"id": "v1", "_filename": str(tmp_path / "out" / "b.mp4"),
+               "requested_formats": [{"format_id": "137", "ext": "mp4"}, {"format_id": "251", "ext": "webm"}]}
+    pp.run(missing)                                          # thiếu 1 format -> tải bình thường
+    assert cache.hits == 1 and not (tmp_path / "out" / "b.f251.webm").exists()
+
+
+def test_open_and_attach(tmp_path, monkeypatch):
+    monkeypatch.delenv("YT_CACHE_DIR", raising=False)
+    assert open_cache("") is None and attach_cache({}, None) is None
+    monkeypatch.setenv("YT_CACHE_DIR", str(tmp_path / "c"))
+    monkeypatch.setenv("YT_CACHE_GB", "0.5")
+    cache = open_cache(None)
+    assert cache.budget == 512 * 1024 ** 2
+    opts = {"progress_hooks": [print]}
+    assert attach_cache(opts, cache) is cache
+    assert opts["progress_hooks"] == [print, cache.on_progress]
+    [(factory, when)] = opts["custom_postprocessors"]
+    assert when == "before_dl" and factory(None).cache is cache
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Bộ điều phối asyncio trên YoutubeDL giả (orchestrator.build_ydl) và runner giả: thứ tự, số luồng, sự kiện, upload, đổi nóng.
+#   python -m pytest test_orchestrator.py
+
+import asyncio
+import signal
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+import orchestrator  # noqa: E402
+from orchestrator import Orchestrator, run_sync  # noqa: E402
+
+STEP = 0.01
+
+
+class FakeYoutubeDL:
+    """
+    URL 'id' hoặc 'id?steps=N&fail': N lần progress hook "downloading" (cách nhau STEP), rồi "finished"
+    và postprocessor hook MoveFiles như yt-dlp. Playlist: 'pl:a,b,c' -> từng mục qua match_filter.
+    """
+
+    created = []
+
+    def __init__(self, params: dict):
+        self.params = params
+        self._num_downloads = 0
+        self.closed = False
+        self.created.append(self)
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def download(self, urls):
+        for url in urls:
+            ids = url[3:].split(",") if url.startswith("pl:") else [url]
+            for vid in ids:
+                self._one(vid)
+        return 0
+
+    def _one(self, url: str):
+        vid, _, query = url.partition("?")
+        opts = dict(kv.partition("=")[::2] for kv in query.split("&") if kv)
+        info = {"id": vid}
+        mf = self.params.get("match_filter")
+        if mf and mf(info, incomplete=False):
+            return
+        self._num_downloads += 1
+        part = f"{self.params.get('paths', {}).get('home', '.')}/{vid}.part"
+        for i in range(int(opts.get("steps", 3))):
+            time.sleep(STEP)
+            for h in self.params.get("progress_hooks") or []:
+                h({"status": "downloading", "tmpfilename": part, "downloaded_bytes": (i + 1) * 100,
+                   "info_dict": info})
+        if "fail" in opts:
+            raise RuntimeError(f"{vid}: lỗi giả")
+        for h in self.params.get("progress_hooks") or []:
+            h({"status": "finished", "filename": vid, "total_bytes": 1000, "info_dict": info})
+        for h in self.params.get("postprocessor_hooks") or []:
+            h({"status": "finished", "postprocessor": "MoveFiles", "info_dict": info})
+
+
+@pytest.fixture(autouse=True)
+def _keep_signals():
+    # run_sync cài handler Ctrl+C / SIGTERM cho tiến trình -> trả lại handler của pytest
+    saved = {s: signal.getsignal(s) for s in (signal.SIGINT, signal.SIGTERM)}
+    yield
+    for s, h in saved.items():
+        signal.signal(s, h)
+
+
+@pytest.fixture
+def fake_ydl(monkeypatch):
+    FakeYoutubeDL.created = []
+    monkeypatch.setattr(orchestrator, "build_ydl", FakeYoutubeDL)
+    return FakeYoutubeDL
+
+
+class Recorder:
+    """Runner giả (thay cookies pool): đếm số job chạy cùng lúc, gọi progress hook như yt-dlp."""
+
+    def __init__(self, steps: int = 5):
+        self.steps = steps
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+        self.order = []
+        self.opts = {}
+
+    def __call__(self, job, opts):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            self.order.append(job.url)
+            self.opts[job.url] = opts
+        try:
+            hook = opts["progress_hooks"][-1]
+            for i in range(self.steps):
+                time.sleep(STEP)
+                hook({"status": "downloading", "tmpfilename": f"{job.url}.part", "downloaded_bytes": i})
+            if "fail" in job.url:
+                raise RuntimeError("lỗi giả")
+            hook({"status": "finished", "total_bytes": 500})
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def _run(orch: Orchestrator, urls, **kw):
+    events = []
+    jobs = run_sync(orch, urls, events.append, **kw)
+    return jobs, events
+
+
+def test_warm_ydl_runs_jobs_and_reuses_instances(fake_ydl):
+    orch = Orchestrator({}, jobs=2)
+    jobs, events = _run(orch, ["a", "b", "c", "d"])
+    assert [j.status for j in jobs] == ["done"] * 4
+    assert all(j.bytes == 1000 for j in jobs)
+    assert len(fake_ydl.created) <= 2                         # 1 YoutubeDL ấm mỗi luồng tải
+    assert all(y.closed for y in fake_ydl.created)
+    kinds = [e.kind for e in events]
+    assert kinds.count("start") == 4 and kinds.count("finished") == 4 and kinds[-1] == "done"
+
+
+def test_jobs_limit_and_fifo_order():
+    rec = Recorder()
+    orch = Orchestrator({}, jobs=2, runner=rec)
+    jobs, _ = _run(orch, [f"u{i}" for i in range(6)])
+    assert rec.peak == 2
+    assert rec.order == [f"u{i}" for i in range(6)]
+    assert all(j.status == "done" for j in jobs)
+
+
+def test_numbers_become_autonumber_start():
+    rec = Recorder(steps=1)
+    orch = Orchestrator({}, jobs=1, runner=rec)
+    _run(orch, ["x", "y"], numbers=[7, 3])
+    assert rec.opts["x"]["autonumber_start"] == 7 and rec.opts["y"]["autonumber_start"] == 3
+
+
+def test_warm_ydl_keeps_original_numbering(fake_ydl):
+    orch = Orchestrator({}, jobs=1)
+    _run(orch, ["a", "b", "c"], numbers=[3, 1, 2])
+    ydl = fake_ydl.created[0]
+    # autonumber của mục thứ k trên instance = autonumber_start - 1 + k
+    assert ydl.params["autonumber_start"] - 1 + ydl._num_downloads == 2
+
+
+def test_error_job_does_not_stop_others(fake_ydl):
+    orch = Orchestrator({}, jobs=2)
+    jobs, events = _run(orch, ["a", "b?fail", "c"])
+    assert [j.status for j in jobs] == ["done", "error", "done"]
+    assert "lỗi giả" in jobs[1].error
+    assert [e.job.id for e in events if e.kind == "error"] == [2]
+
+
+def test_uploads_overlap_downloads_and_are_awaited():
+    done = []
+
+    def upload(name):
+        time.sleep(0.05)
+        done.append(name)
+        return name
+
+    orch = Orchestrator({}, jobs=1, upload_workers=2, runner=None)
+
+    def runner(job, opts):
+        opts["progress_hooks"][-1]({"status": "finished", "total_bytes": 1})
+        orch.upload(upload, job.url, job=job)
+
+    orch.runner = runner
+    jobs, events = _run(orch, ["a", "b", "c"])
+    assert sorted(done) == ["a", "b", "c"]                    # run() chờ cả upload còn dở
+    kinds = [e.kind for e in events]
+    assert kinds.count("uploaded") == 3
+    # upload đầu tiên bắt đầu trước khi job cuối tải xong
+    assert kinds.index("upload_start") < max(i for i, k in enumerate(kinds) if k == "finished")
+
+
+def test_upload_error_is_reported():
+    def bad():
+        raise OSError("mạng lỗi")
+
+    orch = Orchestrator({}, jobs=1, runner=lambda job, opts: orch.upload(bad, job=job))
+    _, events = _run(orch, ["a"])
+    [ev] = [e for e in events if e.kind == "upload_error"]
+    assert isinstance(ev.data, OSError)
+
+
+def test_serve_accepts_jobs_until_cancel():
+    rec = Recorder(steps=1)
+    orch = Orchestrator({}, jobs=2, runner=rec)
+
+    async def main():
+        task = asyncio.create_task(orch.serve())
+        await asyncio.sleep(0.01)
+        jobs = await asyncio.to_thread(orch.submit_threadsafe, ["s1", "s2"])
+        assert [j.id for j in jobs] == [1, 2]
+        while any(j.status != "done" for j in orch.list_jobs()):
+            await asyncio.sleep(STEP)
+        orch.cancel(drain=True)
+        return await task
+
+    jobs = asyncio.run(main())
+    orch.close()
+    assert [j.status for j in jobs] == ["done", "done"]
+    with pytest.raises(RuntimeError):
+        orch.submit_threadsafe(["late"])
+    assert orch.metrics()["jobs"] == {"done": 2}
+
+
+def _cancel_on_start(orch: Orchestrator, drain: bool, job_id: int = 1):
+    events = []
+
+    def on_event(ev):
+        events.append(ev)
+        if ev.kind == "start" and ev.job.id == job_id:
+            orch.cancel(drain=drain)
+    return events, on_event
+
+
+def test_drain_finishes_running_job_and_skips_queued(fake_ydl):
+    orch = Orchestrator({}, jobs=1)
+    events, on_event = _cancel_on_start(orch, drain=True)
+    jobs = run_sync(orch, ["a?steps=10", "b", "c"], on_event)
+    assert [j.status for j in jobs] == ["done", "cancelled", "cancelled"]
+    assert [e.job.id for e in events if e.kind == "start"] == [1]
+
+
+def test_drain_stops_playlist_after_current_item(fake_ydl):
+    orch = Orchestrator({}, jobs=1)
+    seen = []
+    orch._user_hooks.append(lambda d: seen.append(d["info_dict"]["id"]) if d["status"] == "finished" else None)
+    events, on_event = _cancel_on_start(orch, drain=True)
+    run_sync(orch, ["pl:a?steps=10,b,c"], on_event)
+    assert seen == ["a"]
+
+
+def test_fast_cancel_interrupts_download_and_keeps_partial(fake_ydl):
+    orch = Orchestrator({}, jobs=2)
+    events, on_event = _cancel_on_start(orch, drain=False)
+    jobs = run_sync(orch, ["a?steps=200", "b?steps=200", "c"], on_event)
+    assert [j.status for j in jobs] == ["cancelled"] * 3
+    assert all(j.finished_at - j.started_at < 1 for j in jobs[:2])   # không chờ 200 bước
+    assert [e.kind for e in events].count("start") == 2
+
+
+def test_cancel_without_keep_partial_removes_part_files(tmp_path):
+    part = tmp_path / "a.webm.part"
+
+    def runner(job, opts):
+        part.write_bytes(b"x")
+        while True:
+            opts["progress_hooks"][-1]({"status": "downloading", "tmpfilename": str(part)})
+            time.sleep(STEP)
+
+    orch = Orchestrator({}, jobs=1, runner=runner, keep_partial=False)
+    events, on_event = _cancel_on_start(orch, drain=False)
+    [job] = run_sync(orch, ["a"], on_event)
+    assert job.status == "cancelled" and not part.exists() and job.partials == set()
+
+
+def test_fast_cancel_keeps_pending_uploads_as_leftovers():
+    gate = threading.Event()
+    orch = Orchestrator({}, jobs=1, upload_workers=1)
+
+    def slow_upload(name):
+        gate.wait(2)
+        return name
+
+    def runner(job, opts):
+        orch.upload(slow_upload, f"{job.url}-1", job=job)     # chiếm luồng upload duy nhất
+        orch.upload(slow_upload, f"{job.url}-2", job=job)     # còn chờ lúc dừng nhanh
+        time.sleep(0.05)
+        orch.cancel()
+        gate.set()
+
+    orch.runner = runner
+    [job] = run_sync(orch, ["a"], lambda ev: None)
+    assert job.leftovers == [("a-2",)]
+
+
+def test_cancel_job_while_queued():
+    rec = Recorder(steps=20)
+    orch = Orchestrator({}, jobs=1, runner=rec)
+    cancelled = []
+
+    def on_event(ev):
+        if ev.kind == "start" and ev.job.id == 1:
+            # API daemon gọi từ luồng HTTP, không phải từ event loop
+            t = threading.Thread(target=lambda: cancelled.append(orch.cancel_job(2)))
+            t.start()
+
+    jobs = run_sync(orch, ["a", "b", "c"], on_event)
+    assert [j.status for j in jobs] == ["done", "cancelled", "done"]
+    assert rec.order == ["a", "c"] and cancelled == [jobs[1]]
+
+
+def test_tune_jobs_while_running():
+    rec = Recorder(steps=10)
+    orch = Orchestrator({}, jobs=1, runner=rec)
+
+    def on_event(ev):
+        if ev.kind == "start" and ev.job.id == 1:
+            threading.Thread(target=orch.tune, kwargs={"jobs": 3}).start()   # như API / signal handler
+
+    jobs = run_sync(orch, [f"u{i}" for i in range(6)], on_event)
+    assert all(j.status == "done" for j in jobs)
+    assert rec.peak == 3 and orch.knobs()["jobs"] == 3
+
+
+def test_tune_params_reach_warm_ydl(fake_ydl):
+    orch = Orchestrator({"ratelimit": 1000}, jobs=1)
+    ydl = orch._ydl()                                              # YoutubeDL ấm của luồng tải đang chạy
+    knobs = orch.tune(sleep_interval=2.5, max_sleep_interval=None, ratelimit=500)
+    assert ydl.params["sleep_interval"] == 2.5 and ydl.params["ratelimit"] == 500
+    assert "max_sleep_interval" not in ydl.params                  # None = giữ nguyên
+    assert knobs["sleep_interval"] == 2.5 and knobs["ratelimit"] == 500
+    with pytest.raises(ValueError, match="format"):
+        orch.tune(format="best")
+    orch.close()
+
+
+def test_tune_bandwidth_replaces_ratelimit(fake_ydl):
+    orch = Orchestrator({"ratelimit": 1000, "buffersize": 4096}, jobs=1)
+    ydl = orch._ydl()
+    assert orch.tune(bandwidth=5000)["bandwidth"] == 5000
+    assert "ratelimit" not in orch.opts and "ratelimit" not in ydl.params
+    assert orch.opts["buffersize"] == 64 * 1024 and orch.opts["noresizebuffer"]
+    orch.tune(ratelimit=200)                                       # governor giữ trần tổng -> bỏ qua
+    assert "ratelimit" not in orch.opts and "ratelimit" not in ydl.params
+    assert orch.tune(bandwidth=0)["bandwidth"] == 0 and orch.governor is None
+    assert orch.opts["buffersize"] == 4096 and "noresizebuffer" not in orch.opts
+    orch.close()
+
+
+def test_tune_upload_workers():
+    orch = Orchestrator({}, jobs=1, upload_workers=1)
+    knobs = orch.tune(upload_workers=3, upload_bandwidth=1000)
+    assert knobs["upload_workers"] == 3 and knobs["upload_bandwidth"] == 1000
+    assert orch._up_pool._max_workers == 3
+    assert orch.tune(upload_workers=0, upload_bandwidth=0)["upload_workers"] == 1
+    assert orch.upload_governor is None
+    orch.close()
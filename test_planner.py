@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Sắp thứ tự tải theo kế hoạch (fifo / longest / shortest, giữ số thứ tự gốc) và chọn format theo kế hoạch đã lưu.
+#   python -m pytest test_planner.py
+
+import gc
+import weakref
+
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+from yt_dlp import YoutubeDL  # noqa: E402
+
+from planner import Plan, PlanCache, attach_plans, schedule  # noqa: E402
+
+
+def _plans():
+    # playlist "pl" trải ra 3 video; c không có filesize -> quy đổi từ thời lượng theo bitrate trung bình
+    a = Plan("https://y/a", "a", duration=100, size=1_000_000)
+    b = Plan("https://y/b", "b", duration=300, size=3_000_000)
+    c = Plan("https://y/c", "c", duration=200)
+    d = Plan("https://y/d", "d", duration=10, size=50_000)
+    for p in (a, b, c):
+        p.src = "https://y/pl"
+    return [a, b, c, d]
+
+
+URLS = ["https://y/pl", "https://y/d", "https://y/broken"]
+
+
+def test_fifo_keeps_list_order():
+    urls, numbers = schedule(URLS, _plans(), "fifo")
+    assert urls == ["https://y/a", "https://y/b", "https://y/c", "https://y/d", "https://y/broken"]
+    assert numbers == [1, 2, 3, 4, None]
+
+
+def test_longest_first():
+    urls, numbers = schedule(URLS, _plans(), "longest")
+    assert urls == ["https://y/b", "https://y/c", "https://y/a", "https://y/d", "https://y/broken"]
+    assert numbers == [2, 3, 1, 4, None]     # số thứ tự (tên file) theo danh sách gốc
+
+
+def test_shortest_first():
+    urls, numbers = schedule(URLS, _plans(), "shortest")
+    assert urls[:4] == ["https://y/d", "https://y/a", "https://y/c", "https://y/b"]
+    assert numbers == [4, 1, 3, 2, None]
+
+
+def test_no_plans():
+    assert schedule(URLS, [], "longest") == (URLS, [None] * 3)
+
+
+def test_plan_cache_roundtrip(tmp_path):
+    cache = PlanCache(tmp_path)
+    plans = _plans()[:2]
+    cache.put("https://y/pl", "ba", plans)
+    cache.save()
+    again = PlanCache(tmp_path)
+    assert [p.id for p in again.get_url("https://y/pl", "ba")] == ["a", "b"]
+    assert again.get("b", "ba").size == 3_000_000
+    assert again.get("b", "bestaudio") is None            # đổi chuỗi format -> lập kế hoạch lại
+    assert PlanCache(tmp_path, ttl=0).get("a", "ba") is None
+
+
+FORMATS = [{"format_id": "140", "ext": "m4a", "acodec": "mp4a.40.2", "vcodec": "none", "url": "u", "tbr": 128},
+           {"format_id": "251", "ext": "webm", "acodec": "opus", "vcodec": "none", "url": "u", "tbr": 160}]
+
+
+def _select(sel, pp, video_id):
+    pp.run({"id": video_id})
+    ctx = {"formats": FORMATS, "has_merged_format": False, "incomplete_formats": False}
+    return [f["format_id"] for f in sel(ctx)]
+
+
+def test_planned_selector_uses_plan_or_falls_back():
+    opts = {"format": "bestaudio"}
+    sel = attach_plans(opts, [Plan("https://y/a", "a", format_ids=["140"]), Plan("https://y/b", "b", format_ids=["999"])])
+    [(factory, when)] = opts["custom_postprocessors"]
+    assert opts["format"] is sel and when == "after_filter"
+    with YoutubeDL({"quiet": True}) as ydl:
+        pp = factory(ydl)
+        assert _select(sel, pp, "a") == ["140"]
+        assert _select(sel, pp, "b") == ["251"]               # format trong kế hoạch không còn -> chuỗi gốc
+        assert _select(sel, pp, "x") == ["251"]
+
+
+def test_planned_selector_does_not_keep_ydl_alive():
+    opts = {"format": "bestaudio"}
+    sel = attach_plans(opts, [Plan("https://y/a", "a", format_ids=["140"])])
+    [(factory, _)] = opts["custom_postprocessors"]
+    refs = []
+    for _ in range(3):                                        # mỗi mục 1 YoutubeDL riêng (như runner cookies pool)
+        with YoutubeDL({"quiet": True}) as ydl:
+            pp = factory(ydl)
+            assert _select(sel, pp, "a") == ["140"]
+            refs.append(weakref.ref(ydl))
+        del ydl, pp
+    gc.collect()
+    assert all(r() is None for r in refs)
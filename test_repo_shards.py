@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Chia mục ra nhiều repo / branch: đích của 1 id cố định giữa các lần chạy và tính lại được từ shard_map.
+#   python -m pytest test_repo_shards.py
+
+import hashlib
+from collections import Counter
+
+from repo_shards import ShardRouter, make_router, route_info
+
+IDS = [f"vid{i:05d}" for i in range(4000)]
+
+
+def test_single_target_keeps_old_layout():
+    r = ShardRouter("me/data", "main")
+    assert {r.pick(i).repo_id for i in IDS[:50]} == {"me/data"}
+    assert route_info(r, "x") == {} and route_info(None, "x") == {}
+
+
+def test_names_by_mode():
+    assert [(t.repo_id, t.branch) for t in ShardRouter("me/d", "main", 3).targets] == \
+        [("me/d-00", "main"), ("me/d-01", "main"), ("me/d-02", "main")]
+    assert [(t.repo_id, t.branch) for t in ShardRouter("me/d", "main", 2, "branch").targets] == \
+        [("me/d", "main-00"), ("me/d", "main-01")]
+    assert ShardRouter("me/d", "main", 2, "khác").mode == "repo"
+
+
+def test_pick_is_stable_and_matches_shard_map():
+    a = ShardRouter("me/d", "main", 8)
+    b = ShardRouter("me/d", "main", 8, uploaders=4)     # lần chạy / máy khác
+    assert all(a.pick(i).index == b.pick(i).index for i in IDS)
+    assert a.shard_map()["hash"] == "sha1(id)[:8] big-endian % n"
+    for i in IDS[:200]:                                   # người đọc tự tính lại theo shard_map
+        h = int.from_bytes(hashlib.sha1(i.encode("utf-8")).digest()[:8], "big")
+        assert a.pick(i).index == h % 8
+    assert route_info(a, "vid00001") == {"repo_id": a.pick("vid00001").repo_id, "revision": "main"}
+
+
+def test_pick_spreads_evenly():
+    counts = Counter(ShardRouter("me/d", "main", 8).pick(i).index for i in IDS)
+    assert len(counts) == 8
+    assert max(counts.values()) < 1.2 * len(IDS) / 8
+
+
+def test_make_router_and_counts(tmp_path):
+    r = make_router({"shards": 2, "shard_mode": "branch", "uploaders_per_shard": 3}, "me/d", "main")
+    t = r.pick("a")
+    r.count(t, 2_000_000)
+    r.count(t, 1_000_000)
+    assert (t.files, t.bytes) == (2, 3_000_000)
+    assert f"{t.repo_id}@{t.branch}: 2 file, 3.0 MB" in r.summary()
+    assert r.write_map(tmp_path / "shard_map.json").read_text(encoding="utf-8").count("main-0") == 2
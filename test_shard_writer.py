@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Gom file thành shard: đóng shard khi đủ dung lượng, index trỏ đúng vị trí mục, nhận lại shard của lần chạy trước.
+#   python -m pytest test_shard_writer.py
+
+import json
+import tarfile
+from pathlib import Path
+
+import pytest
+
+from shard_writer import ItemTooLarge, ShardWriter, item_key, item_meta
+
+
+def _files(tmp_path: Path, n: int, size: int = 400):
+    src = tmp_path / "src"
+    src.mkdir()
+    out = []
+    for i in range(n):
+        p = src / f"v{i}.mp3"
+        p.write_bytes(bytes([i]) * size)
+        out.append(p)
+    return out
+
+
+def test_item_key_and_meta(tmp_path):
+    assert item_key(tmp_path / "001 - x.mp3", {"id": "abc"}) == "abc"
+    assert item_key(tmp_path / "x_0003.wav", {"id": "abc", "shard_files": ["x"]}) == "abc_0003"
+    assert item_key(tmp_path / "Bài hát.mp3", {}) == "Bài_hát"
+    assert item_meta({"id": "a", "title": None, "duration": 3, "other": 1}) == {"id": "a", "duration": 3}
+
+
+def test_tar_rollover_and_index(tmp_path):
+    shards = []
+    w = ShardWriter(tmp_path / "out", max_bytes=1000, on_shard=lambda s, i: shards.append((s, i)))
+    for i, p in enumerate(_files(tmp_path, 5)):
+        w.add(p, f"v{i}", {"id": f"v{i}"})
+    assert len(shards) == 1                                 # mục thứ 3 (1200 B + meta) vượt 1000 B -> đóng shard
+    w.close()
+    assert [s.name for s, _ in shards] == ["shard-000000.tar", "shard-000001.tar"]
+
+    shard, index = shards[0]
+    idx = json.loads(index.read_text(encoding="utf-8"))
+    assert idx["format"] == "tar" and [e["key"] for e in idx["items"]] == ["v0", "v1", "v2"]
+    with tarfile.open(shard) as tf:
+        assert tf.getnames() == ["v0.mp3", "v0.json", "v1.mp3", "v1.json", "v2.mp3", "v2.json"]
+        assert json.load(tf.extractfile("v1.json")) == {"id": "v1"}
+    raw = shard.read_bytes()
+    e = idx["items"][1]
+    assert raw[e["offset"]:e["offset"] + e["size"]] == bytes([1]) * 400   # đọc thẳng bằng HTTP Range
+
+
+def test_close_without_items_leaves_nothing(tmp_path):
+    w = ShardWriter(tmp_path, max_bytes=1000)
+    w.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_parquet_rows_and_item_limit(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    shards = []
+    w = ShardWriter(tmp_path / "out", fmt="parquet", max_bytes=1000, max_item_bytes=500,
+                    on_shard=lambda s, i: shards.append((s, i)))
+    files = _files(tmp_path, 3)
+    for i, p in enumerate(files):
+        entry = w.add(p, f"v{i}", {"id": f"v{i}"})
+    assert entry["row"] == 2
+    big = tmp_path / "big.wav"
+    big.write_bytes(b"x" * 600)
+    with pytest.raises(ItemTooLarge):
+        w.add(big, "big", {})
+    w.close()
+    [(shard, index)] = shards
+    table = pq.read_table(shard)
+    assert table.column("key").to_pylist() == ["v0", "v1", "v2"]
+    assert table.column("data").to_pylist()[1] == files[1].read_bytes()
+    assert json.loads(table.column("meta").to_pylist()[0]) == {"id": "v0"}
+
+
+def test_new_run_continues_sequence_and_recovers(tmp_path):
+    out = tmp_path / "out"
+    files = _files(tmp_path, 3)
+    first = ShardWriter(out, max_bytes=500)                 # không có on_shard: như bị dừng trước khi upload
+    first.add(files[0], "v0", {})
+    first.add(files[1], "v1", {})
+    first.add(files[2], "v2", {})                           # shard 1 đang ghi dở, chưa có index
+    pushed = []
+    again = ShardWriter(out, max_bytes=500, on_shard=lambda s, i: pushed.append(s.name))
+    assert again.seq == 2
+    done, broken = again.leftovers()
+    assert [s.name for s, _ in done] == ["shard-000000.tar"]
+    assert [p.name for p in broken] == ["shard-000001.tar"]
+    assert again.recover() == 1 and pushed == ["shard-000000.tar"]
+    again.add(files[0], "v0", {})
+    again.close()
+    assert pushed[-1] == "shard-000002.tar"
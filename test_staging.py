@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Chỉ mục file tải dở: nhận lại file .part (đổi tên theo stem mới), bỏ file hỏng, dọn file mồ côi.
+#   python -m pytest test_staging.py
+
+import os
+import time
+
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+from staging import INDEX_NAME, StagingIndex  # noqa: E402
+
+
+def _progress(index: StagingIndex, part, final, vid="v1", fmt="251", total=1000):
+    index.track({"status": "downloading", "tmpfilename": str(part), "total_bytes": total,
+                 "info_dict": {"id": vid, "format_id": fmt, "_filename": str(final)}})
+
+
+def test_track_then_finished(tmp_path):
+    index = StagingIndex(tmp_path)
+    final = tmp_path / "001 - Bài [50%].webm"
+    _progress(index, str(final) + ".part", final)
+    assert StagingIndex(tmp_path).entries[str(final) + ".part"]["video_id"] == "v1"
+    index.track({"status": "finished", "filename": str(final)})
+    assert StagingIndex(tmp_path).entries == {}
+
+
+def test_adopt_renames_part_family(tmp_path):
+    old = tmp_path / "003 - Bài [x].webm"
+    part = tmp_path / (old.name + ".part")
+    for f in (part, tmp_path / (old.name + ".ytdl"), tmp_path / (old.name + ".part-Frag2")):
+        f.write_bytes(b"x" * 100)
+    index = StagingIndex(tmp_path)
+    _progress(index, part, old)
+
+    again = StagingIndex(tmp_path)      # lần chạy sau: autonumber khác
+    assert again.adopt("v1", ["251"], "007 - Bài [x]") == 1
+    names = sorted(p.name for p in tmp_path.iterdir() if p.name != INDEX_NAME)
+    assert names == ["007 - Bài [x].webm.part", "007 - Bài [x].webm.part-Frag2", "007 - Bài [x].webm.ytdl"]
+    assert list(StagingIndex(tmp_path).entries) == [str(tmp_path / "007 - Bài [x].webm.part")]
+
+
+def test_adopt_skips_other_format_and_drops_broken(tmp_path):
+    index = StagingIndex(tmp_path)
+    good = tmp_path / "a.webm.part"
+    big = tmp_path / "b.m4a.part"
+    good.write_bytes(b"x" * 10)
+    big.write_bytes(b"x" * 5000)                      # lớn hơn expected_size -> hỏng
+    _progress(index, good, tmp_path / "a.webm", fmt="251")
+    _progress(index, big, tmp_path / "b.m4a", fmt="140")
+    _progress(index, tmp_path / "gone.webm.part", tmp_path / "gone.webm", vid="v2")
+    assert index.adopt("v1", ["22"], "new") == 0      # format khác -> không nhận
+    assert index.adopt("v1", ["140"], "b") == 0
+    assert not big.exists() and str(big) not in index.entries
+    assert index.adopt("v2", ["251"], "gone") == 0     # file không còn trên đĩa -> bỏ khỏi chỉ mục
+    assert str(tmp_path / "gone.webm.part") not in index.entries
+    assert good.exists()
+
+
+def test_gc_removes_old_partials_only(tmp_path):
+    old = tmp_path / "old.webm.part"
+    frag = tmp_path / "old.webm.part-Frag7"
+    fresh = tmp_path / "fresh.webm.part"
+    done = tmp_path / "done.mp3"
+    for f in (old, frag, fresh, done):
+        f.write_bytes(b"x")
+    past = time.time() - 3600
+    for f in (old, frag, done):
+        os.utime(f, (past, past))
+    index = StagingIndex(tmp_path)
+    assert index.gc(max_age=600) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["done.mp3", "fresh.webm.part"]
+    assert not (tmp_path / INDEX_NAME).exists()        # không có gì trong chỉ mục -> không ghi file
+
+
+def test_gc_drops_stale_entries(tmp_path):
+    index = StagingIndex(tmp_path)
+    _progress(index, tmp_path / "x.webm.part", tmp_path / "x.webm")
+    assert index.gc() == 0
+    assert StagingIndex(tmp_path).entries == {}
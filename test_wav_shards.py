@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# WAV / FLAC cho huấn luyện: tham số ffmpeg theo [wav] / [flac], cắt đoạn chỉ trả về đoạn của lần chạy này,
+# FLAC ghi số mẫu giải mã được.
+#   python -m pytest test_wav_shards.py   (ffmpeg giả: ghi file đầu ra theo tham số; test file thật cần ffmpeg)
+
+import shutil
+import subprocess
+import wave
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("yt_dlp")
+
+import wav_shards  # noqa: E402
+from wav_shards import FlacPP, WavShardPP, attach_flac, attach_wav_options, wav_options_set  # noqa: E402
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    """real_run_ffmpeg giả: có -f segment thì ghi `segments` đoạn theo mẫu %04d, không thì 1 file."""
+    calls = []
+    state = {"segments": 2}
+
+    def run(self, inputs, outputs):
+        (out, args), = outputs
+        calls.append(args)
+        if "segment" in args:
+            for i in range(state["segments"]):
+                Path(out.replace("%%", "%").replace("%04d", f"{i:04d}")).write_bytes(b"seg")
+        else:
+            Path(out).write_bytes(b"wav")
+
+    monkeypatch.setattr(WavShardPP, "real_run_ffmpeg", run)
+    return calls, state
+
+
+def test_options_set():
+    assert not wav_options_set(None) and not wav_options_set({"bit_depth": 16})
+    assert wav_options_set({"bit_depth": 24}) and wav_options_set({"sample_rate": 16000})
+
+
+def test_single_file_args(tmp_path, fake_ffmpeg):
+    calls, _ = fake_ffmpeg
+    src = tmp_path / "001 - Bài.webm"
+    src.write_bytes(b"x")
+    pp = WavShardPP(None, sample_rate=16000, channels=1, bit_depth=24)
+    removed, info = pp.run({"filepath": str(src)})
+    assert calls == [["-vn", "-map", "0:a:0", "-c:a", "pcm_s24le", "-ar", "16000", "-ac", "1"]]
+    assert info["filepath"] == str(tmp_path / "001 - Bài.wav") and info["ext"] == "wav"
+    assert removed == [str(src)] and "shard_files" not in info
+
+
+def test_segments_with_percent_in_title(tmp_path, fake_ffmpeg):
+    src = tmp_path / "Bài [50%].webm"
+    src.write_bytes(b"x")
+    _, info = WavShardPP(None, segment_seconds=30).run({"filepath": str(src)})
+    assert [Path(p).name for p in info["shard_files"]] == ["Bài [50%]_0000.wav", "Bài [50%]_0001.wav"]
+    assert info["filepath"] == info["shard_files"][0]
+
+
+def test_segments_ignore_leftovers_of_earlier_run(tmp_path, fake_ffmpeg):
+    _, state = fake_ffmpeg
+    src = tmp_path / "a.webm"
+    src.write_bytes(b"x")
+    for i in range(5):                                        # lần trước ra 5 đoạn (hoặc bị ngắt giữa chừng)
+        (tmp_path / f"a_{i:04d}.wav").write_bytes(b"old")
+    state["segments"] = 2
+    _, info = WavShardPP(None, segment_seconds=30).run({"filepath": str(src)})
+    assert [Path(p).name for p in info["shard_files"]] == ["a_0000.wav", "a_0001.wav"]
+    assert sorted(p.name for p in tmp_path.glob("a_*.wav")) == ["a_0000.wav", "a_0001.wav"]
+    assert all(Path(p).read_bytes() == b"seg" for p in info["shard_files"])
+
+
+def test_attach_wav_options_drops_metadata_when_segmenting():
+    opts = {"postprocessors": [{"key": "FFmpegExtractAudio", "preferredcodec": "wav"},
+                               {"key": "FFmpegMetadata"}]}
+    attach_wav_options(opts, {"segment_seconds": 10})
+    [(factory, when)] = opts["custom_postprocessors"]
+    assert isinstance(factory(None), WavShardPP) and when == "post_process"
+
+
+@pytest.mark.parametrize("bits, fmt", [(16, ["-sample_fmt", "s16"]),
+                                       (24, ["-sample_fmt", "s32", "-bits_per_raw_sample", "24"]),
+                                       (32, ["-sample_fmt", "s32", "-bits_per_raw_sample", "24"])])
+def test_flac_codec_args(bits, fmt):
+    pp = FlacPP(None, compression_level=8, bit_depth=bits)
+    assert pp.codec_args() == ["-c:a", "flac", "-compression_level", "8"] + fmt
+    assert pp.describe() == f"flac level 8, {min(bits, 24)} bit"
+    assert FlacPP(None, compression_level=99).level == 12 and FlacPP(None, compression_level=-1).level == 0
+
+
+def test_flac_counts_decoded_samples(tmp_path, fake_ffmpeg, monkeypatch):
+    counts = {"a.flac": 1000, "b_0000.flac": 300, "b_0001.flac": 200}
+    monkeypatch.setattr(wav_shards, "decoded_samples", lambda path, ffmpeg="ffmpeg": counts[Path(path).name])
+    src = tmp_path / "a.webm"
+    src.write_bytes(b"x")
+    _, info = FlacPP(None).run({"filepath": str(src)})
+    assert info["samples"] == 1000 and info["ext"] == "flac" and "segment_samples" not in info
+
+    src = tmp_path / "b.webm"
+    src.write_bytes(b"x")
+    _, info = FlacPP(None, segment_seconds=30).run({"filepath": str(src)})
+    assert info["samples"] == 500
+    assert info["segment_samples"] == {str(tmp_path / "b_0000.flac"): 300, str(tmp_path / "b_0001.flac"): 200}
+
+
+def test_attach_flac_replaces_extract_audio():
+    opts = {"postprocessors": [{"key": "FFmpegExtractAudio", "preferredcodec": "flac"}, {"key": "FFmpegMetadata"}]}
+    attach_flac(opts, {"sample_rate": 16000, "bit_depth": 24}, level=3)
+    pps = [factory(None) for factory, _ in opts["custom_postprocessors"]]
+    assert isinstance(pps[0], FlacPP) and (pps[0].level, pps[0].sample_rate, pps[0].bit_depth) == (3, 16000, 24)
+    assert type(pps[1]).__name__ == "FFmpegMetadataPP"
+    opts = {"postprocessors": [{"key": "FFmpegExtractAudio", "preferredcodec": "flac"}, {"key": "FFmpegMetadata"}]}
+    attach_flac(opts, {"segment_seconds": 10})
+    assert len(opts["custom_postprocessors"]) == 1
+
+
+@pytest.mark.skipif(not shutil.which("ffmpeg"), reason="cần ffmpeg")
+def test_decoded_samples_real_file(tmp_path):
+    src = tmp_path / "tone.wav"
+    with wave.open(str(src), "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(8000)
+        w.writeframes(b"\x00\x01" * 2 * 12345)
+    out = tmp_path / "tone.flac"
+    subprocess.run(["ffmpeg", "-v", "error", "-nostdin", "-i", str(src), "-c:a", "flac", str(out)], check=True)
+    assert wav_shards.decoded_samples(out) == 12345
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Hàng đợi SQLite nhiều worker: lease, hết hạn, số lượt thử, chủ sở hữu khi complete, heartbeat.
+#   python -m pytest test_work_queue.py
+
+import time
+
+import pytest
+
+from work_queue import WorkQueue
+
+
+@pytest.fixture
+def q(tmp_path):
+    q = WorkQueue(tmp_path / "queue.db", lease_seconds=60, max_attempts=2)
+    q.enqueue([(f"https://x/{i}", f"v{i}") for i in range(3)])
+    yield q
+    q.close()
+
+
+def _expire(q: WorkQueue):
+    q.db.execute("UPDATE jobs SET lease_until = ? WHERE status = 'leased'", (time.time() - 1,))
+
+
+def _row(q: WorkQueue, job_id: int):
+    return q.db.execute("SELECT status, worker, attempts, error FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+def test_enqueue_skips_known_urls_and_done_videos(q):
+    assert q.enqueue([("https://x/0", "v0"), ("https://x/9", "v9")]) == 1
+    [(job_id, _, _)] = q.lease("w1")
+    assert q.complete(job_id, "w1", done_items=[("v0", "a/v0.mp3")])
+    assert q.is_done("v0")
+    assert q.enqueue([("https://x/other-url-v0", "v0")]) == 0
+
+
+def test_lease_in_order_without_sharing(q):
+    a = q.lease("w1", 2)
+    b = q.lease("w2", 2)
+    assert [r[2] for r in a] == ["v0", "v1"]
+    assert [r[2] for r in b] == ["v2"]
+    assert q.lease("w3") == []
+    assert q.stats()["leased"] == 3
+
+
+def test_expired_lease_is_taken_over(q):
+    [(job_id, _, _)] = q.lease("w1")
+    assert q.lease("w2", 5)[0][0] != job_id        # còn hạn -> không ai lấy
+    _expire(q)
+    taken = [r[0] for r in q.lease("w3", 5)]
+    assert job_id in taken
+    assert _row(q, job_id)[:3] == ("leased", "w3", 2)
+
+
+def test_last_attempt_expiring_marks_failed(q):
+    [(job_id, _, _)] = q.lease("w1")
+    _expire(q)
+    q.lease("w2", 3)                                # lượt 2 = lượt cuối (max_attempts=2)
+    _expire(q)
+    assert all(r[0] != job_id for r in q.lease("w3", 3))
+    status, _, attempts, error = _row(q, job_id)
+    assert (status, attempts) == ("failed", 2) and "lease" in error
+
+
+def test_fail_returns_to_pending_until_attempts_used(q):
+    [(job_id, _, _)] = q.lease("w1")
+    q.fail(job_id, "w1", "lỗi mạng")
+    assert _row(q, job_id)[0] == "pending"
+    assert q.lease("w1")[0][0] == job_id
+    q.fail(job_id, "w1", "lỗi mạng")
+    assert _row(q, job_id)[0] == "failed"
+
+
+def test_complete_only_by_current_holder(q):
+    [(job_id, _, _)] = q.lease("w1")
+    _expire(q)
+    q.lease("w2")
+    assert not q.complete(job_id, "w1", 100, [("v0", "a/v0.mp3")])
+    assert _row(q, job_id)[:2] == ("leased", "w2")
+    assert q.is_done("v0")                          # file đã lên repo thật -> vẫn vào done_index
+    assert not q.renew(job_id, "w1")
+    assert q.complete(job_id, "w2", 100)
+    assert _row(q, job_id)[0] == "done"
+    assert not q.complete(job_id, "w2", 100)        # đã xong -> không ghi lần 2
+
+
+def test_heartbeat_keeps_lease_alive(tmp_path):
+    q = WorkQueue(tmp_path / "queue.db", lease_seconds=1)
+    q.enqueue([("https://x/a", "a")])
+    [(job_id, _, _)] = q.lease("w1")
+    first = q.db.execute("SELECT lease_until FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+    with q.heartbeat(job_id, "w1", every=0.05):
+        time.sleep(1.2)                             # lâu hơn lease_seconds
+        assert q.lease("w2") == []
+    last = q.db.execute("SELECT lease_until FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+    assert last > first + 1
+    assert q.complete(job_id, "w1")
+    q.close()
+
+
+def test_heartbeat_stops_when_lease_lost(tmp_path, capsys):
+    q = WorkQueue(tmp_path / "queue.db", lease_seconds=60)
+    q.enqueue([("https://x/a", "a")])
+    [(job_id, _, _)] = q.lease("w1")
+    _expire(q)
+    q.lease("w2")
+    with q.heartbeat(job_id, "w1", every=0.05):
+        time.sleep(0.2)
+    assert "mất lease" in capsys.readouterr().out
+    assert _row(q, job_id)[1] == "w2"
+    q.close()
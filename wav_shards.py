@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# WAV / FLAC sẵn sàng cho huấn luyện: resample / số kênh / bit depth / cắt đoạn cố định trong 1 lần chạy ffmpeg
+
+import glob
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+
+from audio_fastpath import TRANSCODE_SLOTS, move_postprocessors
+
+PCM_CODEC = {16: "pcm_s16le", 24: "pcm_s24le", 32: "pcm_s32le"}
+FLAC_LEVEL = 5      # 0 (nhanh) .. 12 (nhỏ nhất); 5 = mặc định của ffmpeg/flac
+
+
+def wav_options_set(wav_cfg: Optional[dict]) -> bool:
+    if not wav_cfg:
+        return False
+    return (any(wav_cfg.get(k) for k in ("sample_rate", "channels", "segment_seconds"))
+            or int(wav_cfg.get("bit_depth") or 16) != 16)
+
+
+class WavShardPP(FFmpegPostProcessor):
+    """
+    Thay FFmpegExtractAudio(wav): 1 lần ffmpeg đọc file gốc -> -ar/-ac/pcm -> (tuỳ chọn) segment.
+    Có segment_seconds: ra <tên>_0000.wav, <tên>_0001.wav, ... và info["shard_files"] liệt kê đủ các đoạn.
+    """
+
+    EXT = "wav"
+
+    def __init__(self, downloader=None, sample_rate: int = 0, channels: int = 0,
+                 bit_depth: int = 16, segment_seconds: float = 0, **_):
+        super().__init__(downloader)
+        self.sample_rate = int(sample_rate or 0)
+        self.channels = int(channels or 0)
+        self.bit_depth = int(bit_depth or 16)
+        self.codec = PCM_CODEC.get(self.bit_depth, "pcm_s16le")
+        self.segment = float(segment_seconds or 0)
+
+    def codec_args(self) -> list:
+        return ["-c:a", self.codec]
+
+    def run(self, info):
+        src = Path(info["filepath"])
+        ext = self.EXT
+        args = ["-vn", "-map", "0:a:0"] + self.codec_args()
+        if self.sample_rate:
+            args += ["-ar", str(self.sample_rate)]
+        if self.channels:
+            args += ["-ac", str(self.channels)]
+
+        if self.segment:
+            # muxer segment đọc mọi '%' trong tên là chỉ thị định dạng -> nhân đôi '%' của tiêu đề;
+            # glob bên dưới vẫn dùng tên gốc
+            out_pattern = src.with_name(f"{src.stem.replace('%', '%%')}_%04d.{ext}")
+            args += ["-f", "segment", "-segment_time", f"{self.segment:g}", "-reset_timestamps", "1"]
+            out = out_pattern
+        else:
+            out = src.with_suffix(f".{ext}")
+            if out == src:
+                out = src.with_name(f"{src.stem}.pcm.{ext}")
+
+        self.to_screen(f"{ext.upper()}: {out.name} ({self.describe()}, {self.sample_rate or 'gốc'} Hz, "
+                       f"{self.channels or 'gốc'} kênh{f', đoạn {self.segment:g}s' if self.segment else ''})")
+        if self.segment:
+            # đoạn cũ cùng tên (lần chạy trước / bị ngắt giữa chừng) sẽ lẫn vào kết quả glob -> xoá trước
+            for old in segment_files(src, ext):
+                old.unlink()
+        with TRANSCODE_SLOTS:
+            self.real_run_ffmpeg([(str(src), [])], [(str(out), args)])
+            files = segment_files(src, ext) if self.segment else [out]
+            self.after_encode(info, files)
+
+        if self.segment:
+            info["shard_files"] = [str(p) for p in files]
+            info["filepath"] = str(files[0]) if files else str(out)
+        else:
+            info["filepath"] = str(out)
+        info["ext"] = ext
+        return [str(src)], info
+
+    def describe(self) -> str:
+        return self.codec
+
+    def after_encode(self, info: dict, files: list):
+        """Chạy trong cùng lượt TRANSCODE_SLOTS, sau khi ffmpeg ghi xong (lớp con dùng để kiểm tra)."""
+
+
+class FlacPP(WavShardPP):
+    """
+    Như WavShardPP nhưng nén FLAC (lossless, nhỏ hơn WAV 2-3 lần) với compression_level tuỳ chọn.
+    Sau khi encode, giải mã lại từng file đếm số mẫu -> info["samples"] (và "segment_samples" khi cắt đoạn)
+    để manifest ghi lại, người dùng dữ liệu kiểm tra được file không bị cụt.
+    """
+
+    EXT = "flac"
+    # FLAC của ffmpeg: s16 hoặc s32 + bits_per_raw_sample (24); 32-bit nguyên chưa ổn định -> dùng 24
+    SAMPLE_FMT = {16: ["-sample_fmt", "s16"], 24: ["-sample_fmt", "s32", "-bits_per_raw_sample", "24"],
+                  32: ["-sample_fmt", "s32", "-bits_per_raw_sample", "24"]}
+
+    def __init__(self, downloader=None, compression_level: int = FLAC_LEVEL, **kwargs):
+        super().__init__(downloader, **kwargs)
+        self.level = max(0, min(int(compression_level), 12))
+
+    def codec_args(self) -> list:
+        return ["-c:a", "flac", "-compression_level", str(self.level)] + self.SAMPLE_FMT.get(self.bit_depth, [])
+
+    def describe(self) -> str:
+        return f"flac level {self.level}, {min(self.bit_depth, 24)} bit"
+
+    def after_encode(self, info: dict, files: list):
+        counts = {str(p): decoded_samples(p, self.executable) for p in files}
+        info["samples"] = sum(counts.values())
+        if self.segment:
+            info["segment_samples"] = counts
+
+
+def segment_files(src: Path, ext: str) -> list:
+    """Các đoạn <tên>_NNNN.<ext> cạnh file nguồn, theo thứ tự."""
+    return sorted(src.parent.glob(glob.escape(src.stem) + f"_[0-9][0-9][0-9][0-9].{ext}"))
+
+
+def decoded_samples(path, ffmpeg: str = "ffmpeg") -> int:
+    """Giải mã hết file (ffmpeg -> PCM mono 16-bit ra pipe) và đếm số mẫu mỗi kênh."""
+    cmd = [ffmpeg, "-v", "error", "-nostdin", "-i", str(path), "-map", "0:a:0", "-ac", "1",
+           "-f", "s16le", "-acodec", "pcm_s16le", "-"]
+    n = 0
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as p:
+        for chunk in iter(lambda: p.stdout.read(1 << 20), b""):
+            n += len(chunk)
+    if p.returncode:
+        raise RuntimeError(f"Không giải mã được {Path(path).name} (ffmpeg mã {p.returncode})")
+    return n // 2
+
+
+def attach_flac(opts: dict, wav_cfg: Optional[dict] = None, level: int = FLAC_LEVEL):
+    """Mode FLAC: FFmpegExtractAudio(flac) -> FlacPP (cùng tuỳ chọn resample / bit depth / cắt đoạn với WAV)."""
+    wav_cfg = dict(wav_cfg or {})
+    replace = {"FFmpegExtractAudio": lambda ydl, **a: FlacPP(ydl, compression_level=level, **wav_cfg)}
+    if wav_cfg.get("segment_seconds"):
+        replace["FFmpegMetadata"] = None
+    move_postprocessors(opts, replace)
+
+
+def attach_wav_options(opts: dict, wav_cfg: dict):
+    """Mode WAV có tuỳ chọn: FFmpegExtractAudio -> WavShardPP. Cắt đoạn thì bỏ FFmpegMetadata (ghi từng đoạn vô ích)."""
+    replace = {"FFmpegExtractAudio": lambda ydl, **a: WavShardPP(ydl, **wav_cfg)}
+    if wav_cfg.get("segment_seconds"):
+        replace["FFmpegMetadata"] = None
+    move_postprocessors(opts, replace)
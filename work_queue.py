@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Hàng đợi dùng chung (SQLite, khoá theo file) để nhiều máy cùng kéo link từ 1 danh sách
+
+import sys
+import os
+import time
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Tuple, Dict
+
+DEFAULT_DB = Path("queue.db")
+LEASE_SECONDS = 30 * 60      # quá hạn mà chưa báo xong -> trả lại hàng đợi
+MAX_ATTEMPTS = 3
+THROUGHPUT_WINDOW = 10 * 60  # cửa sổ tính tốc độ tổng (giây)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    url         TEXT NOT NULL UNIQUE,
+    video_id    TEXT,
+    status      TEXT NOT NULL DEFAULT 'pending',   -- pending | leased | done | failed
+    worker      TEXT,
+    lease_until REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    finished_at REAL,
+    bytes       INTEGER NOT NULL DEFAULT 0,
+    error       TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status);
+CREATE TABLE IF NOT EXISTS done_index (
+    video_id     TEXT PRIMARY KEY,
+    url          TEXT,
+    path_in_repo TEXT,
+    worker       TEXT,
+    finished_at  REAL
+);
+"""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    Hàng đợi job trên 1 file SQLite (đặt ở ổ chia sẻ). Mỗi worker 'thuê' (lease) job
+    có thời hạn; job hết hạn mà worker chết thì worker khác nhận lại.
+    done_index là chỉ mục chống trùng: video đã xong sẽ không bị enqueue/tải lại.
+    """
+
+    def __init__(self, path: Path = DEFAULT_DB, lease_seconds: int = LEASE_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS):
+        self.path = Path(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # isolation_level=None -> tự quản lý BEGIN IMMEDIATE (khoá ghi cả file DB)
+        self.db = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    # --------- Coordinator ----------
+    def enqueue(self, items: List[Tuple[str, Optional[str]]]) -> int:
+        """items: [(url, video_id|None)]. Bỏ qua URL đã có hoặc video đã xong. Trả về số job mới."""
+        now = time.time()
+        added = 0
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            for url, vid in items:
+                if vid and self.is_done(vid):
+                    continue
+                cur = self.db.execute(
+                    "INSERT OR IGNORE INTO jobs(url, video_id, enqueued_at) VALUES (?, ?, ?)",
+                    (url, vid, now),
+                )
+                added += cur.rowcount
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+        return added
+
+    # --------- Worker ----------
+    def lease(self, worker: str, n: int = 1) -> List[Tuple[int, str, Optional[str]]]:
+        """Nhận tối đa n job (pending hoặc lease đã hết hạn). Trả về [(job_id, url, video_id)]."""
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            # lease quá hạn đã dùng hết lượt thử (worker chết ở lần cuối) -> failed, không treo 'leased' mãi
+            self.db.execute(
+                "UPDATE jobs SET status = 'failed', lease_until = NULL, "
+                "error = COALESCE(error, 'lease quá hạn ở lượt thử cuối') "
+                "WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            rows = self.db.execute(
+                "SELECT id, url, video_id FROM jobs "
+                "WHERE (status = 'pending' OR (status = 'leased' AND lease_until < ?)) "
+                "AND attempts < ? ORDER BY id LIMIT ?",
+                (now, self.max_attempts, n),
+            ).fetchall()
+            for job_id, _, _ in rows:
+                self.db.execute(
+                    "UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    (worker, now + self.lease_seconds, job_id),
+                )
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+        return rows
+
+    def renew(self, job_id: int, worker: str) -> bool:
+        """Gia hạn lease. False = job không còn thuộc worker này (đã hết hạn và bị worker khác nhận)."""
+        cur = self.db.execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + self.lease_seconds, job_id, worker),
+        )
+        return cur.rowcount > 0
+
+    @contextmanager
+    def heartbeat(self, job_id: int, worker: str, every: Optional[float] = None):
+        """Gia hạn lease định kỳ trong lúc tải + upload (job dài hơn lease không bị worker khác nhận lại)."""
+        stop = threading.Event()
+        every = every or max(self.lease_seconds / 3, 1)
+
+        def beat():
+            # sqlite3: mỗi luồng 1 kết nối riêng
+            q = WorkQueue(self.path, self.lease_seconds, self.max_attempts)
+            try:
+                while not stop.wait(every):
+                    if not q.renew(job_id, worker):
+                        print(f"\n⚠️  [job {job_id}] mất lease (đã quá hạn trước khi gia hạn)")
+                        return
+            finally:
+                q.close()
+
+        t = threading.Thread(target=beat, name=f"lease-{job_id}", daemon=True)
+        t.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            t.join()
+
+    def complete(self, job_id: int, worker: str, nbytes: int = 0,
+                 done_items: Optional[List[Tuple[str, str]]] = None) -> bool:
+        """
+        done_items: [(video_id, path_in_repo)] đã upload xong -> đưa vào done_index (kể cả khi lease đã mất:
+        file đã lên repo thật). Trả về False nếu job không còn do worker này giữ -> trạng thái job không đổi.
+        """
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            url = self.db.execute("SELECT url FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            cur = self.db.execute(
+                "UPDATE jobs SET status = 'done', finished_at = ?, bytes = ?, error = NULL "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (now, int(nbytes), job_id, worker),
+            )
+            for vid, path_in_repo in done_items or []:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO done_index(video_id, url, path_in_repo, worker, finished_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (vid, url[0] if url else None, path_in_repo, worker, now),
+                )
+            self.db.execute("COMMIT")
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+        return cur.rowcount > 0
+
+    def fail(self, job_id: int, worker: str, error: str):
+        """Trả job về pending nếu còn lượt thử, hết lượt -> failed."""
+        self.db.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "lease_until = NULL, error = ? WHERE id = ? AND worker = ?",
+            (self.max_attempts, str(error)[:500], job_id, worker),
+        )
+
+    def is_done(self, video_id: str) -> bool:
+        row = self.db.execute("SELECT 1 FROM done_index WHERE video_id = ?", (video_id,)).fetchone()
+        return row is not None
+
+    # --------- Thống kê ----------
+    def stats(self, window: int = THROUGHPUT_WINDOW) -> Dict[str, float]:
+        out: Dict[str, float] = {s: 0 for s in ("pending", "leased", "done", "failed")}
+        for status, cnt in self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            out[status] = cnt
+        since = time.time() - window
+        cnt, total = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM jobs WHERE status = 'done' AND finished_at >= ?",
+            (since,),
+        ).fetchone()
+        out["items_per_min"] = cnt * 60.0 / window
+        out["bytes_per_sec"] = total / window
+        out["workers"] = self.db.execute(
+            "SELECT COUNT(DISTINCT worker) FROM jobs WHERE status = 'leased' AND lease_until >= ?",
+            (time.time(),),
+        ).fetchone()[0]
+        return out
+
+
+# =============== Mở rộng playlist ===============
+def expand_urls(urls: List[str], cookies_path: Optional[str] = None) -> List[Tuple[str, Optional[str]]]:
+    """Trải playlist/kênh thành từng video (extract_flat, không tải media)."""
+    from yt_dlp import YoutubeDL
+
+    opts = {"extract_flat": "in_playlist", "quiet": True, "no_warnings": True, "ignoreerrors": True}
+    if cookies_path:
+        opts["cookiefile"] = cookies_path
+    out: List[Tuple[str, Optional[str]]] = []
+    with YoutubeDL(opts) as ydl:
+        for url in urls:
+            info = ydl.extract_info(url, download=False)
+            if not info:
+                print(f"⚠️  Không đọc được: {url}")
+                continue
+            entries = info.get("entries")
+            if entries is None:
+                out.append((info.get("webpage_url") or url, info.get("id")))
+                continue
+            for e in entries:
+                if not e:
+                    continue
+                vid = e.get("id")
+                eurl = e.get("url") or e.get("webpage_url")
+                if vid and (not eurl or not eurl.startswith("http")):
+                    eurl = f"https://www.youtube.com/watch?v={vid}"
+                if eurl:
+                    out.append((eurl, vid))
+    return out
+
+
+# =============== Coordinator CLI ===============
+HELP = f"""\
+Cách dùng:
+  python {Path(__file__).name} enqueue [--db queue.db] [URL1 URL2 ...]   (không có URL -> đọc link.txt)
+  python {Path(__file__).name} stats   [--db queue.db] [--watch]
+
+Worker (mỗi máy chạy 1 hoặc nhiều tiến trình):
+  python run_hf-v3.py --queue queue.db --mode 2 --style 5
+"""
+
+
+def print_stats(q: WorkQueue):
+    s = q.stats()
+    print(
+        f"pending={int(s['pending'])} leased={int(s['leased'])} done={int(s['done'])} "
+        f"failed={int(s['failed'])} | workers={int(s['workers'])} | "
+        f"{s['items_per_min']:.1f} mục/phút | {s['bytes_per_sec'] / 1e6:.2f} MB/s"
+    )
+
+
+def main():
+    argv = sys.argv[1:]
+    if not argv or argv[0] in ("-h", "--help"):
+        print(HELP)
+        sys.exit(0)
+    cmd, rest = argv[0], argv[1:]
+    db = DEFAULT_DB
+    watch = False
+    urls: List[str] = []
+    i = 0
+    while i < len(rest):
+        a = rest[i]
+        if a == "--db":
+            db = Path(rest[i + 1]); i += 2; continue
+        if a == "--watch":
+            watch = True; i += 1; continue
+        urls.append(a); i += 1
+
+    q = WorkQueue(db)
+    if cmd == "enqueue":
+        if not urls:
+            link_file = Path("link.txt")
+            if link_file.exists():
+                urls = [ln.strip() for ln in link_file.read_text(encoding="utf-8").splitlines() if ln.strip()]
+        if not urls:
+            print("Không có URL nào. Thoát.")
+            sys.exit(1)
+        cookies = os.getenv("YT_COOKIES")
+        items = expand_urls(urls, cookies if cookies and Path(cookies).exists() else None)
+        added = q.enqueue(items)
+        print(f"✓ Đã thêm {added}/{len(items)} mục vào {db}")
+        print_stats(q)
+    elif cmd == "stats":
+        while True:
+            print_stats(q)
+            if not watch:
+                break
+            time.sleep(10)
+    else:
+        print(HELP)
+        sys.exit(1)
+    q.close()
+
+
+if __name__ == "__main__":
+    main()